@@ -0,0 +1,79 @@
+# the bench_cbr_xml module: the streaming parser of CBR answers against the tree parser
+# run: python -m benchmarks.bench_cbr_xml [records]
+import datetime
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from xml.etree import ElementTree as ET
+
+from src.utils import iter_cbr_rates
+
+chunk_size = 64 * 1024  # bytes, like cbr_stream_chunk_size of utils
+
+
+def get_dynamic_answer(records: int) -> bytes:
+    """XML_dynamic.asp like answer with 'records' records"""
+
+    date = datetime.date(1992, 7, 1)
+    lines = ['<?xml version="1.0" encoding="windows-1251"?>', '<ValCurs ID="R01235" name="Foreign Currency Market">']
+    for index in range(records):
+        record_date = (date + datetime.timedelta(days=index)).strftime("%d.%m.%Y")
+        lines.append(
+            f'<Record Date="{record_date}" Id="R01235"><Nominal>1</Nominal>'
+            f"<Value>{60 + index % 100},{index % 10000:04d}</Value><VunitRate>{60 + index % 100},{index % 10000:04d}"
+            "</VunitRate></Record>"
+        )
+    lines.append("</ValCurs>")
+    return "\n".join(lines).encode("windows-1251")
+
+
+def parse_tree(content: bytes) -> int:
+    """the tree parser: build the whole tree and walk it (as get_currency_rates_range_by_cbr did)"""
+
+    set_rates: dict[datetime.date, float] = dict()
+    for record in ET.fromstring(content).iter("Record"):
+        record_date = datetime.datetime.strptime(str(record.get("Date")), "%d.%m.%Y").date()
+        unit_rate = record.find("VunitRate")
+        if unit_rate is not None:
+            set_rates[record_date] = float(str(unit_rate.text).replace(",", "."))
+    return len(set_rates)
+
+
+def parse_stream(content: bytes) -> int:
+    """the streaming parser: feed the answer by chunks like it is downloaded"""
+
+    chunks = (content[index:index + chunk_size] for index in range(0, len(content), chunk_size))
+    set_rates: dict[datetime.date, float] = dict()
+    for record_date, _, rate in iter_cbr_rates(chunks, "USD"):
+        if record_date is not None:
+            set_rates[record_date] = rate
+    return len(set_rates)
+
+
+def measure(parse: Callable[[bytes], int], content: bytes, repeat: int = 5) -> tuple[float, int]:
+    """the best time in seconds and the peak of allocated memory in bytes"""
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(content)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    parse(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(records: int) -> None:
+    content = get_dynamic_answer(records)
+    assert parse_tree(content) == parse_stream(content) == records
+    print(f"answer: {records} records, {len(content) / 1024:.0f} KiB")
+    for name, parse in (("tree", parse_tree), ("stream", parse_stream)):
+        seconds, peak = measure(parse, content)
+        print(f"{name:>6}: {seconds * 1000:8.1f} ms, peak memory {peak / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
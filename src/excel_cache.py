@@ -0,0 +1,128 @@
+# the excel_cache module
+import hashlib
+import importlib.util
+import logging
+import os
+from os import makedirs
+
+import numpy as np
+import pandas as pd
+
+log_file = "logs/excel_cache.log"
+log_ok_str = "was executed without errors"
+makedirs("logs", exist_ok=True)
+logger = logging.getLogger(__name__)
+file_formatter = logging.Formatter(
+    "%(asctime)s %(filename)s %(levelname)s: %(message)s"
+)
+file_handler = logging.FileHandler(log_file, mode="w")
+file_handler.setFormatter(file_formatter)
+logger.addHandler(file_handler)
+logger.setLevel(logging.DEBUG)
+
+cache_dir = "cache/excel"
+cache_suffix = ".feather"
+hash_block_size = 1024 * 1024
+pyarrow_warned = False  # the missing pyarrow is logged once
+
+
+def is_cache_enabled() -> bool:
+    """the cache is on by default, set EXCEL_CACHE=off (or 0, false, no) to turn it off.
+    The cache uses Feather (Arrow IPC) files and is off if pyarrow isn't installed,
+    it is logged once as a warning."""
+
+    global pyarrow_warned
+    if os.getenv("EXCEL_CACHE", "on").strip().lower() in ("off", "0", "false", "no"):
+        return False
+    if importlib.util.find_spec("pyarrow") is None:
+        if not pyarrow_warned:
+            pyarrow_warned = True
+            logger.warning("is_cache_enabled: pyarrow isn't installed, the Excel cache and the ingest store are off")
+        return False
+    return True
+
+
+def get_path_prefix(filename: str) -> str:
+    """prefix of cache files which belong to the source file 'filename'"""
+
+    abs_path = os.path.abspath(filename)
+    return hashlib.sha1(abs_path.encode("utf-8")).hexdigest()[:16]
+
+
+def get_cache_key(filename: str, version: str = "") -> str:
+    """cache key of the source file by its path, size, mtime and content hash,
+    version is changed by the reader if the format of the cached frame is changed"""
+
+    stat = os.stat(filename)
+    content_hash = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(hash_block_size), b""):
+            content_hash.update(block)
+    key_source = "|".join(
+        [os.path.abspath(filename), str(stat.st_size), str(stat.st_mtime_ns), content_hash.hexdigest(), version]
+    )
+    key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+    return f"{get_path_prefix(filename)}_{key}"
+
+
+def get_cache_filename(key: str) -> str:
+    """path to the cached frame by cache key"""
+
+    return os.path.join(cache_dir, f"{key}{cache_suffix}")
+
+
+def load_cached_frame(key: str) -> pd.DataFrame | None:
+    """read the cached frame by cache key or return None if the cache has no entry"""
+
+    cache_filename = get_cache_filename(key)
+    if not os.path.exists(cache_filename):
+        return None
+    try:
+        cached_data = pd.read_feather(cache_filename)
+    except Exception as e:
+        logger.warning(f"load_cached_frame was executed with error: {e}, file: {cache_filename}")
+        return None
+
+    # Arrow returns missing values of object columns as None, read_excel uses NaN
+    object_columns = cached_data.select_dtypes(include="object").columns
+    for column in object_columns:
+        cached_data[column] = cached_data[column].where(cached_data[column].notna(), np.nan)
+    logger.debug(f"load_cached_frame {log_ok_str}")
+    return cached_data
+
+
+def save_cached_frame(key: str, data: pd.DataFrame) -> None:
+    """write the frame to the cache and remove outdated entries of the same source file"""
+
+    cache_filename = get_cache_filename(key)
+    prefix = key.split("_")[0]
+    try:
+        makedirs(cache_dir, exist_ok=True)
+        tmp_filename = f"{cache_filename}.tmp"
+        data.to_feather(tmp_filename)
+        os.replace(tmp_filename, cache_filename)
+        for entry in os.listdir(cache_dir):
+            entry_path = os.path.join(cache_dir, entry)
+            if entry.startswith(f"{prefix}_") and entry_path != cache_filename:
+                os.remove(entry_path)
+    except Exception as e:
+        logger.warning(f"save_cached_frame was executed with error: {e}, file: {cache_filename}")
+        return
+    logger.debug(f"save_cached_frame {log_ok_str}")
+
+
+def clear_excel_cache() -> int:
+    """remove all cached frames and return count of removed files"""
+
+    removed = 0
+    if not os.path.isdir(cache_dir):
+        return removed
+    try:
+        for entry in os.listdir(cache_dir):
+            if entry.endswith(cache_suffix) or entry.endswith(f"{cache_suffix}.tmp"):
+                os.remove(os.path.join(cache_dir, entry))
+                removed += 1
+    except Exception as e:
+        logger.error(f"clear_excel_cache was executed with error: {e}")
+    logger.debug(f"clear_excel_cache {log_ok_str}, removed {removed} files")
+    return removed
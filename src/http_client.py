@@ -0,0 +1,171 @@
+# the http_client module
+import logging
+import random
+import threading
+import time
+from os import makedirs
+from typing import Any, TypedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log_file = "logs/http_client.log"
+log_ok_str = "was executed without errors"
+makedirs("logs", exist_ok=True)
+logger = logging.getLogger(__name__)
+file_formatter = logging.Formatter(
+    "%(asctime)s %(filename)s %(levelname)s: %(message)s"
+)
+file_handler = logging.FileHandler(log_file, mode="w")
+file_handler.setFormatter(file_formatter)
+logger.addHandler(file_handler)
+logger.setLevel(logging.DEBUG)
+
+connect_timeout = 3.05  # seconds
+read_timeout = 10.0  # seconds
+max_retries = 3
+backoff_factor = 0.5  # seconds, the first retry waits up to backoff_factor
+backoff_max = 8.0  # seconds
+retry_statuses = {429, 500, 502, 503, 504}
+pool_connections = 4  # count of hosts
+pool_maxsize = 16  # connections to one host
+
+HttpStats = TypedDict(
+    "HttpStats",
+    {
+        "requests": int,
+        "retries": int,
+        "errors": int,
+        "new_connections": int,
+        "reused_connections": int,
+        "total_latency": float,
+        "max_latency": float,
+    },
+)
+
+session_lock = threading.Lock()
+stats_lock = threading.Lock()
+shared_session: requests.Session | None = None
+http_stats: HttpStats = {
+    "requests": 0,
+    "retries": 0,
+    "errors": 0,
+    "new_connections": 0,
+    "reused_connections": 0,
+    "total_latency": 0.0,
+    "max_latency": 0.0,
+}
+connections_baseline = (0, 0)  # (requests, connections) of pools at the last reset
+
+
+def get_session() -> requests.Session:
+    """the shared session: keep-alive connections are pooled by host"""
+
+    global shared_session
+    with session_lock:
+        if shared_session is None:
+            shared_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+            shared_session.mount("http://", adapter)
+            shared_session.mount("https://", adapter)
+        return shared_session
+
+
+def get_backoff(attempt: int) -> float:
+    """jittered exponential backoff before the retry number 'attempt' (from 0)"""
+
+    return random.uniform(0, min(backoff_max, backoff_factor * 2**attempt))
+
+
+def http_get(
+    url: str,
+    timeout: tuple[float, float] | None = None,
+    retries: int | None = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """GET request by the shared session with (connect, read) timeout in seconds and
+    bounded retries with jittered backoff on connection errors, timeouts and statuses of retry_statuses.
+    Returns the last response, raises the last error if no response was got."""
+
+    if timeout is None:
+        timeout = (connect_timeout, read_timeout)
+    if retries is None:
+        retries = max_retries
+    session = get_session()
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            response = session.get(url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            add_request_stats(time.perf_counter() - start, error=True)
+            if attempt >= retries:
+                logger.error(f"http_get was executed with error: {e}, url: {url}")
+                raise
+            logger.warning(f"http_get retries after error: {e}, url: {url}")
+        else:
+            add_request_stats(time.perf_counter() - start, error=False)
+            if response.status_code not in retry_statuses or attempt >= retries:
+                logger.debug(f"http_get {log_ok_str}, status: {response.status_code}")
+                return response
+            logger.warning(f"http_get retries after status {response.status_code}, url: {url}")
+            response.close()  # return the connection of a streamed response to the pool
+        with stats_lock:
+            http_stats["retries"] += 1
+        time.sleep(get_backoff(attempt))
+        attempt += 1
+
+
+def add_request_stats(latency: float, error: bool) -> None:
+    """count the request and its latency"""
+
+    with stats_lock:
+        http_stats["requests"] += 1
+        http_stats["total_latency"] += latency
+        http_stats["max_latency"] = max(http_stats["max_latency"], latency)
+        if error:
+            http_stats["errors"] += 1
+
+
+def get_connection_counts() -> tuple[int, int]:
+    """(requests, new connections) counted by connection pools of the shared session"""
+
+    if shared_session is None:
+        return 0, 0
+    pool_requests = 0
+    pool_connections_count = 0
+    adapters = {id(adapter): adapter for adapter in shared_session.adapters.values()}  # mounted by schemes
+    for adapter in adapters.values():
+        if not isinstance(adapter, HTTPAdapter):
+            continue
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            pool_requests += getattr(pool, "num_requests", 0)
+            pool_connections_count += getattr(pool, "num_connections", 0)
+    return pool_requests, pool_connections_count
+
+
+def get_http_stats() -> HttpStats:
+    """counters of requests, retries, errors, new and reused connections and latency in seconds"""
+
+    pool_requests, pool_connections_count = get_connection_counts()
+    with stats_lock:
+        stats = http_stats.copy()
+    stats["new_connections"] = pool_connections_count - connections_baseline[1]
+    stats["reused_connections"] = max(
+        (pool_requests - connections_baseline[0]) - stats["new_connections"], 0
+    )
+    return stats
+
+
+def reset_http_stats() -> None:
+    """set all counters to zero"""
+
+    global connections_baseline
+    connections_baseline = get_connection_counts()
+    with stats_lock:
+        for key in ("requests", "retries", "errors", "new_connections", "reused_connections"):
+            http_stats[key] = 0  # type: ignore[literal-required]
+        http_stats["total_latency"] = 0.0
+        http_stats["max_latency"] = 0.0
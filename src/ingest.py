@@ -0,0 +1,260 @@
+# the ingest module
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from os import makedirs
+from typing import TypedDict
+
+import numpy as np
+import pandas as pd
+
+from src.excel_cache import get_path_prefix, is_cache_enabled
+from src.transactions import DATE_FORMATS, Transactions
+from src.utils import (get_excel_row_count, get_file_fingerprint,
+                       load_transactions, read_excel_chunks)
+
+log_file = "logs/ingest.log"
+log_ok_str = "was executed without errors"
+makedirs("logs", exist_ok=True)
+logger = logging.getLogger(__name__)
+file_formatter = logging.Formatter(
+    "%(asctime)s %(filename)s %(levelname)s: %(message)s"
+)
+file_handler = logging.FileHandler(log_file, mode="w")
+file_handler.setFormatter(file_formatter)
+logger.addHandler(file_handler)
+logger.setLevel(logging.DEBUG)
+
+ingest_dir = "cache/ingest"
+ingest_chunk_size = 1000  # rows of the workbook checked at once
+OPERATION_DATE_COLUMN = "Дата операции"
+FINGERPRINT_COLUMNS = [OPERATION_DATE_COLUMN, "Номер карты", "Сумма операции", "Описание"]
+
+IngestState = TypedDict(
+    "IngestState",
+    {
+        "source": str,
+        "rows": int,
+        "high_water_mark": str,
+        "boundary": list[str],
+        "sheet_rows": int,
+    },
+)
+
+
+def get_row_fingerprints(data: pd.DataFrame) -> pd.Series:
+    """fingerprints of rows by operation datetime, card, amount and description"""
+
+    parts: list[pd.Series] = list()
+    for column in FINGERPRINT_COLUMNS:
+        values = data[column] if column in data.columns else pd.Series("", index=data.index)
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime(DATE_FORMATS[OPERATION_DATE_COLUMN])
+        parts.append(values.astype(str))
+    fingerprints = parts[0]
+    for part in parts[1:]:
+        fingerprints = fingerprints + "|" + part
+    return fingerprints
+
+
+def get_operation_dates(data: pd.DataFrame) -> pd.Series:
+    """operation datetimes as datetime64, NaT if the column is missing or can't be parsed"""
+
+    if OPERATION_DATE_COLUMN not in data.columns:
+        return pd.Series(pd.NaT, index=data.index, dtype="datetime64[ns]")
+    operation_dates = data[OPERATION_DATE_COLUMN]
+    if pd.api.types.is_datetime64_any_dtype(operation_dates):
+        return operation_dates
+    return pd.to_datetime(operation_dates, format=DATE_FORMATS[OPERATION_DATE_COLUMN], errors="coerce")
+
+
+class TransactionStore:
+    """prepared transactions of the Excel file 'filename' which are updated by new rows only.
+    The statement only grows, so the store keeps the high-water mark: the latest operation
+    datetime, fingerprints of the rows at it (see get_row_fingerprints) and the row count of the sheet.
+    The workbook is newest first, so new rows are added on top: they are the rows above
+    the boundary, which must be later than the mark or at it, and reading stops after the boundary.
+    If the sheet has less rows or the boundary rows moved, the whole workbook is loaded again.
+    The store is kept in ingest_dir (Feather and JSON) if the Excel cache is enabled.
+    The card rollup is built at load time and updated by new rows (see Transactions.append)."""
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.transactions: Transactions | None = None
+        self.state: IngestState | None = None
+        prefix = get_path_prefix(filename)
+        self.data_filename = os.path.join(ingest_dir, f"{prefix}.feather")
+        self.state_filename = os.path.join(ingest_dir, f"{prefix}.json")
+
+    def load(self) -> bool:
+        """read the store of the file from ingest_dir, False if there is no store"""
+
+        if not is_cache_enabled() or not os.path.exists(self.state_filename):
+            return False
+        try:
+            with open(self.state_filename) as f:
+                state: IngestState = json.load(f)
+            data = pd.read_feather(self.data_filename)
+        except Exception as e:
+            logger.warning(f"TransactionStore.load was executed with error: {e}, file: {self.state_filename}")
+            return False
+        # Arrow returns missing values of object columns as None, read_excel uses NaN
+        for column in data.select_dtypes(include="object").columns:
+            data[column] = data[column].where(data[column].notna(), np.nan)
+        self.transactions = Transactions(data)
+        self.transactions.get_card_rollup()
+        self.state = state
+        logger.debug(f"TransactionStore.load {log_ok_str}, rows: {len(data)}")
+        return True
+
+    def save(self) -> None:
+        """write the store to ingest_dir, files are replaced at once"""
+
+        if not is_cache_enabled() or self.transactions is None or self.state is None:
+            return
+        try:
+            makedirs(ingest_dir, exist_ok=True)
+            tmp_suffix = f".{threading.get_ident()}.tmp"
+            self.transactions.data.reset_index(drop=True).to_feather(f"{self.data_filename}{tmp_suffix}")
+            with open(f"{self.state_filename}{tmp_suffix}", "w") as f:
+                json.dump(self.state, f, ensure_ascii=False)
+            os.replace(f"{self.data_filename}{tmp_suffix}", self.data_filename)
+            os.replace(f"{self.state_filename}{tmp_suffix}", self.state_filename)
+        except Exception as e:
+            logger.warning(f"TransactionStore.save was executed with error: {e}, file: {self.data_filename}")
+            return
+        logger.debug(f"TransactionStore.save {log_ok_str}")
+
+    def get_state(
+        self, new_rows: pd.DataFrame, source: str, sheet_rows: int | None, state: IngestState | None = None
+    ) -> IngestState:
+        """the high-water mark after new rows are added to the rows of 'state',
+        only the new rows are checked. 'sheet_rows' is the row count of the sheet
+        (see get_excel_row_count), -1 if it's unknown"""
+
+        if state is None:
+            state = {"source": source, "rows": 0, "high_water_mark": "", "boundary": [], "sheet_rows": 0}
+        new_state: IngestState = {
+            "source": source,
+            "rows": state["rows"] + len(new_rows),
+            "high_water_mark": state["high_water_mark"],
+            "boundary": list(state["boundary"]),
+            "sheet_rows": sheet_rows if sheet_rows is not None else -1,
+        }
+        operation_dates = get_operation_dates(new_rows)
+        latest = operation_dates.max()
+        if pd.isna(latest):
+            return new_state
+        if state["high_water_mark"] != "" and latest < pd.Timestamp(state["high_water_mark"]):
+            return new_state
+        if state["high_water_mark"] == "" or latest > pd.Timestamp(state["high_water_mark"]):
+            new_state["high_water_mark"] = latest.isoformat()
+            new_state["boundary"] = list()
+        at_mark = new_rows.loc[(operation_dates == latest).to_numpy()]
+        new_state["boundary"].extend(get_row_fingerprints(at_mark).tolist())
+        return new_state
+
+    def read_new_rows(self, state: IngestState, sheet_rows: int | None) -> pd.DataFrame | None:
+        """rows of the workbook which are newer than the high-water mark of the state.
+        The sheet has 'sheet_rows' rows now, so the new rows are the ones added on top
+        and the boundary rows follow them. None if the workbook was rewritten: the sheet
+        has less rows, the top rows aren't later than the mark or the boundary rows moved"""
+
+        if sheet_rows is None or state.get("sheet_rows", -1) < 0 or sheet_rows < state["sheet_rows"]:
+            return None
+        top_rows = sheet_rows - state["sheet_rows"]
+        boundary_end = top_rows + len(state["boundary"])
+        high_water_mark = pd.Timestamp(state["high_water_mark"]) if state["high_water_mark"] != "" else None
+        boundary = Counter(state["boundary"])
+        new_chunks: list[pd.DataFrame] = list()
+        offset = 0
+        for chunk in read_excel_chunks(self.filename, ingest_chunk_size):
+            operation_dates = get_operation_dates(chunk)
+            positions = np.arange(offset, offset + len(chunk))
+            offset += len(chunk)
+            is_new = positions < top_rows
+            in_boundary = (positions >= top_rows) & (positions < boundary_end)
+            if high_water_mark is None:
+                is_valid = operation_dates.notna().to_numpy() == is_new
+            else:
+                at_mark = (operation_dates == high_water_mark).to_numpy()
+                not_older = (operation_dates > high_water_mark).to_numpy() | at_mark
+                is_valid = np.where(in_boundary, at_mark, not_older == is_new)
+            if not is_valid.all():
+                return None
+            for fingerprint in get_row_fingerprints(chunk.loc[in_boundary]):
+                if boundary[fingerprint] == 0:
+                    return None
+                boundary[fingerprint] -= 1
+            if is_new.any():
+                new_chunks.append(chunk.loc[is_new])
+            if offset >= boundary_end:
+                break
+        if offset < boundary_end:
+            return None
+        if len(new_chunks) == 0:
+            return pd.DataFrame()
+        return pd.concat(new_chunks)
+
+    def reload(self, source: str, sheet_rows: int | None) -> pd.DataFrame:
+        """load the whole workbook (see load_transactions) and save the store again"""
+
+        self.transactions = load_transactions(self.filename)
+        self.transactions.get_card_rollup()
+        self.state = self.get_state(self.transactions.data, source, sheet_rows)
+        self.save()
+        logger.info(f"TransactionStore loaded {self.filename}, rows: {len(self.transactions)}")
+        return self.transactions.data
+
+    def ingest(self) -> pd.DataFrame:
+        """add new rows of the workbook to the store and return them,
+        the whole workbook is loaded (see load_transactions) if there is no store yet
+        or the workbook was rewritten (see read_new_rows), then all rows are returned.
+        Nothing is read while the file is unchanged."""
+
+        source = get_file_fingerprint(self.filename)
+        with self.lock:
+            if self.transactions is None:
+                self.load()
+            if self.transactions is None or self.state is None:
+                return self.reload(source, get_excel_row_count(self.filename))
+            if source == self.state["source"]:
+                return pd.DataFrame()
+            sheet_rows = get_excel_row_count(self.filename)
+            try:
+                new_rows = self.read_new_rows(self.state, sheet_rows)
+                if new_rows is None:
+                    logger.warning(f"TransactionStore.ingest found {self.filename} rewritten, it's loaded again")
+                    return self.reload(source, sheet_rows)
+                self.transactions = self.transactions.append(new_rows)
+            except Exception as e:
+                logger.error(f"TransactionStore.ingest was executed with error: {e}")
+                return pd.DataFrame()
+            self.state = self.get_state(new_rows, source, sheet_rows, self.state)
+            self.save()
+        logger.info(f"TransactionStore.ingest {log_ok_str}, new rows: {len(new_rows)}")
+        return new_rows
+
+    def get(self) -> Transactions:
+        """the prepared transactions of the store with new rows of the workbook"""
+
+        self.ingest()
+        if self.transactions is None:
+            raise RuntimeError(f"{self.filename} isn't ingested")
+        return self.transactions
+
+
+transaction_stores: dict[str, TransactionStore] = dict()
+transaction_stores_lock = threading.Lock()
+
+
+def get_transaction_store(filename: str) -> TransactionStore:
+    """the shared store of the file"""
+
+    with transaction_stores_lock:
+        if filename not in transaction_stores:
+            transaction_stores[filename] = TransactionStore(filename)
+        return transaction_stores[filename]
@@ -1,7 +1,215 @@
-def main() -> None:
-    """the main function"""
+# the main module
+import argparse
+import json
+import logging
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import makedirs
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
 
-    pass
+from src import views
+from src.ingest import TransactionStore
+from src.reports import get_spending_by_category
+from src.services import (iter_individual_transfers,
+                          search_individual_transfers_frame)
+from src.transactions import Transactions, to_records
+from src.utils import get_file_fingerprint, iter_json_chunks, iter_records
+
+log_file = "logs/main.log"
+log_ok_str = "was executed without errors"
+makedirs("logs", exist_ok=True)
+logger = logging.getLogger(__name__)
+file_formatter = logging.Formatter(
+    "%(asctime)s %(filename)s %(levelname)s: %(message)s"
+)
+file_handler = logging.FileHandler(log_file, mode="w")
+file_handler.setFormatter(file_formatter)
+logger.addHandler(file_handler)
+logger.setLevel(logging.DEBUG)
+
+server_host = "127.0.0.1"
+server_port = 8000
+stream_buffer_size = 64 * 1024  # bytes of a streamed answer sent at once
+STREAM_TYPES = {
+    "json": "application/json; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+class HotTransactions:
+    """prepared transactions of the Excel file 'filename' kept in memory,
+    only new rows are added (see ingest.TransactionStore) when the size or
+    the modification time of the file is changed"""
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.store = TransactionStore(filename)
+        self.lock = threading.Lock()
+        self.fingerprint: str | None = None
+        self.transactions: Transactions | None = None
+        self.loads = 0
+
+    def get(self) -> Transactions:
+        """the transactions of the current content of the file"""
+
+        fingerprint = get_file_fingerprint(self.filename)
+        with self.lock:
+            if self.transactions is None or fingerprint != self.fingerprint:
+                new_rows = self.store.ingest()
+                self.transactions = self.store.get()
+                self.fingerprint = fingerprint
+                self.loads += 1
+                logger.info(f"HotTransactions ingested {self.filename}, new rows: {len(new_rows)}")
+            return self.transactions
+
+
+class TransactionsServer(ThreadingHTTPServer):
+    """HTTP server of the main page, the reports and the services over the hot transactions"""
+
+    daemon_threads = True
+    hot_transactions: HotTransactions
+
+
+class TransactionsHandler(BaseHTTPRequestHandler):
+    """JSON endpoints:
+    /main?date=YYYY-MM-DD HH:MM:SS - the main page (see views.main_page),
+    /reports/spending_by_category?category=...&date=DD.MM.YYYY - spending by category,
+    /services/individual_transfers - transfers to individuals,
+    /health - status and count of the transactions.
+    The report and the service are streamed by chunked transfer encoding with stream=json
+    (a JSON array) or stream=ndjson (one record by line), other endpoints ignore stream"""
+
+    server: TransactionsServer
+    protocol_version = "HTTP/1.1"  # keep-alive connections
+
+    def send_json(self, status: int, json_str: str) -> None:
+        """answer by the JSON string"""
+
+        content = json_str.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_json_stream(self, chunks: Iterator[str], content_type: str) -> None:
+        """answer by the JSON text which is sent by chunks of stream_buffer_size bytes as it is made,
+        the connection is closed without the last chunk if making the text is failed"""
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        buffer: list[bytes] = list()
+        buffer_size = 0
+        try:
+            for chunk in chunks:
+                content = chunk.encode("utf-8")
+                buffer.append(content)
+                buffer_size += len(content)
+                if buffer_size >= stream_buffer_size:
+                    self.send_chunk(b"".join(buffer))
+                    buffer = list()
+                    buffer_size = 0
+        except Exception as e:
+            logger.error(f"TransactionsHandler stream was executed with error: {e}, path: {self.path}")
+            self.close_connection = True
+            return
+        if buffer_size > 0:
+            self.send_chunk(b"".join(buffer))
+        self.send_chunk(b"")
+
+    def send_chunk(self, content: bytes) -> None:
+        """send one chunk of chunked transfer encoding, the empty chunk is the last one"""
+
+        self.wfile.write(f"{len(content):X}\r\n".encode("ascii") + content + b"\r\n")
+
+    def do_GET(self) -> None:
+        """answer by the endpoint of the path or 404"""
+
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        stream = query.get("stream")
+        try:
+            if stream in STREAM_TYPES:
+                records = self.get_records(url.path, query)
+                if records is not None:
+                    self.send_json_stream(iter_json_chunks(records, stream == "ndjson"), STREAM_TYPES[stream])
+                    return
+            json_str = self.get_answer(url.path, query)
+        except Exception as e:
+            logger.error(f"TransactionsHandler was executed with error: {e}, path: {self.path}")
+            self.send_json(500, json.dumps({"error": str(e)}, ensure_ascii=False))
+            return
+        if json_str is None:
+            self.send_json(404, json.dumps({"error": f"{url.path} is not found"}, ensure_ascii=False))
+            return
+        self.send_json(200, json_str)
+
+    def get_answer(self, path: str, query: dict[str, str]) -> str | None:
+        """JSON string of the endpoint or None if the path is unknown"""
+
+        hot_transactions = self.server.hot_transactions
+        if path == "/main":
+            return views.main_page(query.get("date", ""), transactions=hot_transactions.get())
+        if path == "/reports/spending_by_category":
+            report = get_spending_by_category(hot_transactions.get(), query.get("category", ""), query.get("date"))
+            return json.dumps(to_records(report), ensure_ascii=False)
+        if path == "/services/individual_transfers":
+            return search_individual_transfers_frame(hot_transactions.get())
+        if path == "/health":
+            transactions = hot_transactions.get()
+            return json.dumps({"status": "ok", "transactions": len(transactions), "loads": hot_transactions.loads})
+        return None
+
+    def get_records(self, path: str, query: dict[str, str]) -> Iterator[dict[str, Any]] | None:
+        """records of the streamed endpoint or None if the path is unknown,
+        the report is made before the answer is started, transfers are searched while they are sent"""
+
+        hot_transactions = self.server.hot_transactions
+        if path == "/reports/spending_by_category":
+            report = get_spending_by_category(hot_transactions.get(), query.get("category", ""), query.get("date"))
+            return iter_records(report)
+        if path == "/services/individual_transfers":
+            return iter_individual_transfers(hot_transactions.get())
+        return None
+
+    def log_message(self, format: str, *args: object) -> None:
+        """write requests to the log instead of stderr"""
+
+        logger.debug(format % args)
+
+
+def create_server(host: str, port: int, workbook: str) -> TransactionsServer:
+    """server of the workbook with loaded transactions, port 0 is any free port"""
+
+    server = TransactionsServer((host, port), TransactionsHandler)
+    server.hot_transactions = HotTransactions(workbook)
+    server.hot_transactions.get()
+    logger.debug(f"create_server {log_ok_str}, address: {server.server_address}")
+    return server
+
+
+def main(argv: list[str] | None = None) -> None:
+    """the main function: serve the workbook over HTTP until interrupted"""
+
+    parser = argparse.ArgumentParser(description="transactions analyzing service")
+    parser.add_argument("--host", default=server_host)
+    parser.add_argument("--port", type=int, default=server_port)
+    parser.add_argument("--workbook", default=views.workbook_file)
+    args = parser.parse_args(argv)
+
+    views.workbook_file = args.workbook
+    server = create_server(args.host, args.port, args.workbook)
+    logger.info(f"main serves http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 
 if __name__ == "__main__":
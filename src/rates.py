@@ -0,0 +1,414 @@
+# the rates module
+import datetime
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from os import makedirs, path
+from typing import TypedDict
+
+log_file = "logs/rates.log"
+log_ok_str = "was executed without errors"
+makedirs("logs", exist_ok=True)
+logger = logging.getLogger(__name__)
+file_formatter = logging.Formatter(
+    "%(asctime)s %(filename)s %(levelname)s: %(message)s"
+)
+file_handler = logging.FileHandler(log_file, mode="w")
+file_handler.setFormatter(file_formatter)
+logger.addHandler(file_handler)
+logger.setLevel(logging.DEBUG)
+
+rates_db_file = "cache/rates.sqlite"
+today_ttl = 3600.0  # seconds, rates of past dates never expire
+rate_cache_maxsize = 1024  # dates kept in memory by RateCache
+rate_negative_ttl = 60.0  # seconds, failed loads are remembered by RateCache
+
+# non-working holidays of Russia as (month, day), CBR doesn't set rates on them
+rate_holidays = {(1, day) for day in range(1, 9)} | {(2, 23), (3, 8), (5, 1), (5, 9), (6, 12), (11, 4)}
+
+RATES = dict[str, float]
+RateCacheStats = TypedDict(
+    "RateCacheStats",
+    {
+        "hits": int,
+        "negative_hits": int,
+        "misses": int,
+        "coalesced": int,
+        "evictions": int,
+        "size": int,
+    },
+)
+
+rates_version = 0  # changed when rates which could be already used are changed
+rates_version_lock = threading.Lock()
+missing_rate_dates: set[datetime.date] = set()  # dates of rates which were asked but weren't got
+
+
+def get_rates_version() -> int:
+    """the version of rates: rates of past dates never change, so the version is changed
+    only when rates of today or later dates are saved, rates of a date which was asked
+    but wasn't got are saved (see add_missing_rate_date) or all rates are removed"""
+
+    with rates_version_lock:
+        return rates_version
+
+
+def bump_rates_version() -> None:
+    """change the version of rates"""
+
+    global rates_version
+    with rates_version_lock:
+        rates_version += 1
+
+
+def add_missing_rate_date(date: datetime.date) -> None:
+    """remember the date of a rate which was asked but wasn't got,
+    results got without it are changed when its rates are saved"""
+
+    with rates_version_lock:
+        missing_rate_dates.add(date)
+
+
+def pop_missing_rate_dates(dates: Iterable[datetime.date]) -> bool:
+    """forget missing dates of the saved rates, True if some of them were missing"""
+
+    with rates_version_lock:
+        found_dates = missing_rate_dates.intersection(dates)
+        missing_rate_dates.difference_update(found_dates)
+    return len(found_dates) > 0
+
+
+class RateStore:
+    """persistent store of currency rates in SQLite keyed by (provider, date, currency).
+    Historical rates never change, so rates of past dates never expire,
+    rates of today and later dates are fresh for 'ttl' seconds."""
+
+    def __init__(self, filename: str, ttl: float = today_ttl) -> None:
+        self.filename = filename
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        directory = path.dirname(filename)
+        if directory != "":
+            makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS rates (provider TEXT, date TEXT, currency TEXT, rate REAL, "
+                "PRIMARY KEY (provider, date, currency))"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS dates (provider TEXT, date TEXT, fetched_at REAL, "
+                "PRIMARY KEY (provider, date))"
+            )
+
+    def is_fresh(self, date: datetime.date, fetched_at: float) -> bool:
+        """rates of past dates are always fresh, today rates are fresh for ttl seconds"""
+
+        if date < datetime.date.today():
+            return True
+        return time.time() - fetched_at < self.ttl
+
+    def get_rates(self, provider: str, date: datetime.date) -> dict[str, float] | None:
+        """all rates of the provider at the date or None if the date wasn't saved or expired"""
+
+        try:
+            with self.lock:
+                fetched = self.connection.execute(
+                    "SELECT fetched_at FROM dates WHERE provider = ? AND date = ?",
+                    (provider, date.isoformat()),
+                ).fetchone()
+                if fetched is None or not self.is_fresh(date, fetched[0]):
+                    return None
+                rows = self.connection.execute(
+                    "SELECT currency, rate FROM rates WHERE provider = ? AND date = ?",
+                    (provider, date.isoformat()),
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"RateStore.get_rates was executed with error: {e}")
+            return None
+        logger.debug(f"RateStore.get_rates {log_ok_str}")
+        return {currency: rate for currency, rate in rows}
+
+    def save_rates(self, provider: str, date: datetime.date, rates: dict[str, float]) -> None:
+        """save all rates of the provider at the date"""
+
+        try:
+            with self.lock, self.connection:
+                self.connection.execute(
+                    "DELETE FROM rates WHERE provider = ? AND date = ?", (provider, date.isoformat())
+                )
+                self.connection.executemany(
+                    "INSERT INTO rates (provider, date, currency, rate) VALUES (?, ?, ?, ?)",
+                    [(provider, date.isoformat(), currency, rate) for currency, rate in rates.items()],
+                )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO dates (provider, date, fetched_at) VALUES (?, ?, ?)",
+                    (provider, date.isoformat(), time.time()),
+                )
+        except Exception as e:
+            logger.error(f"RateStore.save_rates was executed with error: {e}")
+            return
+        was_missing = pop_missing_rate_dates([date])
+        if date >= datetime.date.today() or was_missing:
+            bump_rates_version()
+        logger.debug(f"RateStore.save_rates {log_ok_str}")
+
+    def get_rate(self, provider: str, date: datetime.date, currency: str) -> float | None:
+        """the rate of the currency at the past date, it can be saved by save_rates or save_rate_series"""
+
+        if date >= datetime.date.today():
+            return None
+        try:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT rate FROM rates WHERE provider = ? AND date = ? AND currency = ?",
+                    (provider, date.isoformat(), currency),
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"RateStore.get_rate was executed with error: {e}")
+            return None
+        if row is None:
+            return None
+        rate: float = row[0]
+        return rate
+
+    def get_rate_series(
+        self, provider: str, currency: str, date_start: datetime.date, date_end: datetime.date
+    ) -> dict[datetime.date, float]:
+        """saved rates of the currency from date_start to date_end by dates"""
+
+        try:
+            with self.lock:
+                rows = self.connection.execute(
+                    "SELECT date, rate FROM rates WHERE provider = ? AND currency = ? AND date BETWEEN ? AND ?",
+                    (provider, currency, date_start.isoformat(), date_end.isoformat()),
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"RateStore.get_rate_series was executed with error: {e}")
+            return dict()
+        return {datetime.date.fromisoformat(date): rate for date, rate in rows}
+
+    def save_rate_series(self, provider: str, currency: str, rates: dict[datetime.date, float]) -> None:
+        """save rates of one currency by dates, the dates aren't marked as fully saved,
+        so other currencies of these dates are still got from the provider.
+        Only past dates are saved, they never expire, the rates version is changed if a date was missing."""
+
+        today = datetime.date.today()
+        rows = [(provider, date.isoformat(), currency, rate) for date, rate in rates.items() if date < today]
+        if len(rows) == 0:
+            return
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO rates (provider, date, currency, rate) VALUES (?, ?, ?, ?)", rows
+                )
+        except Exception as e:
+            logger.error(f"RateStore.save_rate_series was executed with error: {e}")
+            return
+        if pop_missing_rate_dates(date for date in rates if date < today):
+            bump_rates_version()
+        logger.debug(f"RateStore.save_rate_series {log_ok_str}, rates: {len(rows)}")
+
+    def clear(self) -> None:
+        """remove all saved rates"""
+
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("DELETE FROM rates")
+                self.connection.execute("DELETE FROM dates")
+        except Exception as e:
+            logger.error(f"RateStore.clear was executed with error: {e}")
+            return
+        bump_rates_version()
+        logger.debug(f"RateStore.clear {log_ok_str}")
+
+    def close(self) -> None:
+        """close the database connection"""
+
+        with self.lock:
+            self.connection.close()
+
+
+class RateFlight:
+    """a load in progress, concurrent misses of the same key wait for it"""
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value: RATES | None = None
+
+
+class RateCache:
+    """bounded thread-safe in-memory cache of rates by key (date).
+    Least recently used keys are evicted above 'maxsize', concurrent misses of
+    the same key are merged into one load and failed loads (None) are remembered
+    for 'negative_ttl' seconds."""
+
+    def __init__(self, maxsize: int | None = None, negative_ttl: float | None = None) -> None:
+        self.maxsize = rate_cache_maxsize if maxsize is None else maxsize
+        self.negative_ttl = rate_negative_ttl if negative_ttl is None else negative_ttl
+        self.lock = threading.Lock()
+        # value and expiration time by key, None as expiration time means never
+        self.entries: OrderedDict[Hashable, tuple[RATES | None, float | None]] = OrderedDict()
+        self.flights: dict[Hashable, RateFlight] = dict()
+        self.stats: RateCacheStats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "size": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def find(self, key: Hashable) -> tuple[bool, RATES | None]:
+        """(True, value) of the not expired key or (False, None), the caller holds the lock"""
+
+        if key not in self.entries:
+            return False, None
+        value, expires_at = self.entries[key]
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.entries[key]
+            return False, None
+        self.entries.move_to_end(key)
+        if value is None:
+            self.stats["negative_hits"] += 1
+        else:
+            self.stats["hits"] += 1
+        return True, value
+
+    def lookup(self, key: Hashable) -> tuple[bool, RATES | None]:
+        """(True, value) if the key is cached, value is None for a remembered failure,
+        or (False, None) if it isn't"""
+
+        with self.lock:
+            return self.find(key)
+
+    def put(self, key: Hashable, value: RATES | None, ttl: float | None = None) -> None:
+        """cache the value for ttl seconds (None is forever), a None value is cached for negative_ttl"""
+
+        if value is None:
+            ttl = self.negative_ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get_or_load(
+        self, key: Hashable, loader: Callable[[], RATES | None], ttl: float | None = None
+    ) -> RATES | None:
+        """cached value of the key or the value of loader() which is cached by put.
+        Only one loader of the key runs at the same time, other callers get its value."""
+
+        with self.lock:
+            found, value = self.find(key)
+            if found:
+                return value
+            flight = self.flights.get(key)
+            is_leader = flight is None
+            if flight is None:
+                self.stats["misses"] += 1
+                flight = RateFlight()
+                self.flights[key] = flight
+            else:
+                self.stats["coalesced"] += 1
+        if not is_leader:
+            flight.event.wait()
+            return flight.value
+
+        value = None
+        try:
+            value = loader()
+        except Exception as e:
+            logger.error(f"RateCache.get_or_load was executed with error: {e}")
+        self.put(key, value, ttl)
+        with self.lock:
+            del self.flights[key]
+        flight.value = value
+        flight.event.set()
+        return value
+
+    def clear(self) -> None:
+        """remove all cached values"""
+
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self) -> RateCacheStats:
+        """hits, negative hits, misses, coalesced misses, evictions and current size"""
+
+        with self.lock:
+            stats = self.stats.copy()
+            stats["size"] = len(self.entries)
+        return stats
+
+
+def is_business_day(date: datetime.date) -> bool:
+    """CBR sets rates on weekdays except holidays of rate_holidays"""
+
+    return date.weekday() < 5 and (date.month, date.day) not in rate_holidays
+
+
+class RateCalendar:
+    """maps a calendar date to the effective date of CBR rates.
+    Rates set on a business day are effective from the next day until the next setting,
+    so the effective date is the latest date not after the date which follows a business day:
+    payments of Saturday, Sunday and Monday share the rates of Saturday.
+    The local calendar doesn't know moved holidays, so effective dates reported by CBR
+    (the 'Date' attribute of the answer) are learned and override it."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.aliases: dict[datetime.date, datetime.date] = dict()  # learned effective dates
+
+    def resolve(self, date: datetime.date) -> datetime.date:
+        """the effective date of rates of the date"""
+
+        rate_date = date
+        while not is_business_day(rate_date - datetime.timedelta(days=1)):
+            rate_date -= datetime.timedelta(days=1)
+        with self.lock:
+            return self.aliases.get(rate_date, rate_date)
+
+    def learn(self, date: datetime.date, rate_date: datetime.date) -> None:
+        """remember the effective date reported for the requested date"""
+
+        if rate_date >= date:
+            return
+        with self.lock:
+            self.aliases[date] = rate_date
+        logger.info(f"RateCalendar learned the effective date {rate_date} of {date}")
+
+    def clear(self) -> None:
+        """forget learned effective dates"""
+
+        with self.lock:
+            self.aliases.clear()
+
+
+rate_calendar = RateCalendar()
+
+rate_stores: dict[str, RateStore] = dict()
+rate_stores_lock = threading.Lock()
+
+
+def get_rate_store() -> RateStore | None:
+    """the shared rate store of rates_db_file or None if the store can't be opened"""
+
+    with rate_stores_lock:
+        if rates_db_file in rate_stores:
+            return rate_stores[rates_db_file]
+        try:
+            rate_store = RateStore(rates_db_file)
+        except Exception as e:
+            logger.error(f"get_rate_store was executed with error: {e}")
+            return None
+        rate_stores[rates_db_file] = rate_store
+        return rate_store
@@ -8,6 +8,9 @@ from typing import Optional, ParamSpec
 
 import pandas as pd
 
+from src.transactions import to_records
+from src.utils import FRAMES, iter_records, iter_window, write_json_records
+
 P = ParamSpec("P")
 
 log_file = "logs/reports.log"
@@ -24,10 +27,12 @@ logger.setLevel(logging.DEBUG)
 
 
 def write_report(
-    filename: Optional[str] = None,
+    filename: Optional[str] = None, stream: bool = False, ndjson: bool = False
 ) -> Callable[[Callable[P, pd.DataFrame]], Callable[P, None]]:
     """decorator for writing report to file in JSON format
-    if filename is None to use filename contains wrapper name function and date"""
+    if filename is None to use filename contains wrapper name function and date.
+    stream=True writes records batch by batch (see utils.write_json_records) instead of
+    making all of them first, ndjson=True writes one record by line (.ndjson by default) in the stream"""
 
     def decorator(inner: Callable[P, pd.DataFrame]) -> Callable[P, None]:
         """decorator gets inner function which have to return pandas DataFrame"""
@@ -39,11 +44,20 @@ def write_report(
             inner_name = inner.__name__
             if filename is None:
                 date = dt.date.today().strftime("%Y-%m-%d")
-                report_filename = f"data/{inner_name}_{date}.json"
+                report_filename = f"data/{inner_name}_{date}.{'ndjson' if ndjson else 'json'}"
             else:
                 report_filename = filename
             inner_result = inner(*args, **kwargs)
-            json_data = inner_result.to_dict("records")
+            if stream or ndjson:
+                try:
+                    with open(report_filename, "w", encoding="utf-8") as f:
+                        write_json_records(iter_records(inner_result), f, ndjson)
+                except Exception as e:
+                    logger.error(
+                        f"decorator write_report was executed with error: {e}, func is {inner_name}"
+                    )
+                return
+            json_data = to_records(inner_result)
             try:
                 with open(report_filename, "w", encoding="utf-8") as f:
                     json.dump(json_data, f, ensure_ascii=False)
@@ -57,12 +71,13 @@ def write_report(
     return decorator
 
 
-@write_report()
-def spending_by_category(
-    transactions: pd.DataFrame, category: str, date: Optional[str] = None
+def get_spending_by_category(
+    transactions: FRAMES, category: str, date: Optional[str] = None
 ) -> pd.DataFrame:
-    """generate report of spending by category for 3 months,
-    date is str by %d.%m.%Y format, use current date if date is None or incorrect."""
+    """spending by category for 3 months (see spending_by_category) without writing the report,
+    date is str by %d.%m.%Y format, use current date if date is None or incorrect.
+    transactions is the whole DataFrame, prepared transactions (see load_transactions)
+    or the batches of DataFrame (see read_excel_chunks)."""
 
     filtered_df = pd.DataFrame()
     date_end = dt.date.today()
@@ -71,7 +86,7 @@ def spending_by_category(
             date_end = dt.datetime.strptime(date, "%d.%m.%Y").date()
         except Exception as e:
             logger.warning(
-                f"spending_by_category was executed with error: {e}, date: {date}, used current date."
+                f"get_spending_by_category was executed with error: {e}, date: {date}, used current date."
             )
     date_start = date_end - dt.timedelta(days=1)
     month_start = (date_start.month + 9) % 12
@@ -79,21 +94,31 @@ def spending_by_category(
     if date_start > date_end:
         year_start = date_end.year - 1
         date_start = date_start.replace(year=year_start)
+    filtered_chunks: list[pd.DataFrame] = list()
     try:
-        transactions["payment_date"] = pd.to_datetime(transactions["Дата платежа"], format="%d.%m.%Y").dt.date
+        for window_data in iter_window(transactions, date_start, date_end):
+            filtered_chunks.append(
+                window_data.loc[
+                    (window_data["Статус"] == "OK")
+                    & (window_data["Сумма платежа"] < 0)
+                    & (window_data["Категория"] == category)
+                ]
+            )
     except Exception as e:
-        logger.error(f"spending_by_category was executed with error: {e}")
+        logger.error(f"get_spending_by_category was executed with error: {e}")
         return filtered_df
-    try:
-        filtered_df = transactions.loc[
-            (transactions["Статус"] == "OK")
-            & (transactions["Сумма платежа"] < 0)
-            & (transactions["Категория"] == category)
-            & (transactions["payment_date"] <= date_end)
-            & (transactions["payment_date"] >= date_start)
-        ]
-    except Exception as e:
-        logger.error(f"spending_by_category was executed with error: {e}")
+    if len(filtered_chunks) == 0:
         return filtered_df
-    logger.debug(f"spending_by_category {log_ok_str}")
-    return filtered_df.drop(columns=["payment_date"])
+    filtered_df = pd.concat(filtered_chunks)
+    logger.debug(f"get_spending_by_category {log_ok_str}")
+    return filtered_df
+
+
+@write_report()
+def spending_by_category(
+    transactions: FRAMES, category: str, date: Optional[str] = None
+) -> pd.DataFrame:
+    """generate report of spending by category for 3 months (see get_spending_by_category),
+    date is str by %d.%m.%Y format, use current date if date is None or incorrect."""
+
+    return get_spending_by_category(transactions, category, date)
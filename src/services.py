@@ -3,8 +3,14 @@
 import json
 import logging
 import re
+from collections.abc import Iterable, Iterator, Mapping
 from os import makedirs
-from typing import TypedDict
+from typing import IO, Any, TypedDict
+
+import pandas as pd
+
+from src.transactions import to_record, to_records
+from src.utils import FRAMES, iter_frames, iter_records, write_json_records
 
 Transaction = TypedDict(
     "Transaction",
@@ -39,22 +45,27 @@ file_handler.setFormatter(file_formatter)
 logger.addHandler(file_handler)
 logger.setLevel(logging.DEBUG)
 
+name_pattern = re.compile("[А-ЯA-Z][а-яa-z]* [А-ЯA-Z][.]")
+
 
-def search_individual_transfers(transactions: list[Transaction]) -> str:
+def search_individual_transfers(
+    transactions: Iterable[Transaction] | Iterable[Mapping[Any, Any]]
+) -> str:
     """returns transactions for transfers to individuals by JSON format or empty str.
     Категория: Переводы
     Описание: the field contains the first name and
               the first letter of last name of the individual
-              (Константин Л.)"""
-
-    if len(transactions) == 0:
-        logger.warning("search_individual_transfers got empty transaction data.")
-        return ""
+              (Константин Л.)
+    transactions is consumed one by one, so it can be a generator of records
+    from the batches of DataFrame (see utils.iter_records), typed values of records
+    (dates of read_excel) are written like the workbook has them (see transactions.to_record)"""
 
-    filtered_transactions: list[Transaction] = list()
-    name_match = re.compile("[А-ЯA-Z][а-яa-z]* [А-ЯA-Z][.]")
+    filtered_transactions: list[Transaction | dict[str, Any]] = list()
+    name_match = name_pattern
+    transactions_count = 0
     try:
         for transaction in transactions:
+            transactions_count += 1
             if transaction["Статус"] != "OK":
                 continue
             if transaction["Категория"] != "Переводы":
@@ -63,18 +74,100 @@ def search_individual_transfers(transactions: list[Transaction]) -> str:
                 continue
             if name_match.match(transaction["Описание"]) is None:
                 continue
-            filtered_transactions.append(transaction)
+            filtered_transactions.append(to_record(transaction))
     except Exception as e:
         logger.error(f"search_individual_transfers was executed with error: {e}.")
         return ""
 
+    if transactions_count == 0:
+        logger.warning("search_individual_transfers got empty transaction data.")
+        return ""
+
     if len(filtered_transactions) == 0:
         logger.warning(
             "search_individual_transfers received empty transaction data after filtering."
         )
         return ""
 
-    transactions_json = json.dumps(filtered_transactions, ensure_ascii=False)
+    try:
+        transactions_json = json.dumps(filtered_transactions, ensure_ascii=False)
+    except Exception as e:
+        logger.error(f"search_individual_transfers was executed with error: {e}.")
+        return ""
     logger.debug(f"search_individual_transfers {log_ok_str}")
 
     return transactions_json
+
+
+def get_individual_transfers_mask(data: pd.DataFrame) -> pd.Series:
+    """mask of transfers to individuals (see search_individual_transfers) by vectorized filters,
+    the name regex is matched once for every unique 'Описание' of the filtered rows"""
+
+    mask = (data["Статус"] == "OK") & (data["Категория"] == "Переводы") & ~(data["Сумма платежа"] >= 0)
+    descriptions = data.loc[mask, "Описание"]
+    unique_descriptions = pd.Series(descriptions.unique(), dtype=object)
+    if not unique_descriptions.map(lambda description: isinstance(description, str)).all():
+        raise TypeError("'Описание' of a transfer isn't str")
+    name_matches = unique_descriptions.str.match(name_pattern.pattern)
+    matches = dict(zip(unique_descriptions, name_matches))
+    mask.loc[mask] = descriptions.map(matches).astype(bool)
+    return mask
+
+
+def search_individual_transfers_frame(data: FRAMES) -> str:
+    """search_individual_transfers for the whole DataFrame, prepared transactions (see load_transactions)
+    or the batches of DataFrame (see read_excel_chunks) without making a dict of every row:
+    status, category and sign are filtered by masks and only found rows are converted to records.
+    returns the same JSON as search_individual_transfers(iter_records(data)) or empty str."""
+
+    filtered_transactions: list[dict[str, Any]] = list()
+    transactions_count = 0
+    try:
+        for chunk in iter_frames(data):
+            transactions_count += len(chunk)
+            if len(chunk) == 0:
+                continue
+            filtered_transactions.extend(to_records(chunk.loc[get_individual_transfers_mask(chunk)]))
+    except Exception as e:
+        logger.error(f"search_individual_transfers_frame was executed with error: {e}.")
+        return ""
+
+    if transactions_count == 0:
+        logger.warning("search_individual_transfers_frame got empty transaction data.")
+        return ""
+
+    if len(filtered_transactions) == 0:
+        logger.warning(
+            "search_individual_transfers_frame received empty transaction data after filtering."
+        )
+        return ""
+
+    transactions_json = json.dumps(filtered_transactions, ensure_ascii=False)
+    logger.debug(f"search_individual_transfers_frame {log_ok_str}")
+
+    return transactions_json
+
+
+def iter_individual_transfers(data: FRAMES) -> Iterator[dict[str, Any]]:
+    """transfers to individuals (see search_individual_transfers_frame) record by record,
+    the batches are filtered and converted one by one, so the first records are got
+    before the whole data is searched"""
+
+    for chunk in iter_frames(data):
+        if len(chunk) == 0:
+            continue
+        yield from iter_records(chunk.loc[get_individual_transfers_mask(chunk)])
+
+
+def write_individual_transfers(data: FRAMES, file: IO[str], ndjson: bool = False) -> bool:
+    """write transfers to individuals to the text file (or socket.makefile) as they are found:
+    a JSON array or NDJSON (one record by line) if ndjson is True, memory doesn't depend
+    on the number of found transfers. False if it was executed with errors"""
+
+    try:
+        write_json_records(iter_individual_transfers(data), file, ndjson)
+    except Exception as e:
+        logger.error(f"write_individual_transfers was executed with error: {e}.")
+        return False
+    logger.debug(f"write_individual_transfers {log_ok_str}")
+    return True
@@ -0,0 +1,151 @@
+# the stock_cache module
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from os import makedirs, path
+
+log_file = "logs/stock_cache.log"
+log_ok_str = "was executed without errors"
+makedirs("logs", exist_ok=True)
+logger = logging.getLogger(__name__)
+file_formatter = logging.Formatter(
+    "%(asctime)s %(filename)s %(levelname)s: %(message)s"
+)
+file_handler = logging.FileHandler(log_file, mode="w")
+file_handler.setFormatter(file_formatter)
+logger.addHandler(file_handler)
+logger.setLevel(logging.DEBUG)
+
+STOCKS = Callable[[list[str]], dict[str, float] | None]
+stocks_cache_file = "cache/stocks.json"
+stocks_ttl = 300.0  # seconds while cached prices are fresh
+
+
+class StockCache:
+    """stock prices cached in memory and in the JSON file 'filename'.
+    Fresh prices (younger than 'ttl' seconds) are returned without requests,
+    stale prices are returned at once and refreshed in the background,
+    only stocks without any price are got before returning.
+    Stocks which the provider didn't return are remembered in memory for 'ttl' seconds
+    and are checked again in the background like stale prices."""
+
+    def __init__(self, filename: str, ttl: float = stocks_ttl) -> None:
+        self.filename = filename
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.refresh_thread: threading.Thread | None = None
+        self.prices: dict[str, tuple[float, float]] = dict()  # (price, fetched_at) by stock
+        self.not_found: dict[str, float] = dict()  # checked_at by stock without price
+        try:
+            with open(filename) as f:
+                self.prices = {
+                    stock: (float(price), float(fetched_at)) for stock, (price, fetched_at) in json.load(f).items()
+                }
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"StockCache can't read {filename}: {e}")
+
+    def save(self) -> None:
+        """write prices to the file, the file is replaced at once"""
+
+        try:
+            directory = path.dirname(self.filename)
+            if directory != "":
+                makedirs(directory, exist_ok=True)
+            with self.lock:
+                content = json.dumps(self.prices)
+            tmp_filename = f"{self.filename}.{threading.get_ident()}.tmp"
+            with open(tmp_filename, "w") as f:
+                f.write(content)
+            os.replace(tmp_filename, self.filename)
+        except Exception as e:
+            logger.warning(f"StockCache.save was executed with error: {e}, file: {self.filename}")
+            return
+        logger.debug(f"StockCache.save {log_ok_str}")
+
+    def refresh(self, stocks: list[str], get_stock_prices: STOCKS) -> bool:
+        """get prices of the stocks by get_stock_prices and cache them, False if it was failed"""
+
+        try:
+            prices = get_stock_prices(stocks)
+        except Exception as e:
+            logger.error(f"StockCache.refresh was executed with error: {e}")
+            return False
+        if prices is None:
+            logger.warning(f"StockCache.refresh didn't get prices of {stocks}")
+            return False
+        fetched_at = time.time()
+        not_found = [stock for stock in stocks if stock not in prices]
+        with self.lock:
+            self.prices.update({stock: (price, fetched_at) for stock, price in prices.items()})
+            for stock in prices:
+                self.not_found.pop(stock, None)
+            self.not_found.update({stock: fetched_at for stock in not_found})
+        self.save()
+        if len(not_found) > 0:
+            logger.warning(f"StockCache.refresh didn't find prices of {not_found}")
+        logger.debug(f"StockCache.refresh {log_ok_str}, stocks: {len(prices)}")
+        return True
+
+    def refresh_in_background(self, stocks: list[str], get_stock_prices: STOCKS) -> None:
+        """start refresh in a thread if no refresh is running"""
+
+        with self.lock:
+            if self.refresh_thread is not None and self.refresh_thread.is_alive():
+                return
+            self.refresh_thread = threading.Thread(target=self.refresh, args=(stocks, get_stock_prices), daemon=True)
+            self.refresh_thread.start()
+
+    def wait(self, timeout: float | None = None) -> None:
+        """wait for the background refresh"""
+
+        refresh_thread = self.refresh_thread
+        if refresh_thread is not None:
+            refresh_thread.join(timeout)
+
+    def get_prices(self, stocks: list[str], get_stock_prices: STOCKS) -> dict[str, tuple[float, float]]:
+        """(price, age in seconds) by stock, stocks without price are missing"""
+
+        now = time.time()
+        with self.lock:
+            checked_at = {stock: self.prices[stock][1] for stock in stocks if stock in self.prices}
+            checked_at.update({stock: self.not_found[stock] for stock in stocks if stock in self.not_found})
+            missing = [stock for stock in stocks if stock not in checked_at]
+            stale = [stock for stock in stocks if stock in checked_at and now - checked_at[stock] >= self.ttl]
+        if len(missing) > 0:
+            self.refresh(missing + stale, get_stock_prices)
+        elif len(stale) > 0:
+            self.refresh_in_background(stale, get_stock_prices)
+
+        now = time.time()
+        with self.lock:
+            return {
+                stock: (self.prices[stock][0], max(now - self.prices[stock][1], 0.0))
+                for stock in stocks
+                if stock in self.prices
+            }
+
+    def clear(self) -> None:
+        """remove all cached prices"""
+
+        with self.lock:
+            self.prices.clear()
+            self.not_found.clear()
+        self.save()
+
+
+stock_caches: dict[str, StockCache] = dict()
+stock_caches_lock = threading.Lock()
+
+
+def get_stock_cache() -> StockCache:
+    """the shared stock cache of stocks_cache_file"""
+
+    with stock_caches_lock:
+        if stocks_cache_file not in stock_caches:
+            stock_caches[stocks_cache_file] = StockCache(stocks_cache_file)
+        return stock_caches[stocks_cache_file]
@@ -0,0 +1,302 @@
+# the transactions module
+import datetime
+import itertools
+import logging
+import threading
+from collections.abc import Mapping
+from os import makedirs
+from typing import Any, cast
+
+import numpy as np
+import pandas as pd
+
+log_file = "logs/transactions.log"
+log_ok_str = "was executed without errors"
+makedirs("logs", exist_ok=True)
+logger = logging.getLogger(__name__)
+file_formatter = logging.Formatter(
+    "%(asctime)s %(filename)s %(levelname)s: %(message)s"
+)
+file_handler = logging.FileHandler(log_file, mode="w")
+file_handler.setFormatter(file_formatter)
+logger.addHandler(file_handler)
+logger.setLevel(logging.DEBUG)
+
+SCHEMA_VERSION = "1"
+CATEGORY_COLUMNS = [
+    "Статус",
+    "Категория",
+    "Валюта платежа",
+    "Валюта операции",
+    "Номер карты",
+]
+AMOUNT_COLUMNS = [
+    "Сумма операции",
+    "Сумма платежа",
+    "Кэшбэк",
+    "Сумма операции с округлением",
+]
+MCC_COLUMN = "MCC"
+PAYMENT_DATE_COLUMN = "Дата платежа"
+DATE_FORMATS = {
+    "Дата операции": "%d.%m.%Y %H:%M:%S",
+    "Дата платежа": "%d.%m.%Y",
+}
+ROLLUP_KEYS = [PAYMENT_DATE_COLUMN, "Номер карты", "Валюта платежа"]
+ROLLUP_SUMS = ["Сумма платежа", "Кэшбэк"]
+TOP_COLUMNS = ["Сумма платежа", "Валюта платежа", PAYMENT_DATE_COLUMN, "Категория", "Описание"]
+transactions_versions = itertools.count(1)  # unique versions of prepared transactions
+
+
+def get_memory_usage(data: pd.DataFrame) -> int:
+    """memory of DataFrame in bytes including python objects of object columns"""
+
+    return int(data.memory_usage(deep=True).sum())
+
+
+def apply_schema(data: pd.DataFrame) -> pd.DataFrame:
+    """convert transactions columns to compact types:
+    low-cardinality text columns to category, amounts to float64,
+    MCC to nullable Int16, dates to datetime64 by DATE_FORMATS.
+    Columns which are missing or can't be converted are kept as is."""
+
+    memory_before = get_memory_usage(data)
+    typed_data = data.copy()
+    conversions: dict[str, Any] = dict()
+    conversions.update({column: "category" for column in CATEGORY_COLUMNS})
+    conversions.update({column: "float64" for column in AMOUNT_COLUMNS})
+    conversions[MCC_COLUMN] = "Int16"
+    for column, dtype in conversions.items():
+        if column not in typed_data.columns:
+            continue
+        try:
+            typed_data[column] = typed_data[column].astype(dtype)
+        except Exception as e:
+            logger.warning(f"apply_schema can't convert {column} to {dtype}: {e}")
+    for column, date_format in DATE_FORMATS.items():
+        if column not in typed_data.columns or pd.api.types.is_datetime64_any_dtype(typed_data[column]):
+            continue
+        try:
+            typed_data[column] = pd.to_datetime(typed_data[column], format=date_format)
+        except Exception as e:
+            logger.warning(f"apply_schema can't convert {column} to datetime64: {e}")
+    memory_after = get_memory_usage(typed_data)
+    logger.info(f"apply_schema changed memory usage from {memory_before} to {memory_after} bytes")
+    logger.debug(f"apply_schema {log_ok_str}")
+    return typed_data
+
+
+def to_records(data: pd.DataFrame) -> list[dict[str, Any]]:
+    """DataFrame to dict records ready for JSON like records of the workbook read by pd.read_excel:
+    datetime64 columns are formatted back by DATE_FORMATS, nullable integer columns (MCC)
+    are float64, so missing values are NaN like in other float columns"""
+
+    json_data = data.copy()
+    for column in json_data.columns:
+        if pd.api.types.is_datetime64_any_dtype(json_data[column]):
+            date_format = DATE_FORMATS.get(str(column), "%d.%m.%Y")
+            json_data[column] = json_data[column].dt.strftime(date_format)
+        elif pd.api.types.is_extension_array_dtype(json_data[column]) and pd.api.types.is_integer_dtype(
+            json_data[column]
+        ):
+            json_data[column] = json_data[column].astype("float64")
+        elif pd.api.types.is_extension_array_dtype(json_data[column]) and not isinstance(
+            json_data[column].dtype, pd.CategoricalDtype
+        ):
+            json_data[column] = json_data[column].astype(object).where(json_data[column].notna(), None)
+    return cast(list[dict[str, Any]], json_data.to_dict("records"))
+
+
+def to_record(record: Mapping[Any, Any]) -> dict[str, Any]:
+    """one record of typed data (e.g. DataFrame.to_dict("records")) ready for JSON like to_records:
+    datetime values are formatted back by DATE_FORMATS, MCC is float, missing values are NaN"""
+
+    json_record: dict[str, Any] = dict()
+    for key, value in record.items():
+        if value is pd.NaT or value is pd.NA or (isinstance(value, np.datetime64) and np.isnat(value)):
+            value = np.nan
+        elif isinstance(value, (pd.Timestamp, np.datetime64)):
+            value = format_date(value, DATE_FORMATS.get(str(key), "%d.%m.%Y"))
+        elif key == MCC_COLUMN and value is None:  # NA of Int16 in to_dict records
+            value = np.nan
+        elif key == MCC_COLUMN and isinstance(value, (int, np.integer)):
+            value = float(value)
+        json_record[str(key)] = value
+    return json_record
+
+
+def format_date(value: Any, date_format: str = DATE_FORMATS["Дата платежа"]) -> Any:
+    """format datetime value back to str, other values are returned as is"""
+
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).strftime(date_format)
+    return value
+
+
+def get_payment_dates(data: pd.DataFrame) -> pd.Series:
+    """payment dates as datetime64, the column is parsed only if it isn't typed yet"""
+
+    payment_dates = data[PAYMENT_DATE_COLUMN]
+    if pd.api.types.is_datetime64_any_dtype(payment_dates):
+        return payment_dates
+    return pd.to_datetime(payment_dates, format=DATE_FORMATS[PAYMENT_DATE_COLUMN])
+
+
+def get_card_rollup(data: pd.DataFrame) -> pd.DataFrame | None:
+    """sums of ROLLUP_SUMS of spending (status OK and negative payment amount)
+    by payment day, card and payment currency sorted by payment day,
+    None if the data has no columns for the rollup"""
+
+    if any(column not in data.columns for column in ROLLUP_KEYS + ["Статус"] + ROLLUP_SUMS):
+        return None
+    spent = data.loc[(data["Сумма платежа"] < 0) & (data["Статус"] == "OK"), ROLLUP_KEYS + ROLLUP_SUMS]
+    keys = {
+        PAYMENT_DATE_COLUMN: get_payment_dates(spent).dt.normalize(),
+        "Номер карты": spent["Номер карты"].astype(object),  # categories of ingested rows differ
+        "Валюта платежа": spent["Валюта платежа"].astype(object),
+    }
+    return spent.assign(**keys).groupby(ROLLUP_KEYS, sort=True)[ROLLUP_SUMS].sum().reset_index()
+
+
+def select_top(data: pd.DataFrame, k: int) -> pd.DataFrame:
+    """rows with the k largest absolute payment amounts of every payment day and payment currency,
+    the order of rows is kept and ties are broken by the first row like nlargest(keep="first")"""
+
+    keys = [get_payment_dates(data).dt.normalize(), data["Валюта платежа"].astype(object)]
+    ranks = data["Сумма платежа"].abs().groupby(keys, dropna=False).rank(method="first", ascending=False)
+    return data.loc[ranks <= k]
+
+
+def get_top_candidates(data: pd.DataFrame, k: int) -> pd.DataFrame | None:
+    """candidates of top k transactions: TOP_COLUMNS of rows with status OK
+    which are in the top k by absolute payment amount of their payment day and currency.
+    A rate is the same for the day and the currency, so the candidates include
+    the top k in RUB of any window of days. None if the data has no columns for candidates"""
+
+    if any(column not in data.columns for column in TOP_COLUMNS + ["Статус"]):
+        return None
+    return select_top(data.loc[data["Статус"] == "OK", TOP_COLUMNS], k)
+
+
+class Transactions:
+    """prepared transactions: typed data (see apply_schema) where 'Дата платежа' is datetime64,
+    so the functions of views and reports compare dates without parsing them on every call.
+    The data is sorted by payment date, so a date window is a contiguous slice (see window).
+    The card rollup (see get_card_rollup) is built once on the first card_window call
+    and the top candidates (see get_top_candidates) on the first top_window call,
+    both are updated by new rows only in append.
+    'version' is unique for every instance, append returns a new instance, so results
+    of the transactions can be memoized by it."""
+
+    def __init__(self, data: pd.DataFrame, card_rollup: pd.DataFrame | None = None) -> None:
+        payment_dates = get_payment_dates(data)
+        if payment_dates is not data[PAYMENT_DATE_COLUMN]:
+            data = data.assign(**{PAYMENT_DATE_COLUMN: payment_dates})
+        if not payment_dates.is_monotonic_increasing:
+            data = data.sort_values(PAYMENT_DATE_COLUMN, kind="stable")
+        self.data = data
+        self.dates: np.ndarray = data[PAYMENT_DATE_COLUMN].to_numpy()
+        self.card_rollup = card_rollup
+        self.rollup_lock = threading.Lock()
+        self.top_candidates: pd.DataFrame | None = None
+        self.top_k = 0  # k of top_candidates
+        self.version = next(transactions_versions)
+        logger.debug(f"Transactions {log_ok_str}, rows: {len(data)}")
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def payment_dates(self) -> pd.Series:
+        """payment dates as datetime64"""
+
+        return self.data[PAYMENT_DATE_COLUMN]
+
+    def window(self, date_start: datetime.date, date_end: datetime.date) -> pd.DataFrame:
+        """transactions with payment date from date_start to date_end inclusive,
+        the bounds are found by binary search: O(log n) plus the size of the slice"""
+
+        start = self.dates.searchsorted(np.datetime64(date_start, "ns"), side="left")
+        end = self.dates.searchsorted(np.datetime64(date_end, "ns"), side="right")
+        return self.data.iloc[start:end]
+
+    def get_card_rollup(self) -> pd.DataFrame | None:
+        """the card rollup of the data, it is built on the first call"""
+
+        with self.rollup_lock:
+            if self.card_rollup is None:
+                self.card_rollup = get_card_rollup(self.data)
+            return self.card_rollup
+
+    def card_window(self, date_start: datetime.date, date_end: datetime.date) -> pd.DataFrame | None:
+        """rows of the card rollup from date_start to date_end inclusive (one row by day, card and currency),
+        so the size doesn't depend on the number of transactions. None if there is no rollup"""
+
+        card_rollup = self.get_card_rollup()
+        if card_rollup is None:
+            return None
+        rollup_dates = card_rollup[PAYMENT_DATE_COLUMN].to_numpy()
+        start = rollup_dates.searchsorted(np.datetime64(date_start, "ns"), side="left")
+        end = rollup_dates.searchsorted(np.datetime64(date_end, "ns"), side="right")
+        return card_rollup.iloc[start:end]
+
+    def get_top_candidates(self, k: int) -> pd.DataFrame | None:
+        """the top k candidates of the data, they are built on the first call with k"""
+
+        with self.rollup_lock:
+            if self.top_candidates is None or self.top_k != k:
+                self.top_candidates = get_top_candidates(self.data, k)
+                self.top_k = k
+            return self.top_candidates
+
+    def top_window(self, date_start: datetime.date, date_end: datetime.date, k: int) -> pd.DataFrame | None:
+        """the top k candidates from date_start to date_end inclusive (at most k rows by day and currency),
+        so top k of the window is found among them. None if there are no candidates"""
+
+        top_candidates = self.get_top_candidates(k)
+        if top_candidates is None:
+            return None
+        candidate_dates = top_candidates[PAYMENT_DATE_COLUMN].to_numpy()
+        start = candidate_dates.searchsorted(np.datetime64(date_start, "ns"), side="left")
+        end = candidate_dates.searchsorted(np.datetime64(date_end, "ns"), side="right")
+        return top_candidates.iloc[start:end]
+
+    def append(self, new_data: pd.DataFrame) -> "Transactions":
+        """prepared transactions with new rows (typed by apply_schema) added,
+        categories of category columns are united, so the columns keep the category type.
+        The data is sorted again only if the new rows are older than the latest payment date.
+        The card rollup and the top candidates are updated by the new rows if they are built."""
+
+        if len(new_data) == 0:
+            return self
+        new_data = new_data.assign(**{PAYMENT_DATE_COLUMN: get_payment_dates(new_data)})
+        columns: dict[str, Any] = dict()
+        for column in self.data.columns.intersection(new_data.columns, sort=False):
+            old_column = self.data[column]
+            new_column = new_data[column]
+            if isinstance(old_column.dtype, pd.CategoricalDtype) and isinstance(new_column.dtype, pd.CategoricalDtype):
+                categories = old_column.cat.categories.union(new_column.cat.categories, sort=False)
+                columns[column] = (
+                    old_column.cat.set_categories(categories),
+                    new_column.cat.set_categories(categories),
+                )
+        old_part = self.data.assign(**{column: parts[0] for column, parts in columns.items()})
+        new_part = new_data.assign(**{column: parts[1] for column, parts in columns.items()})
+        data = pd.concat([old_part, new_part], ignore_index=True)
+        card_rollup = self.card_rollup
+        new_rollup = get_card_rollup(new_data)
+        if card_rollup is not None and new_rollup is not None:
+            card_rollup = (
+                pd.concat([card_rollup, new_rollup]).groupby(ROLLUP_KEYS, sort=True)[ROLLUP_SUMS].sum().reset_index()
+            )
+        else:
+            card_rollup = None
+        transactions = Transactions(data, card_rollup)
+        new_candidates = get_top_candidates(new_data, self.top_k)
+        if self.top_candidates is not None and new_candidates is not None:
+            top_candidates = pd.concat([self.top_candidates, new_candidates], ignore_index=True)
+            top_candidates = top_candidates.sort_values(PAYMENT_DATE_COLUMN, kind="stable")
+            transactions.top_candidates = select_top(top_candidates, self.top_k)
+            transactions.top_k = self.top_k
+        logger.debug(f"Transactions.append {log_ok_str}, new rows: {len(new_data)}")
+        return transactions
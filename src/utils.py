@@ -1,16 +1,60 @@
 # the utils module
+import asyncio
+import codecs
 import datetime
 import json
 import logging
-from collections.abc import Callable
-from os import makedirs
+import posixpath
+import re
+import time
+import zipfile
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from os import makedirs, stat
+from typing import IO, Any
 from xml.etree import ElementTree as ET
 
+import numpy as np
+import openpyxl  # type: ignore[import-untyped]
 import pandas as pd
-import requests
+
+from src.excel_cache import (get_cache_key, is_cache_enabled,
+                             load_cached_frame, save_cached_frame)
+from src.http_client import http_get
+from src.rates import (RateCache, RateCacheStats, add_missing_rate_date,
+                       get_rate_store, rate_calendar, rate_negative_ttl,
+                       today_ttl)
+from src.transactions import (PAYMENT_DATE_COLUMN, SCHEMA_VERSION,
+                              Transactions, apply_schema, get_payment_dates,
+                              to_records)
 
 INNER = Callable[[datetime.date], dict[str, float] | None]
 OUTER = Callable[[str, datetime.date], float | None]
+# whole data, prepared transactions or batches from read_excel_chunks
+FRAMES = pd.DataFrame | Transactions | Iterable[pd.DataFrame]
+
+cbr_url = "https://cbr.ru/scripts"
+CBR_PROVIDER = "get_currency_rates_by_cbr"
+cbr_range_lookback_days = 10
+prefetch_concurrency = 8  # concurrent requests of prefetch_currency_rates
+cbr_stream_chunk_size = 64 * 1024  # bytes of CBR answers parsed at once
+records_batch_size = 10000  # rows converted to dict records at once
+excel_block_size = 1024 * 1024  # bytes of the sheet XML scanned at once by get_excel_row_count
+excel_row_tag = re.compile(rb"<(?:\w+:)?row\b([^>]*)>")
+excel_row_number = re.compile(rb'\sr="(\d+)"')
+rate_caches: dict[str, RateCache] = dict()  # in-memory rate caches of get_currency_rates by provider
+cbr_currency_ids = {
+    "USD": "R01235",
+    "EUR": "R01239",
+    "CNY": "R01375",
+    "GBP": "R01035",
+    "JPY": "R01820",
+    "CHF": "R01775",
+    "KZT": "R01335",
+    "BYN": "R01090B",
+    "TRY": "R01700J",
+}
+cbr_unknown_ids: dict[str, float] = dict()  # time.monotonic() of failed lookups by currency code
 
 log_file = "logs/utils.log"
 log_ok_str = "was executed without errors"
@@ -25,22 +69,257 @@ logger.addHandler(file_handler)
 logger.setLevel(logging.DEBUG)
 
 
-def read_excel(filename: str) -> pd.DataFrame:
+def read_excel(filename: str, use_cache: bool = True) -> pd.DataFrame:
     """reading transactions data from Excel file 'filename' and
-    return pandas DataFrame or empty data if it was executed with errors."""
+    return pandas DataFrame or empty data if it was executed with errors.
+    Columns are converted to compact types by transactions.apply_schema.
+    The typed data is cached on disk (see excel_cache) while the file is unchanged,
+    use_cache=False or EXCEL_CACHE=off reads the file without the cache."""
 
     excel_data = pd.DataFrame()
+    cache_key = ""
     try:
+        if use_cache and is_cache_enabled():
+            cache_key = get_cache_key(filename, SCHEMA_VERSION)
+            cached_data = load_cached_frame(cache_key)
+            if cached_data is not None:
+                logger.debug(f"read_excel {log_ok_str}, used cache")
+                return cached_data
         with open(filename, "rb") as excel_file:
-            excel_data = pd.read_excel(excel_file)
+            excel_data = apply_schema(pd.read_excel(excel_file))
     except Exception as e:
         logger.error(f"read_excel() was executed with error: {e}")
         return excel_data
 
+    if cache_key != "":
+        save_cached_frame(cache_key, excel_data)
     logger.debug(f"read_excel {log_ok_str}")
     return excel_data
 
 
+def load_transactions(filename: str, use_cache: bool = True) -> Transactions:
+    """reading transactions data from Excel file 'filename' (see read_excel) and
+    return prepared transactions or empty transactions if it was executed with errors."""
+
+    try:
+        transactions = Transactions(read_excel(filename, use_cache))
+    except Exception as e:
+        logger.error(f"load_transactions was executed with error: {e}")
+        return Transactions(pd.DataFrame({PAYMENT_DATE_COLUMN: pd.Series(dtype="datetime64[ns]")}))
+    logger.debug(f"load_transactions {log_ok_str}")
+    return transactions
+
+
+def read_excel_chunks(filename: str, chunk_size: int = 10000) -> Iterator[pd.DataFrame]:
+    """reading transactions data from Excel file 'filename' by batches of 'chunk_size' rows,
+    the workbook is opened in read-only mode, so only one batch is kept in memory.
+    The first row of the sheet is the header, nothing is yielded if it was executed with errors.
+    Columns of every batch are converted by transactions.apply_schema."""
+
+    try:
+        workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    except Exception as e:
+        logger.error(f"read_excel_chunks was executed with error: {e}")
+        return
+
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(column) for column in next(rows)]
+        batch: list[tuple[Any, ...]] = list()
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunk_size:
+                yield get_chunk_frame(batch, header)
+                batch = list()
+        if len(batch) > 0:
+            yield get_chunk_frame(batch, header)
+    except Exception as e:
+        logger.error(f"read_excel_chunks was executed with error: {e}")
+        return
+    finally:
+        workbook.close()
+    logger.debug(f"read_excel_chunks {log_ok_str}")
+
+
+def get_chunk_frame(rows: list[tuple[Any, ...]], header: list[str]) -> pd.DataFrame:
+    """build a batch DataFrame like pd.read_excel does: empty cells of text columns are NaN"""
+
+    chunk = pd.DataFrame.from_records(rows, columns=header, coerce_float=True)
+    object_columns = chunk.select_dtypes(include="object").columns
+    for column in object_columns:
+        chunk[column] = chunk[column].where(chunk[column].notna(), np.nan)
+    return apply_schema(chunk)
+
+
+def get_active_sheet_path(archive: zipfile.ZipFile) -> str:
+    """path of the active sheet in the xlsx archive, the sheet is found like openpyxl does"""
+
+    workbook_path = "xl/workbook.xml"
+    for relation in ET.fromstring(archive.read("_rels/.rels")):
+        if relation.get("Type", "").endswith("/officeDocument"):
+            workbook_path = relation.get("Target", workbook_path).lstrip("/")
+    workbook_dir, workbook_name = posixpath.split(workbook_path)
+    workbook = ET.fromstring(archive.read(workbook_path))
+    view = workbook.find("{*}bookViews/{*}workbookView")
+    sheet = workbook.findall("{*}sheets/{*}sheet")[int(view.get("activeTab", "0")) if view is not None else 0]
+    relation_id = next(value for key, value in sheet.attrib.items() if key.endswith("}id"))
+    relations = ET.fromstring(archive.read(posixpath.join(workbook_dir, "_rels", f"{workbook_name}.rels")))
+    target = next(relation.get("Target", "") for relation in relations if relation.get("Id") == relation_id)
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(workbook_dir, target))
+
+
+def get_excel_row_count(filename: str) -> int | None:
+    """number of rows after the header in the active sheet of Excel file 'filename'
+    as read_excel_chunks reads them, empty rows between filled ones are counted too.
+    Only row tags of the sheet XML are scanned, cells aren't parsed,
+    None if it was executed with errors."""
+
+    last_row = 0
+    try:
+        with zipfile.ZipFile(filename) as archive, archive.open(get_active_sheet_path(archive)) as sheet:
+            tail = b""
+            for block in iter(partial(sheet.read, excel_block_size), b""):
+                text = tail + block
+                end = text.rfind(b">") + 1
+                for match in excel_row_tag.finditer(text, 0, end):
+                    row_number = excel_row_number.search(match.group(1))
+                    last_row = int(row_number.group(1)) if row_number is not None else last_row + 1
+                tail = text[end:]
+    except Exception as e:
+        logger.error(f"get_excel_row_count was executed with error: {e}")
+        return None
+    logger.debug(f"get_excel_row_count {log_ok_str}")
+    return max(last_row - 1, 0)
+
+
+def iter_frames(data: FRAMES) -> Iterator[pd.DataFrame]:
+    """iterate over the whole DataFrame, prepared transactions or the batches of DataFrame"""
+
+    if isinstance(data, pd.DataFrame):
+        yield data
+        return
+    if isinstance(data, Transactions):
+        yield data.data
+        return
+    yield from data
+
+
+def iter_window(
+    data: FRAMES, date_start: datetime.date, date_end: datetime.date
+) -> Iterator[pd.DataFrame]:
+    """iterate over transactions with payment date from date_start to date_end inclusive,
+    'Дата платежа' of yielded frames is datetime64. Prepared transactions are sliced
+    by binary search, other data is filtered by mask batch by batch."""
+
+    if isinstance(data, Transactions):
+        yield data.window(date_start, date_end)
+        return
+    for chunk in iter_frames(data):
+        payment_dates = get_payment_dates(chunk)
+        in_window = (payment_dates >= np.datetime64(date_start)) & (payment_dates <= np.datetime64(date_end))
+        yield chunk.loc[in_window].assign(**{PAYMENT_DATE_COLUMN: payment_dates[in_window]})
+
+
+def iter_records(data: FRAMES) -> Iterator[dict[str, Any]]:
+    """iterate over transactions as dict records ready for JSON batch by batch,
+    at most records_batch_size records are kept at once"""
+
+    for chunk in iter_frames(data):
+        for start in range(0, len(chunk), records_batch_size):
+            yield from to_records(chunk.iloc[start:start + records_batch_size])
+
+
+def iter_json_chunks(records: Iterable[Any], ndjson: bool = False) -> Iterator[str]:
+    """JSON text of records piece by piece, so the records aren't kept together:
+    a JSON array which is the same as json.dumps(list(records), ensure_ascii=False)
+    or NDJSON (one record by line) if ndjson is True"""
+
+    if ndjson:
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        return
+    yield "["
+    separator = ""
+    for record in records:
+        yield separator + json.dumps(record, ensure_ascii=False)
+        separator = ", "
+    yield "]"
+
+
+def write_json_records(records: Iterable[Any], file: IO[str], ndjson: bool = False) -> None:
+    """write records to the text file (or socket.makefile) as they are got (see iter_json_chunks)"""
+
+    for chunk in iter_json_chunks(records, ndjson):
+        file.write(chunk)
+
+
+def iter_json_array(chunks: Iterable[bytes | str]) -> Iterator[Any]:
+    """iterate over items of JSON array which is got chunk by chunk (UTF-8 bytes or str),
+    only the current item is decoded, so the whole array isn't kept in memory.
+    Raises json.JSONDecodeError if the data isn't a JSON array."""
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    started = False
+    after_item = False
+    chunks_iterator = iter(chunks)
+    finished = False
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position < len(buffer):
+            char = buffer[position]
+            if not started:
+                if char != "[":
+                    raise json.JSONDecodeError("JSON array is expected", buffer, position)
+                started = True
+                position += 1
+                continue
+            if char == "]":
+                return
+            if after_item:
+                if char != ",":
+                    raise json.JSONDecodeError("',' or ']' is expected", buffer, position)
+                after_item = False
+                position += 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if finished:
+                    raise
+                item, end = None, -1
+            # a number at the end of the buffer can be continued by the next chunk
+            if end != -1 and (finished or (end < len(buffer) and (buffer[end] in ",]" or buffer[end].isspace()))):
+                yield item
+                position = end
+                after_item = True
+                continue
+        if finished:
+            raise json.JSONDecodeError("unexpected end of JSON array", buffer, position)
+        chunk = next(chunks_iterator, None)
+        if chunk is None:
+            finished = True
+            buffer = buffer[position:] + text_decoder.decode(b"", final=True)
+        else:
+            buffer = buffer[position:] + (text_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        position = 0
+
+
+def get_file_fingerprint(filename: str) -> str:
+    """'size:mtime_ns' of the file or '' if it doesn't exist, it changes when the file is rewritten"""
+
+    try:
+        file_stat = stat(filename)
+    except OSError:
+        return ""
+    return f"{file_stat.st_size}:{file_stat.st_mtime_ns}"
+
+
 def get_user_settings(user_settings_json_file: str) -> dict[str, list[str]] | None:
     """getting user setting from user_settings.json"""
 
@@ -82,76 +361,361 @@ def exchange(
     return amount_rub
 
 
-def get_currency_rates(inner: INNER) -> OUTER:
-    """get exchange from currency amount by code 'currency_code' to RUB"""
-
-    currency_rates: dict[datetime.date, dict[str, float]] = (
-        dict()
-    )  # dict of currency rate by date as key
-
-    def wrapper(currency_code: str, date: datetime.date) -> float | None:
-        """getting currency rates from external API"""
-
-        if date in currency_rates:
-            if currency_code in currency_rates[date]:
-                return currency_rates[date][currency_code]
-            logger.warning(
-                f"get_currency_rates didn't find {currency_code} in {currency_rates} at {date}"
-            )
-            return None
-
+def exchange_frame(
+    data: pd.DataFrame,
+    columns: list[str],
+    get_currency_rate: OUTER,
+    currency_column: str = "Валюта платежа",
+    date_column: str = PAYMENT_DATE_COLUMN,
+) -> pd.DataFrame:
+    """exchange amounts of 'columns' from currency of 'currency_column' to RUB by one vectorized step:
+    rates are got once for each distinct pair (date, currency), RUB rate is 1.0 without a call.
+    date_column has to be datetime64, amounts without rate are NaN."""
+
+    pairs = data[[date_column, currency_column]].drop_duplicates()
+    rates: list[float] = list()
+    for payment_date, currency_code in pairs.itertuples(index=False):
+        if currency_code == "RUB":
+            rates.append(1.0)
+            continue
+        rate = get_currency_rate(str(currency_code), pd.Timestamp(payment_date).date())
+        if rate is None:
+            logger.warning(f"exchange_frame didn't get rate of {currency_code} at {payment_date}")
+            rates.append(np.nan)
+            continue
+        rates.append(rate)
+    rate_table = pd.Series(rates, index=pd.MultiIndex.from_frame(pairs), dtype="float64")
+    row_rates = rate_table.reindex(pd.MultiIndex.from_frame(data[[date_column, currency_column]])).to_numpy()
+    amounts_rub = data[columns].mul(row_rates, axis=0)
+    logger.debug(f"exchange_frame {log_ok_str}, rates: {len(rate_table)}, rows: {len(data)}")
+    return amounts_rub
+
+
+def has_missing_rates(data: pd.DataFrame, amounts_rub: pd.DataFrame) -> bool:
+    """True if some amounts of data weren't exchanged by exchange_frame: their rate wasn't got"""
+
+    columns = list(amounts_rub.columns)
+    return bool((amounts_rub.isna() & data[columns].notna()).to_numpy().any())
+
+
+def get_currency_rates(
+    inner: INNER, resolve_date: Callable[[datetime.date], datetime.date] | None = None
+) -> OUTER:
+    """get exchange from currency amount by code 'currency_code' to RUB.
+    resolve_date maps the date to the effective date of rates (see rates.RateCalendar),
+    so dates without new rates share one cache entry and one call of inner.
+    Rates are kept in the bounded in-memory cache (see rates.RateCache, registered
+    in rate_caches by the inner function name) and in the persistent rate store
+    (see rates.RateStore) by the same name as provider, so rates of past dates are got from inner only once.
+    Concurrent calls for the same date call inner once, failed calls are remembered for a short time.
+    Dates of rates which weren't got are remembered (see rates.add_missing_rate_date), so
+    the rates version is changed when their rates are saved later."""
+
+    provider = inner.__name__
+    currency_rates = RateCache()  # rates by date
+    rate_caches[provider] = currency_rates
+
+    def load(date: datetime.date) -> dict[str, float] | None:
+        """rates of the date from the store or inner"""
+
+        rate_store = get_rate_store()
+        if rate_store is not None:
+            currency_rates_by_store = rate_store.get_rates(provider, date)
+            if currency_rates_by_store is not None:
+                return currency_rates_by_store
         currency_rates_by_inner = inner(date)
         if currency_rates_by_inner is None:
             logger.warning(f"get_currency_rates at {date} was executed inner and returned None")
             return None
+        if rate_store is not None:
+            rate_store.save_rates(provider, date, currency_rates_by_inner)
+        return currency_rates_by_inner
 
-        currency_rates[date] = currency_rates_by_inner
-        if currency_code in currency_rates_by_inner:
+    def wrapper(currency_code: str, date: datetime.date) -> float | None:
+        """getting currency rates from the cache, the store or external API"""
+
+        if resolve_date is not None:
+            date = resolve_date(date)
+        found, currency_rates_by_date = currency_rates.lookup(date)
+        if currency_rates_by_date is None:
+            # the rate can be saved alone by a range request (see fill_currency_rates_by_cbr)
+            rate_store = get_rate_store()
+            if rate_store is not None:
+                stored_rate = rate_store.get_rate(provider, date, currency_code)
+                if stored_rate is not None:
+                    return stored_rate
+            if found:
+                add_missing_rate_date(date)
+                return None  # the failure of inner is remembered
+            ttl = None if date < datetime.date.today() else today_ttl
+            currency_rates_by_date = currency_rates.get_or_load(date, lambda: load(date), ttl)
+            if currency_rates_by_date is None:
+                add_missing_rate_date(date)
+                return None
+            if resolve_date is not None and resolve_date(date) != date:
+                # inner reported another effective date, other dates of it share these rates
+                currency_rates.put(resolve_date(date), currency_rates_by_date, ttl)
+
+        if currency_code in currency_rates_by_date:
             logger.debug(f"wrapper in get_currency_rate {log_ok_str}")
-            return currency_rates_by_inner[currency_code]
+            return currency_rates_by_date[currency_code]
         logger.warning(
-            f"get_currency_rates didn't find {currency_code} in {currency_rates} at {date}"
+            f"get_currency_rates didn't find {currency_code} in {currency_rates_by_date} at {date}"
         )
+        add_missing_rate_date(date)
         return None
 
     return wrapper
 
 
-@get_currency_rates
+def get_rate_cache_stats() -> dict[str, RateCacheStats]:
+    """statistics of in-memory rate caches by provider"""
+
+    return {provider: rate_cache.get_stats() for provider, rate_cache in rate_caches.items()}
+
+
+@partial(get_currency_rates, resolve_date=rate_calendar.resolve)
 def get_currency_rates_by_cbr(date: datetime.date) -> dict[str, float] | None:
     """get currency rates by cbr.ru
     url example: 'https://cbr.ru/scripts/XML_daily.asp?date_req=21/03/2002'
     API returned XML data, where 'Valute' tag contents:
-    'CharCode' as currency code, 'VunitRate' as currency rate"""
+    'CharCode' as currency code, 'VunitRate' as currency rate.
+    The 'Date' attribute of the root is the effective date of the rates,
+    it is learned by rates.rate_calendar if it differs from the date."""
 
     # get XML data
-    url = f'https://cbr.ru/scripts/XML_daily.asp?date_req={date.strftime("%d/%m/%Y")}'
+    url = f'{cbr_url}/XML_daily.asp?date_req={date.strftime("%d/%m/%Y")}'
 
-    xml_data: ET.Element = ET.Element("Empty")
+    # get currency rates from xml data
+    currency_rates: dict[str, float] = dict()
     try:
-        req = requests.get(url)
-        xml_data = ET.fromstring(req.content)
-
+        req = http_get(url)
+        rate_date: datetime.date | None = None
+        for rate_date, charcode, rate in iter_cbr_rates([req.content]):
+            currency_rates[charcode] = rate
+        if rate_date is not None:
+            rate_calendar.learn(date, rate_date)
     except Exception as e:
         logger.error(f"get_currency_rates_by_cbr was executed with error: {e}")
         return None
+    logger.debug(f"get_currency_rates_by_cbr {log_ok_str}")
+    return currency_rates
 
-    # get currency rates from xml data
-    currency_rates: dict[str, float] = dict()
+
+def get_cbr_rate(element: ET.Element) -> float | None:
+    """the rate of 'Valute' or 'Record' element: 'VunitRate' or 'Value' of 'Nominal' units"""
+
+    unit_rate = element.find("VunitRate")
+    if unit_rate is not None:
+        return float(str(unit_rate.text).replace(",", "."))
+    value = element.find("Value")
+    nominal = element.find("Nominal")
+    if value is not None and nominal is not None:
+        return float(str(value.text).replace(",", ".")) / float(str(nominal.text))
+    return None
+
+
+def iter_cbr_rates(
+    chunks: Iterable[bytes | str], currency_code: str | None = None
+) -> Iterator[tuple[datetime.date | None, str, float]]:
+    """parse CBR XML answer chunk by chunk and yield (date, currency code, rate):
+    'Valute' of XML_daily.asp has the date of 'Date' attribute of the root (None if missing) and 'CharCode',
+    'Record' of XML_dynamic.asp has 'Date' attribute and currency_code (or 'Id' attribute).
+    Parsed elements are cleared, so the whole tree isn't kept in memory. Bad XML raises ParseError."""
+
+    parser: ET.XMLPullParser[ET.Element] = ET.XMLPullParser(events=("start", "end"))
+    root: ET.Element | None = None
+    root_date: datetime.date | None = None
+
+    def read_rates() -> Iterator[tuple[datetime.date | None, str, float]]:
+        nonlocal root, root_date
+        for parsed in parser.read_events():
+            event, element = parsed[0], parsed[-1]
+            if not isinstance(element, ET.Element):
+                continue
+            if event == "start":
+                if root is None:
+                    root = element
+                    if element.get("Date") is not None:
+                        root_date = datetime.datetime.strptime(str(element.get("Date")), "%d.%m.%Y").date()
+                continue
+            if element.tag == "Valute":
+                charcode = element.find("CharCode")
+                rate = get_cbr_rate(element)
+                if charcode is not None and rate is not None:
+                    yield root_date, str(charcode.text), rate
+            elif element.tag == "Record":
+                rate = get_cbr_rate(element)
+                if rate is not None:
+                    record_date = datetime.datetime.strptime(str(element.get("Date")), "%d.%m.%Y").date()
+                    yield record_date, currency_code or str(element.get("Id")), rate
+            else:
+                continue
+            element.clear()
+            if root is not None:
+                root.clear()  # the root keeps references to parsed elements
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from read_rates()
+    parser.close()
+    yield from read_rates()
+
+
+def get_cbr_currency_id(currency_code: str) -> str | None:
+    """CBR internal currency id (VAL_NM_RQ) by currency code,
+    unknown codes are looked up in the CBR currency list 'XML_val.asp?d=0'.
+    Codes which weren't found are remembered for rate_negative_ttl seconds like failed loads of RateCache."""
+
+    if currency_code in cbr_currency_ids:
+        return cbr_currency_ids[currency_code]
+    failed_at = cbr_unknown_ids.get(currency_code)
+    if failed_at is not None and time.monotonic() - failed_at < rate_negative_ttl:
+        return None
     try:
-        for valute in xml_data.iter("Valute"):
-            charcode = valute.find("CharCode")
-            rate = valute.find("VunitRate")
-            if (charcode is not None) and (rate is not None):
-                rate_float = float(str(rate.text).replace(",", "."))
-                currency_rates[str(charcode.text)] = rate_float
+        req = http_get(f"{cbr_url}/XML_val.asp?d=0")
+        for item in ET.fromstring(req.content).iter("Item"):
+            char_code = item.find("ISO_Char_Code")
+            if char_code is not None and char_code.text:
+                cbr_currency_ids[char_code.text.strip()] = str(item.get("ID")).strip()
     except Exception as e:
-        logger.error(f"get_currency_rates_by_cbr getting error: {e}")
+        logger.error(f"get_cbr_currency_id was executed with error: {e}")
+        cbr_unknown_ids[currency_code] = time.monotonic()
         return None
-    logger.debug(f"get_currency_rates_by_cbr {log_ok_str}")
+    if currency_code not in cbr_currency_ids:
+        cbr_unknown_ids[currency_code] = time.monotonic()
+        return None
+    cbr_unknown_ids.pop(currency_code, None)
+    return cbr_currency_ids[currency_code]
+
+
+def get_currency_rates_range_by_cbr(
+    currency_code: str, date_start: datetime.date, date_end: datetime.date
+) -> dict[datetime.date, float] | None:
+    """get rates of one currency for every calendar date from date_start to date_end by one request,
+    url example: 'https://cbr.ru/scripts/XML_dynamic.asp?date_req1=01/03/2001&date_req2=14/03/2001&VAL_NM_RQ=R01235'
+    API returned XML data with 'Record' tag for every date when the rate was set:
+    'Date' attribute, 'VunitRate' (or 'Value' of 'Nominal' units) as currency rate.
+    A date without record has the rate of the last record before it.
+    The answer is parsed while it is downloaded (see iter_cbr_rates)."""
+
+    currency_id = get_cbr_currency_id(currency_code)
+    if currency_id is None:
+        logger.warning(f"get_currency_rates_range_by_cbr didn't find CBR id of {currency_code}")
+        return None
+
+    # the rate of the first dates is set before the range
+    request_start = date_start - datetime.timedelta(days=cbr_range_lookback_days)
+    url = (
+        f"{cbr_url}/XML_dynamic.asp?date_req1={request_start.strftime('%d/%m/%Y')}"
+        f"&date_req2={date_end.strftime('%d/%m/%Y')}&VAL_NM_RQ={currency_id}"
+    )
+    set_rates: dict[datetime.date, float] = dict()
+    try:
+        req = http_get(url, stream=True)
+        with req:
+            for record_date, _, rate in iter_cbr_rates(req.iter_content(cbr_stream_chunk_size), currency_code):
+                if record_date is not None:
+                    set_rates[record_date] = rate
+    except Exception as e:
+        logger.error(f"get_currency_rates_range_by_cbr was executed with error: {e}")
+        return None
+
+    currency_rates: dict[datetime.date, float] = dict()
+    last_rate: float | None = None
+    date = request_start
+    while date <= date_end:
+        last_rate = set_rates.get(date, last_rate)
+        if date >= date_start and last_rate is not None:
+            currency_rates[date] = last_rate
+        date += datetime.timedelta(days=1)
+    logger.debug(f"get_currency_rates_range_by_cbr {log_ok_str}")
     return currency_rates
 
 
+def fill_currency_rates_by_cbr(
+    currency_codes: Iterable[str], date_start: datetime.date, date_end: datetime.date
+) -> int:
+    """fill the rate store with rates of currencies from date_start to date_end
+    by one request per currency, get_currency_rates_by_cbr finds them without requests.
+    Currencies which have all past dates of the range in the store aren't requested.
+    Returns count of saved rates, only past dates are saved."""
+
+    rate_store = get_rate_store()
+    if rate_store is None:
+        return 0
+    past_date_end = min(date_end, datetime.date.today() - datetime.timedelta(days=1))
+    past_days = (past_date_end - date_start).days + 1
+    saved = 0
+    for currency_code in set(currency_codes) - {"RUB"}:
+        if past_days <= 0:
+            break
+        stored_rates = rate_store.get_rate_series(CBR_PROVIDER, currency_code, date_start, past_date_end)
+        if len(stored_rates) == past_days:
+            continue
+        currency_rates = get_currency_rates_range_by_cbr(currency_code, date_start, date_end)
+        if currency_rates is None:
+            continue
+        rate_store.save_rate_series(CBR_PROVIDER, currency_code, currency_rates)
+        saved += len(currency_rates)
+    logger.debug(f"fill_currency_rates_by_cbr {log_ok_str}, rates: {saved}")
+    return saved
+
+
+def get_rate_pairs(
+    data: pd.DataFrame, currency_column: str = "Валюта платежа", date_column: str = PAYMENT_DATE_COLUMN
+) -> list[tuple[str, datetime.date]]:
+    """distinct pairs (currency, date) which need conversion to RUB, date_column has to be datetime64"""
+
+    pairs = data[[currency_column, date_column]].dropna().drop_duplicates()
+    return [
+        (str(currency_code), pd.Timestamp(payment_date).date())
+        for currency_code, payment_date in pairs.itertuples(index=False)
+        if currency_code != "RUB"
+    ]
+
+
+async def prefetch_currency_rates_async(
+    pairs: Iterable[tuple[str, datetime.date]], get_currency_rate: OUTER, concurrency: int
+) -> int:
+    """get rates of pairs concurrently, at most 'concurrency' requests at the same time"""
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(currency_code: str, date: datetime.date) -> None:
+        async with semaphore:
+            await asyncio.to_thread(get_currency_rate, currency_code, date)
+
+    tasks = [fetch(currency_code, date) for currency_code, date in pairs]
+    await asyncio.gather(*tasks)
+    return len(tasks)
+
+
+def prefetch_currency_rates(
+    pairs: Iterable[tuple[str, datetime.date]],
+    get_currency_rate: OUTER,
+    concurrency: int | None = None,
+) -> int:
+    """get rates of pairs (currency, date) before conversion, so exchange_frame finds them cached.
+    One request of a date gives rates of all currencies, so only one pair of every date is fetched,
+    dates are fetched concurrently by asyncio. Returns count of fetched dates."""
+
+    pairs_by_date: dict[datetime.date, str] = dict()
+    for currency_code, date in pairs:
+        if currency_code != "RUB":
+            pairs_by_date.setdefault(date, currency_code)
+    date_pairs = [(currency_code, date) for date, currency_code in pairs_by_date.items()]
+    if concurrency is None:
+        concurrency = prefetch_concurrency
+    try:
+        fetched = asyncio.run(prefetch_currency_rates_async(date_pairs, get_currency_rate, max(concurrency, 1)))
+    except Exception as e:
+        logger.error(f"prefetch_currency_rates was executed with error: {e}")
+        return 0
+    logger.debug(f"prefetch_currency_rates {log_ok_str}, dates: {fetched}")
+    return fetched
+
+
 def mask_card(card_number: str) -> str:
     """masking card number by template 'XXXX',
     where XXXX is last 4 digits of the card number"""
@@ -2,15 +2,25 @@ import datetime
 import json
 import logging
 import os
-from collections.abc import Callable
-from typing import TypedDict
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, TypedDict, TypeVar, cast
 
 import pandas as pd
-import requests
 from dotenv import load_dotenv
 
-from src.utils import (exchange, get_currency_rates_by_cbr, get_user_settings,
-                       mask_card, read_excel)
+from src.http_client import http_get
+from src.rates import get_rates_version
+from src.stock_cache import get_stock_cache
+from src.transactions import (ROLLUP_KEYS, ROLLUP_SUMS, TOP_COLUMNS,
+                              Transactions, format_date, get_payment_dates)
+from src.utils import (FRAMES, exchange_frame, fill_currency_rates_by_cbr,
+                       get_currency_rates_by_cbr, get_file_fingerprint,
+                       get_rate_pairs, get_user_settings, has_missing_rates,
+                       iter_json_array, iter_window, load_transactions,
+                       mask_card, prefetch_currency_rates)
 
 log_file = "logs/views.log"
 log_ok_str = "was executed without errors"
@@ -27,6 +37,30 @@ logger.setLevel(logging.DEBUG)
 
 INNER = Callable[[datetime.date], dict[str, float] | None]
 OUTER = Callable[[str, datetime.date], float | None]
+T = TypeVar("T")
+STOCKS = Callable[[list[str]], dict[str, float] | None]
+stocks_url = "https://financialmodelingprep.com/api/v3"
+stocks_chunk_size = 64 * 1024  # bytes of the stock list parsed at once
+top_k = 5  # transactions of get_top_transactions
+main_page_workers = 5  # threads of main_page sections in the concurrent mode
+main_page_budget = 10.0  # seconds, the upper bound of main_page in the concurrent mode
+section_deadlines = {  # seconds from the start of main_page
+    "cards": 10.0,
+    "top_transactions": 10.0,
+    "currency_rates": 5.0,
+    "stock_prices": 5.0,
+}
+workbook_file = "data/operations.xlsx"
+user_settings_file = "user_settings.json"
+LOCAL_SECTIONS = ("cards", "top_transactions")
+MARKET_SECTIONS = ("currency_rates", "stock_prices")
+market_memo_ttl = 60.0  # seconds while memoized currency rates and stock prices are used
+main_page_memo_size = 256
+main_page_memo: dict[tuple[Any, ...], tuple[dict[str, Any], float]] = dict()  # (values, saved at) by key
+main_page_memo_lock = threading.Lock()
+last_sections_size = 256  # last values of main_page sections by (section, date), see get_section_key
+last_sections: dict[tuple[str, datetime.date | None], Any] = dict()
+last_sections_lock = threading.Lock()
 CardType = TypedDict(
     "CardType", {"last_digits": str, "total_spent": float, "cashback": float}
 )
@@ -53,14 +87,24 @@ SandP500 = TypedDict(
         "price": float,
     },
 )
+CachedStock = TypedDict(
+    "CachedStock",
+    {
+        "stock": str,
+        "price": float,
+        "age": int,
+    },
+)
 TransactionInfo = TypedDict(
     "TransactionInfo",
     {
         "greeting": str,
-        "cards": list[CardType],
-        "top_transactions": list[Transaction],
-        "currency_rates": list[Currency],
-        "stock_prices": list[SandP500],
+        "cards": list[CardType] | None,
+        "top_transactions": list[Transaction] | None,
+        "currency_rates": list[Currency] | None,
+        "stock_prices": list[CachedStock] | None,
+        "timings": dict[str, float],
+        "sections": dict[str, str],
     },
 )
 
@@ -87,132 +131,284 @@ def greeting(time: datetime.time) -> str:
     return good_evening
 
 
+def get_card_list(cards_sum: pd.DataFrame) -> list[CardType]:
+    """cards by the frame of 'amount' and 'cashback' sums in RUB indexed by card number"""
+
+    cards: list[CardType] = list()
+    for k, v in cards_sum.to_dict("index").items():
+        cards.append(
+            {
+                "last_digits": mask_card(str(k)),
+                "total_spent": -v["amount"],
+                "cashback": v["cashback"],
+            }
+        )
+    return cards
+
+
+def get_transaction_list(top_data: pd.DataFrame) -> list[Transaction]:
+    """transactions by the frame of TOP_COLUMNS rows"""
+
+    transactions: list[Transaction] = list()
+    top_dict = top_data.rename(
+        columns={
+            "Дата платежа": "date",
+            "Сумма платежа": "amount",
+            "Категория": "category",
+            "Описание": "description",
+        }
+    ).to_dict("records")
+    for row in top_dict:
+        transactions.append(
+            {
+                "date": format_date(row["date"]),
+                "amount": row["amount"],
+                "category": row["category"],
+                "description": row["description"],
+            }
+        )
+    return transactions
+
+
+def iter_card_spending(df: FRAMES, date_start: datetime.date, date_end: datetime.date) -> Iterator[pd.DataFrame]:
+    """spending of cards from date_start to date_end by ROLLUP_KEYS and ROLLUP_SUMS columns:
+    rows of the card rollup by day for prepared transactions (see Transactions.card_window),
+    filtered transactions for the whole DataFrame or the batches of DataFrame"""
+
+    if isinstance(df, Transactions):
+        card_window = df.card_window(date_start, date_end)
+        if card_window is not None:
+            yield card_window
+            return
+    for window_data in iter_window(df, date_start, date_end):
+        yield window_data.loc[
+            (window_data["Сумма платежа"] < 0) & (window_data["Статус"] == "OK"),
+            ROLLUP_KEYS + ROLLUP_SUMS,
+        ]
+
+
 def get_cards_info(
-    df: pd.DataFrame, date: datetime.date, get_currency_rate: OUTER
+    df: FRAMES, date: datetime.date, get_currency_rate: OUTER
 ) -> list[CardType]:
-    """getting list of number card and total spent"""
+    """getting list of number card and total spent, df is the whole DataFrame,
+    prepared transactions (see load_transactions) or the batches of DataFrame (see read_excel_chunks).
+    Prepared transactions are summed by the card rollup, so the cost depends on
+    the number of cards and days, not on the number of transactions"""
+
+    return get_cards_info_status(df, date, get_currency_rate)[1]
+
+
+def get_cards_info_status(
+    df: FRAMES, date: datetime.date, get_currency_rate: OUTER
+) -> tuple[bool, list[CardType]]:
+    """(True, cards) of get_cards_info or (False, cards) if a rate wasn't got or getting cards failed:
+    such cards are incomplete, so main_page doesn't memoize them"""
 
     cards: list[CardType] = list()
+    complete = True
     try:
         date_end = date
         date_start = date.replace(day=1)
-        df["payment_date"] = pd.to_datetime(df["Дата платежа"], format='%d.%m.%Y').dt.date
-        transactions_data = df.loc[
-            (df["payment_date"] >= date_start)
-            & (df["payment_date"] <= date_end)
-            & (df["Сумма платежа"] < 0)
-            & (df["Статус"] == "OK"),
-            [
-                "Номер карты",
-                "Сумма платежа",
-                "Валюта платежа",
-                "Дата платежа",
-                "payment_date",
-                "Кэшбэк",
-            ],
-        ]
-        if transactions_data.empty:
-            logger.warning("get_cards_info got empty dataframe after filtering")
-            return cards
-        transactions_data["amount"] = transactions_data.apply(
-            lambda x: exchange(
-                x["Сумма платежа"],
-                x["Валюта платежа"],
-                x["payment_date"],
-                get_currency_rate,
-            ),
-            axis=1,
-        )
-        transactions_data["cashback"] = transactions_data.apply(
-            lambda x: exchange(
-                x["Кэшбэк"], x["Валюта платежа"], x["payment_date"], get_currency_rate
-            ),
-            axis=1,
-        )
-        grouped = transactions_data[["Номер карты", "amount", "cashback"]].groupby(
-            "Номер карты"
-        )
-        cards_sum = grouped.sum().to_dict("index")
-        for k, v in cards_sum.items():
-            cards.append(
-                {
-                    "last_digits": mask_card(str(k)),
-                    "total_spent": -v["amount"],
-                    "cashback": v["cashback"],
-                }
+        cards_sum: pd.DataFrame | None = None
+        for transactions_data in iter_card_spending(df, date_start, date_end):
+            if transactions_data.empty:
+                continue
+            amounts_rub = exchange_frame(transactions_data, ["Сумма платежа", "Кэшбэк"], get_currency_rate)
+            complete = complete and not has_missing_rates(transactions_data, amounts_rub)
+            transactions_data = transactions_data.assign(
+                amount=amounts_rub["Сумма платежа"], cashback=amounts_rub["Кэшбэк"]
+            )
+            grouped = transactions_data[["Номер карты", "amount", "cashback"]].groupby(
+                "Номер карты", observed=True
             )
+            chunk_sum = grouped.sum()
+            chunk_sum.index = chunk_sum.index.astype(str)  # batches have different categories
+            cards_sum = chunk_sum if cards_sum is None else cards_sum.add(chunk_sum, fill_value=0)
+        if cards_sum is None:
+            logger.warning("get_cards_info got empty dataframe after filtering")
+            return complete, cards
+        cards = get_card_list(cards_sum)
         logger.debug(f"get_cards_info {log_ok_str}")
     except Exception as e:
         logger.error(f"get_cards_info was executed with error: {e}")
-    return cards
+        complete = False
+    return complete, cards
+
+
+def iter_top_candidates(
+    df: FRAMES, date_start: datetime.date, date_end: datetime.date, k: int
+) -> Iterator[pd.DataFrame]:
+    """candidates of top k transactions from date_start to date_end by TOP_COLUMNS columns:
+    the top candidates for prepared transactions (see Transactions.top_window),
+    transactions with status OK for the whole DataFrame or the batches of DataFrame"""
+
+    if isinstance(df, Transactions):
+        top_window = df.top_window(date_start, date_end, k)
+        if top_window is not None:
+            yield top_window
+            return
+    for window_data in iter_window(df, date_start, date_end):
+        yield window_data.loc[window_data["Статус"] == "OK", TOP_COLUMNS]
 
 
 def get_top_transactions(
-    df: pd.DataFrame, date: datetime.date, get_currency_rate: OUTER
+    df: FRAMES, date: datetime.date, get_currency_rate: OUTER, k: int | None = None
 ) -> list[Transaction]:
-    """getting top 5 transactions by 'Сумма платежа'"""
+    """getting top k (top_k by default) transactions by 'Сумма платежа', df is the whole DataFrame,
+    prepared transactions (see load_transactions) or the batches of DataFrame (see read_excel_chunks).
+    Rows are selected by nlargest in O(n), prepared transactions are read from the top candidates,
+    so at most k rows by day and currency are exchanged"""
+
+    return get_top_transactions_status(df, date, get_currency_rate, k)[1]
+
+
+def get_top_transactions_status(
+    df: FRAMES, date: datetime.date, get_currency_rate: OUTER, k: int | None = None
+) -> tuple[bool, list[Transaction]]:
+    """(True, transactions) of get_top_transactions or (False, transactions) if a rate wasn't got
+    or getting transactions failed: such transactions are incomplete, so main_page doesn't memoize them"""
 
     transactions: list[Transaction] = list()
+    complete = True
+    if k is None:
+        k = top_k
 
     try:
         date_end = date
         date_start = date.replace(day=1)
-        df["payment_date"] = pd.to_datetime(df["Дата платежа"], format='%d.%m.%Y').dt.date
-        transactions_data = df.loc[
-            (df["payment_date"] >= date_start)
-            & (df["payment_date"] <= date_end)
-            & (df["Статус"] == "OK"),
-            [
-                "Сумма платежа",
-                "Валюта платежа",
-                "Дата платежа",
-                "payment_date",
-                "Категория",
-                "Описание",
-            ],
-        ]
-        print(transactions_data)
-        print(transactions_data.empty)
-        if transactions_data.empty:
+        top_transactions_data: pd.DataFrame | None = None
+        for transactions_data in iter_top_candidates(df, date_start, date_end, k):
+            if transactions_data.empty:
+                continue
+            amounts_rub = exchange_frame(transactions_data, ["Сумма платежа"], get_currency_rate)
+            complete = complete and not has_missing_rates(transactions_data, amounts_rub)
+            transactions_data = transactions_data.assign(amount_rub=amounts_rub["Сумма платежа"].abs())
+            if top_transactions_data is not None:
+                transactions_data = pd.concat([top_transactions_data, transactions_data])
+            top_transactions_data = transactions_data.nlargest(k, "amount_rub", keep="first")
+        if top_transactions_data is None:
             logger.warning("get_top_transactions got empty dataframe after filtering.")
-            return transactions
-        transactions_data["amount_rub"] = transactions_data.apply(
-            lambda x: exchange(
-                x["Сумма платежа"],
-                x["Валюта платежа"],
-                x["payment_date"],
-                get_currency_rate,
-            ),
-            axis=1,
-        )
-        transactions_data["amount_rub"] = abs(transactions_data["amount_rub"])
-        top5_transactions = (
-            transactions_data.rename(
-                columns={
-                    "Дата платежа": "date",
-                    "Сумма платежа": "amount",
-                    "Категория": "category",
-                    "Описание": "description",
-                }
-            )
-            .sort_values("amount_rub", ascending=False)
-            .head(5)
-        )
-        top5_dict = top5_transactions.to_dict("records")
-        for row in top5_dict:
-            transactions.append(
-                {
-                    "date": row["date"],
-                    "amount": row["amount"],
-                    "category": row["category"],
-                    "description": row["description"],
-                }
-            )
+            return complete, transactions
+        transactions = get_transaction_list(top_transactions_data)
         logger.debug(f"get_top_transactions {log_ok_str}")
     except Exception as e:
         logger.error(f"get_top_transactions was executed with error: {e}")
+        complete = False
 
-    return transactions
+    return complete, transactions
+
+
+def get_dates(date_start: datetime.date, date_end: datetime.date) -> list[datetime.date]:
+    """dates from date_start to date_end inclusive"""
+
+    return [date_start + datetime.timedelta(days=day) for day in range((date_end - date_start).days + 1)]
+
+
+def get_cards_info_range(
+    df: FRAMES, date_start: datetime.date, date_end: datetime.date, get_currency_rate: OUTER
+) -> dict[datetime.date, list[CardType]]:
+    """cards info (see get_cards_info) for every date from date_start to date_end by one pass:
+    spending is exchanged once, summed by day and card, and month-to-date sums of every date
+    are cumulative sums of the days within the month"""
+
+    return get_cards_info_range_status(df, date_start, date_end, get_currency_rate)[1]
+
+
+def get_cards_info_range_status(
+    df: FRAMES, date_start: datetime.date, date_end: datetime.date, get_currency_rate: OUTER
+) -> tuple[bool, dict[datetime.date, list[CardType]]]:
+    """(True, cards by date) of get_cards_info_range or (False, cards by date) if a rate wasn't got
+    or getting cards failed, like get_cards_info_status"""
+
+    cards_by_date: dict[datetime.date, list[CardType]] = {date: list() for date in get_dates(date_start, date_end)}
+    complete = True
+    try:
+        month_start = date_start.replace(day=1)
+        daily_chunks: list[pd.DataFrame] = list()
+        for spending in iter_card_spending(df, month_start, date_end):
+            if spending.empty:
+                continue
+            amounts_rub = exchange_frame(spending, ["Сумма платежа", "Кэшбэк"], get_currency_rate)
+            complete = complete and not has_missing_rates(spending, amounts_rub)
+            daily_chunks.append(
+                pd.DataFrame(
+                    {
+                        "day": get_payment_dates(spending).dt.normalize(),
+                        "card": spending["Номер карты"].astype(object),  # batches have different categories
+                        "amount": amounts_rub["Сумма платежа"],
+                        "cashback": amounts_rub["Кэшбэк"],
+                        "rows": 1,
+                    }
+                )
+            )
+        if len(daily_chunks) == 0:
+            logger.warning("get_cards_info_range got empty dataframe after filtering")
+            return complete, cards_by_date
+        daily = pd.concat(daily_chunks).groupby(["day", "card"]).sum().unstack("card", fill_value=0)
+        days = pd.date_range(month_start, date_end, freq="D")
+        daily = daily.reindex(days, fill_value=0)
+        month_to_date = daily.groupby(days.to_period("M")).cumsum()
+        for date in cards_by_date:
+            totals = cast(pd.DataFrame, month_to_date.loc[pd.Timestamp(date)].unstack(0))
+            cards_by_date[date] = get_card_list(totals[totals["rows"] > 0][["amount", "cashback"]])
+        logger.debug(f"get_cards_info_range {log_ok_str}, dates: {len(cards_by_date)}")
+    except Exception as e:
+        logger.error(f"get_cards_info_range was executed with error: {e}")
+        complete = False
+    return complete, cards_by_date
+
+
+def get_top_transactions_range(
+    df: FRAMES, date_start: datetime.date, date_end: datetime.date, get_currency_rate: OUTER, k: int | None = None
+) -> dict[datetime.date, list[Transaction]]:
+    """top k transactions (see get_top_transactions) for every date from date_start to date_end:
+    candidates are exchanged once and top k of every date is top k of the previous date
+    of the month and the transactions of the date"""
+
+    return get_top_transactions_range_status(df, date_start, date_end, get_currency_rate, k)[1]
+
+
+def get_top_transactions_range_status(
+    df: FRAMES, date_start: datetime.date, date_end: datetime.date, get_currency_rate: OUTER, k: int | None = None
+) -> tuple[bool, dict[datetime.date, list[Transaction]]]:
+    """(True, transactions by date) of get_top_transactions_range or (False, transactions by date)
+    if a rate wasn't got or getting transactions failed, like get_top_transactions_status"""
+
+    if k is None:
+        k = top_k
+    top_by_date: dict[datetime.date, list[Transaction]] = {date: list() for date in get_dates(date_start, date_end)}
+    complete = True
+    try:
+        month_start = date_start.replace(day=1)
+        candidate_chunks: list[pd.DataFrame] = list()
+        for candidates in iter_top_candidates(df, month_start, date_end, k):
+            if candidates.empty:
+                continue
+            amounts_rub = exchange_frame(candidates, ["Сумма платежа"], get_currency_rate)
+            complete = complete and not has_missing_rates(candidates, amounts_rub)
+            candidate_chunks.append(candidates.assign(amount_rub=amounts_rub["Сумма платежа"].abs()))
+        if len(candidate_chunks) == 0:
+            logger.warning("get_top_transactions_range got empty dataframe after filtering.")
+            return complete, top_by_date
+        candidates = pd.concat(candidate_chunks)
+        candidates = candidates.sort_values("Дата платежа", kind="stable")
+        days = {
+            day.date(): day_candidates
+            for day, day_candidates in candidates.groupby(get_payment_dates(candidates).dt.normalize())
+        }
+        running_top = candidates.iloc[0:0]
+        for date in get_dates(month_start, date_end):
+            if date.day == 1:
+                running_top = candidates.iloc[0:0]
+            if date in days:
+                running_top = pd.concat([running_top, days[date]]).nlargest(k, "amount_rub", keep="first")
+            if date in top_by_date:
+                top_by_date[date] = get_transaction_list(running_top)
+        logger.debug(f"get_top_transactions_range {log_ok_str}, dates: {len(top_by_date)}")
+    except Exception as e:
+        logger.error(f"get_top_transactions_range was executed with error: {e}")
+        complete = False
+    return complete, top_by_date
 
 
 def get_user_prefer_currency_rates(
@@ -232,28 +428,63 @@ def get_user_prefer_currency_rates(
     return rates
 
 
-def get_user_stocks(stocks: list[str]) -> list[SandP500]:
-    """getting S&P500 stocks from https://financialmodelingprep.com/api/v3/stock/list?apikey={api_key}"""
+def get_stock_quotes(stocks: list[str]) -> dict[str, float] | None:
+    """getting prices of the stocks by one batched request
+    https://financialmodelingprep.com/api/v3/quote/AAPL,AMZN?apikey={api_key},
+    returns prices by stock or None if the request was failed"""
+
+    if len(stocks) == 0:
+        return dict()
+    load_dotenv()
+    api_key = os.getenv("APISP500")
+    url = f"{stocks_url}/quote/{','.join(dict.fromkeys(stocks))}?apikey={api_key}"
+    resp = http_get(url)
+    if not resp.ok:
+        logger.warning(f"get_stock_quotes was executed with error get data from {url}: {resp.text}")
+        return None
+    user_stocks = set(stocks)
+    prices = {str(quote["symbol"]): float(quote["price"]) for quote in resp.json() if quote["symbol"] in user_stocks}
+    logger.debug(f"get_stock_quotes {log_ok_str}")
+    return prices
+
+
+def get_stock_list_prices(stocks: list[str]) -> dict[str, float] | None:
+    """getting prices of the stocks from the list of all stocks
+    https://financialmodelingprep.com/api/v3/stock/list?apikey={api_key}.
+    The list is parsed item by item while it is downloaded (see utils.iter_json_array)
+    and the download is stopped when all stocks are found.
+    Returns prices by stock or None if the request was failed"""
+
+    load_dotenv()
+    api_key = os.getenv("APISP500")
+    url = f"{stocks_url}/stock/list?apikey={api_key}"
+    user_stocks = set(stocks)
+    prices: dict[str, float] = dict()
+    with http_get(url, stream=True) as resp:
+        if not resp.ok:
+            logger.warning(f"get_stock_list_prices was executed with error get data from {url}: {resp.text}")
+            return None
+        for symbol in iter_json_array(resp.iter_content(stocks_chunk_size)):
+            if symbol["symbol"] in user_stocks:
+                prices[str(symbol["symbol"])] = float(symbol["price"])
+                if len(prices) == len(user_stocks):
+                    break
+    logger.debug(f"get_stock_list_prices {log_ok_str}")
+    return prices
 
-    user_stocks: list[SandP500] = list()
-    try:
-        load_dotenv()
-        api_key = os.getenv("APISP500")
 
-        url = f"https://financialmodelingprep.com/api/v3/stock/list?apikey={api_key}"
-        resp = requests.get(url)
+def get_user_stocks(stocks: list[str], get_stock_prices: STOCKS = get_stock_quotes) -> list[SandP500]:
+    """getting S&P500 stocks prices by get_stock_prices (get_stock_quotes or get_stock_list_prices)
+    in the order of the stocks, empty list if it was executed with errors"""
 
-        if not resp.ok:
-            logger.warning(
-                f"get_user_stocks was executed with error get data from {url}: {resp.json()}"
-            )
+    user_stocks: list[SandP500] = list()
+    try:
+        prices = get_stock_prices(stocks)
+        if prices is None:
             return user_stocks
-
-        stocks_data = resp.json()
-        for symbol in stocks_data:
-            stock = symbol["symbol"]
-            if stock in stocks:
-                user_stocks.append({"stock": stock, "price": float(symbol["price"])})
+        for stock in dict.fromkeys(stocks):
+            if stock in prices:
+                user_stocks.append({"stock": stock, "price": prices[stock]})
         logger.debug(f"get_user_stocks {log_ok_str}")
     except Exception as e:
         logger.error(f"get_user_stocks was executed with error: {e}")
@@ -261,8 +492,142 @@ def get_user_stocks(stocks: list[str]) -> list[SandP500]:
     return user_stocks
 
 
-def main_page(date_str: str = "") -> str:
-    """get date by str with format 'YYYY-MM-DD HH:MM:SS'
+def get_cached_user_stocks(stocks: list[str], get_stock_prices: STOCKS = get_stock_quotes) -> list[CachedStock]:
+    """getting S&P500 stocks prices by the shared stock cache (see stock_cache.StockCache):
+    fresh prices are got without requests, stale prices are returned at once and refreshed in the background.
+    'age' is seconds since the price was got."""
+
+    user_stocks: list[CachedStock] = list()
+    try:
+        prices = get_stock_cache().get_prices(list(dict.fromkeys(stocks)), get_stock_prices)
+        for stock, (price, age) in prices.items():
+            user_stocks.append({"stock": stock, "price": price, "age": int(age)})
+        logger.debug(f"get_cached_user_stocks {log_ok_str}")
+    except Exception as e:
+        logger.error(f"get_cached_user_stocks was executed with error: {e}")
+
+    return user_stocks
+
+
+def timed_call(timings: dict[str, float], name: str, function: Callable[..., T], *args: Any) -> T:
+    """call the function and save its time in seconds to timings by name"""
+
+    start = time.perf_counter()
+    try:
+        return function(*args)
+    finally:
+        timings[name] = round(time.perf_counter() - start, 4)
+
+
+def prefetch_month_rates(df: Transactions, date: datetime.date, date_start: datetime.date | None = None) -> None:
+    """fill and prefetch rates of currencies of the month transactions till the date,
+    the months from the month of date_start if it is given"""
+
+    month_start = (date if date_start is None else date_start).replace(day=1)
+    month_data = df.window(month_start, date)
+    if "Валюта платежа" in month_data.columns:
+        month_currencies = [str(currency) for currency in month_data["Валюта платежа"].dropna().unique()]
+        fill_currency_rates_by_cbr(month_currencies, month_start, date)
+        prefetch_currency_rates(get_rate_pairs(month_data), get_currency_rates_by_cbr)
+
+
+def load_month_transactions(
+    date: datetime.date, timings: dict[str, float], transactions: Transactions | None = None
+) -> Transactions:
+    """load transactions (if they aren't prepared yet) and prefetch rates of the month of the date"""
+
+    df = transactions
+    if df is None:
+        df = timed_call(timings, "transactions", load_transactions, workbook_file)
+    timed_call(timings, "month_rates", prefetch_month_rates, df, date)
+    return df
+
+
+def get_section_key(name: str, date: datetime.date) -> tuple[str, datetime.date | None]:
+    """the key of the last value of main_page section: currency rates and stock prices
+    don't depend on the date, so they are kept by the name only"""
+
+    return (name, None) if name in MARKET_SECTIONS else (name, date)
+
+
+def save_section(name: str, date: datetime.date, value: Any) -> None:
+    """save the last value of main_page section for the date"""
+
+    key = get_section_key(name, date)
+    with last_sections_lock:
+        last_sections.pop(key, None)
+        last_sections[key] = value
+        while len(last_sections) > last_sections_size:
+            del last_sections[next(iter(last_sections))]
+
+
+def get_section(name: str, date: datetime.date) -> tuple[bool, Any]:
+    """(True, the last value) of main_page section for the date or (False, None)"""
+
+    key = get_section_key(name, date)
+    with last_sections_lock:
+        if key in last_sections:
+            return True, last_sections[key]
+    return False, None
+
+
+def get_local_memo_key(date: datetime.date, transactions: Transactions | None = None) -> tuple[Any, ...]:
+    """the key of memoized cards and top transactions: they depend on the transactions, rates and top_k.
+    Prepared transactions are identified by their version, otherwise the workbook by its fingerprint"""
+
+    if transactions is not None:
+        source: Any = ("transactions", transactions.version)
+    else:
+        source = get_file_fingerprint(workbook_file)
+    return ("local", date, source, get_rates_version(), top_k)
+
+
+def get_market_memo_key() -> tuple[Any, ...]:
+    """the key of memoized currency rates and stock prices: they depend on user settings, today and rates"""
+
+    return ("market", datetime.date.today(), get_file_fingerprint(user_settings_file), get_rates_version())
+
+
+def save_memo(key: tuple[Any, ...], values: dict[str, Any]) -> None:
+    """memoize values of main_page sections by the key"""
+
+    with main_page_memo_lock:
+        main_page_memo.pop(key, None)
+        main_page_memo[key] = (values, time.monotonic())
+        while len(main_page_memo) > main_page_memo_size:
+            del main_page_memo[next(iter(main_page_memo))]
+
+
+def get_memo(key: tuple[Any, ...], ttl: float | None = None) -> dict[str, Any] | None:
+    """memoized values of main_page sections by the key or None, values older than ttl seconds are expired"""
+
+    with main_page_memo_lock:
+        if key not in main_page_memo:
+            return None
+        values, saved_at = main_page_memo[key]
+        if ttl is not None and time.monotonic() - saved_at >= ttl:
+            del main_page_memo[key]
+            return None
+        return values
+
+
+def main_page(
+    date_str: str = "", concurrent: bool = True, memo: bool = True, transactions: Transactions | None = None
+) -> str:
+    """get date by str with format 'YYYY-MM-DD HH:MM:SS',
+    rates of the month are filled and prefetched before cards and top transactions are got.
+    In the concurrent mode currency rates and stock prices are got by the thread pool
+    while the workbook is loading, cards and top transactions are got in parallel after it,
+    concurrent=False runs the sections one by one. 'timings' are seconds of every section.
+    In the concurrent mode every section waits till its deadline (section_deadlines, but not
+    longer than main_page_budget from the start): a section which missed it or failed gets
+    the last value of the section for the date or null, 'sections' tells "ok", "cached" or "unavailable".
+    Sections are memoized (memo=False gets them again): cards and top transactions by the date,
+    the workbook, the rates version and top_k if all their rates were got, currency rates and
+    stock prices by today, user settings and the rates version for market_memo_ttl seconds.
+    Memoized sections are "memoized" in 'sections'.
+    transactions are prepared transactions of workbook_file kept in memory (see main.HotTransactions),
+    the workbook is loaded if they are None.
     returns json data:
     {
         "greeting": "Добрый день",
@@ -291,49 +656,240 @@ def main_page(date_str: str = "") -> str:
             {
                 "stock": "AMZN":
                 "price": 3173.18,
+                "age": 12,
             },
         ],
+        "timings": {
+            "currency_rates": 0.1,
+            "stock_prices": 0.2,
+            "transactions": 0.3,
+            "month_rates": 0.1,
+            "cards": 0.05,
+            "top_transactions": 0.05,
+            "total": 0.5,
+        },
+        "sections": {
+            "cards": "ok",
+            "top_transactions": "ok",
+            "currency_rates": "cached",
+            "stock_prices": "unavailable",
+        },
     }"""
 
     json_str = "{}"
     date_now = datetime.datetime.now()
     date = date_now.date()
+    start = time.perf_counter()
+    timings: dict[str, float] = dict()
+    sections: dict[str, str] = dict()
+    executor = ThreadPoolExecutor(main_page_workers, thread_name_prefix="main_page") if concurrent else None
+
+    def submit(function: Callable[..., Any], *args: Any) -> Future[Any]:
+        """run the function in the pool or at once in the sequential mode"""
+
+        if executor is not None:
+            return executor.submit(function, *args)
+        future: Future[Any] = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def start_section(name: str, function: Callable[..., Any], *args: Any) -> Future[Any]:
+        """run the timed section, its value is saved as the last value when it is done"""
+
+        future = submit(timed_call, timings, name, function, *args)
+        future.add_done_callback(
+            lambda done: save_section(name, date, done.result())
+            if not done.cancelled() and done.exception() is None
+            else None
+        )
+        return future
+
+    def collect(name: str, future: Future[Any]) -> Any:
+        """the value of the section, the last value or None if it missed the deadline or failed"""
+
+        timeout = None
+        if executor is not None:
+            section_deadline = start + min(section_deadlines.get(name, main_page_budget), main_page_budget)
+            timeout = max(section_deadline - time.perf_counter(), 0.0)
+        try:
+            value = future.result(timeout)
+            sections[name] = "ok"
+            return value
+        except Exception as e:
+            logger.warning(f"main_page section {name} missed the deadline or failed: {e!r}")
+        found, value = get_section(name, date)
+        sections[name] = "cached" if found else "unavailable"
+        return value
 
     try:
         if date_str != "":
             date = datetime.datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S").date()
         greeting_str = greeting(date_now.time())
 
-        df = read_excel("data/operations.xlsx")
-        cards = get_cards_info(df, date, get_currency_rates_by_cbr)
+        local_values = get_memo(get_local_memo_key(date, transactions)) if memo else None
+        market_values = get_memo(get_market_memo_key(), market_memo_ttl) if memo else None
+        futures: dict[str, Future[Any]] = dict()
+        if market_values is None:
+            user_settings = get_user_settings(user_settings_file)
+            if user_settings is None:
+                logger.error("the main_page was executed with error: can't read user_settings.json")
+                return json_str
+            # network-bound sections don't need the workbook, they run while it is loading
+            futures["currency_rates"] = start_section(
+                "currency_rates",
+                get_user_prefer_currency_rates,
+                user_settings["user_currencies"],
+                get_currency_rates_by_cbr,
+            )
+            futures["stock_prices"] = start_section(
+                "stock_prices", get_cached_user_stocks, user_settings["user_stocks"]
+            )
+        incomplete: set[str] = set()  # local sections without some rates or with errors
 
-        top_transactions = get_top_transactions(
-            df, date, get_currency_rates_by_cbr
-        )
-        user_settings = get_user_settings("user_settings.json")
-        if user_settings is None:
-            logger.error("the main_page was executed with error: can't read user_settings.json")
-            return json_str
-        user_prefer_currencies = user_settings["user_currencies"]
-        currency_rates = get_user_prefer_currency_rates(
-            user_prefer_currencies, get_currency_rates_by_cbr
-        )
+        def get_local_section(name: str, get_status: Callable[..., tuple[bool, Any]]) -> Any:
+            """the value of the local section, the section is incomplete if its status is False"""
 
-        user_stocks = user_settings["user_stocks"]
-        stock_prices = get_user_stocks(user_stocks)
+            complete, value = get_status(transactions_future.result(), date, get_currency_rates_by_cbr)
+            if not complete:
+                incomplete.add(name)
+            return value
+
+        if local_values is None:
+            transactions_future = submit(load_month_transactions, date, timings, transactions)
+            futures["cards"] = start_section("cards", get_local_section, "cards", get_cards_info_status)
+            futures["top_transactions"] = start_section(
+                "top_transactions", get_local_section, "top_transactions", get_top_transactions_status
+            )
+
+        values: dict[str, Any] = dict()
+        for name in LOCAL_SECTIONS + MARKET_SECTIONS:
+            if name in futures:
+                values[name] = collect(name, futures[name])
+                continue
+            memo_values = local_values if name in LOCAL_SECTIONS else market_values
+            values[name] = memo_values[name] if memo_values is not None else None
+            sections[name] = "memoized"
+        # only complete sections got in time are memoized, the keys are got again: rates could be changed
+        if (
+            local_values is None
+            and all(sections[name] == "ok" for name in LOCAL_SECTIONS)
+            and len(incomplete) == 0
+        ):
+            save_memo(get_local_memo_key(date, transactions), {name: values[name] for name in LOCAL_SECTIONS})
+        if market_values is None and all(sections[name] == "ok" for name in MARKET_SECTIONS):
+            save_memo(get_market_memo_key(), {name: values[name] for name in MARKET_SECTIONS})
 
         json_data: TransactionInfo = {
             "greeting": greeting_str,
-            "cards": cards,
-            "top_transactions": top_transactions,
-            "currency_rates": currency_rates,
-            "stock_prices": stock_prices,
+            "cards": values["cards"],
+            "top_transactions": values["top_transactions"],
+            "currency_rates": values["currency_rates"],
+            "stock_prices": values["stock_prices"],
+            "timings": timings.copy(),
+            "sections": sections,
         }
+        json_data["timings"]["total"] = round(time.perf_counter() - start, 4)
 
         json_str = json.dumps(json_data, indent=4, ensure_ascii=False)
-        logger.debug(f"main_page {log_ok_str}")
+        logger.debug(f"main_page {log_ok_str}, timings: {json_data['timings']}, sections: {sections}")
 
     except Exception as e:
         logger.error(f"main_page was executed with error: {e}")
+    finally:
+        if executor is not None:
+            # sections which missed the deadline finish in the background and save their values
+            executor.shutdown(wait=False, cancel_futures=True)
 
     return json_str
+
+
+def main_page_range(
+    date_start_str: str, date_end_str: str, output_dir: str | None = None, transactions: Transactions | None = None
+) -> dict[str, str]:
+    """main page JSON (see main_page) for every date from date_start_str to date_end_str
+    by format 'YYYY-MM-DD', for example to backfill a history view. The workbook is loaded once
+    (if transactions aren't prepared), rates of the months are prefetched once, cards are got for
+    all dates by one vectorized pass (see get_cards_info_range), top transactions incrementally
+    (see get_top_transactions_range). Currency rates and stock prices are of today for every date.
+    'sections' tells "ok", "unavailable" for failed currency rates or stock prices and "incomplete"
+    for cards or top transactions without some rates or which failed (see get_cards_info_range_status).
+    returns JSON by date 'YYYY-MM-DD' and writes every one to output_dir/main_page_YYYY-MM-DD.json
+    if output_dir is given, empty dict if it was executed with errors."""
+
+    pages: dict[str, str] = dict()
+    start = time.perf_counter()
+    timings: dict[str, float] = dict()
+    try:
+        date_start = datetime.datetime.strptime(date_start_str, "%Y-%m-%d").date()
+        date_end = datetime.datetime.strptime(date_end_str, "%Y-%m-%d").date()
+        if date_end < date_start:
+            logger.error(f"main_page_range got date_end {date_end} before date_start {date_start}")
+            return pages
+        df = transactions
+        if df is None:
+            df = timed_call(timings, "transactions", load_transactions, workbook_file)
+        timed_call(timings, "month_rates", prefetch_month_rates, df, date_end, date_start)
+
+        user_settings = get_user_settings(user_settings_file)
+        if user_settings is None:
+            logger.error("the main_page_range was executed with error: can't read user_settings.json")
+            return pages
+        sections: dict[str, str] = dict()
+        values: dict[str, Any] = dict()
+        market_sections: dict[str, Callable[[], Any]] = {
+            "currency_rates": lambda: get_user_prefer_currency_rates(
+                user_settings["user_currencies"], get_currency_rates_by_cbr
+            ),
+            "stock_prices": lambda: get_cached_user_stocks(user_settings["user_stocks"]),
+        }
+        for name, section in market_sections.items():
+            try:
+                values[name] = timed_call(timings, name, section)
+                sections[name] = "ok"
+            except Exception as e:
+                logger.warning(f"main_page_range section {name} failed: {e!r}")
+                values[name] = None
+                sections[name] = "unavailable"
+        cards_complete, cards_by_date = timed_call(
+            timings, "cards", get_cards_info_range_status, df, date_start, date_end, get_currency_rates_by_cbr
+        )
+        top_complete, top_by_date = timed_call(
+            timings,
+            "top_transactions",
+            get_top_transactions_range_status,
+            df,
+            date_start,
+            date_end,
+            get_currency_rates_by_cbr,
+        )
+        sections["cards"] = "ok" if cards_complete else "incomplete"
+        sections["top_transactions"] = "ok" if top_complete else "incomplete"
+        timings["total"] = round(time.perf_counter() - start, 4)
+
+        greeting_str = greeting(datetime.datetime.now().time())
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+        for date in get_dates(date_start, date_end):
+            json_data: TransactionInfo = {
+                "greeting": greeting_str,
+                "cards": cards_by_date[date],
+                "top_transactions": top_by_date[date],
+                "currency_rates": values["currency_rates"],
+                "stock_prices": values["stock_prices"],
+                "timings": timings,
+                "sections": sections,
+            }
+            json_str = json.dumps(json_data, indent=4, ensure_ascii=False)
+            pages[date.isoformat()] = json_str
+            if output_dir is not None:
+                page_file = os.path.join(output_dir, f"main_page_{date.isoformat()}.json")
+                with open(page_file, "w", encoding="utf-8") as f:
+                    f.write(json_str)
+        logger.debug(f"main_page_range {log_ok_str}, dates: {len(pages)}, timings: {timings}")
+    except Exception as e:
+        logger.error(f"main_page_range was executed with error: {e}")
+        return dict()
+    return pages
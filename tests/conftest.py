@@ -0,0 +1,94 @@
+# the conftest module
+import threading
+import time
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from src import (excel_cache, http_client, ingest, rates, stock_cache, utils,
+                 views)
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """every test uses its own cache directory instead of the project cache"""
+
+    monkeypatch.setattr(excel_cache, "cache_dir", str(tmp_path / "cache" / "excel"))
+    monkeypatch.setattr(ingest, "ingest_dir", str(tmp_path / "cache" / "ingest"))
+    monkeypatch.setattr(rates, "rates_db_file", str(tmp_path / "cache" / "rates.sqlite"))
+    monkeypatch.setattr(stock_cache, "stocks_cache_file", str(tmp_path / "cache" / "stocks.json"))
+    monkeypatch.delenv("EXCEL_CACHE", raising=False)
+    monkeypatch.setattr(http_client, "backoff_factor", 0.01)
+    rates.rate_calendar.clear()
+    monkeypatch.setattr(views, "last_sections", dict())
+    monkeypatch.setattr(views, "main_page_memo", dict())
+    monkeypatch.setattr(utils, "cbr_unknown_ids", dict())
+    monkeypatch.setattr(rates, "missing_rate_dates", set())
+    return tmp_path
+
+
+class StandInServer(ThreadingHTTPServer):
+    """local stand-in HTTP server: 'responses' are bodies by path without query,
+    'requests' are requested paths with query, 'failures' are counts of 503 answers
+    before the response by path, 'delays' are seconds before the answer by path"""
+
+    responses: dict[str, str]
+    requests: list[str]
+    failures: dict[str, int]
+    delays: dict[str, float]
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        """clients can close connections before the whole answer is read"""
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """handler of the stand-in server"""
+
+    server: StandInServer
+    protocol_version = "HTTP/1.1"  # keep-alive connections
+
+    def do_GET(self) -> None:
+        """answer by the response of the path or 404"""
+
+        self.server.requests.append(self.path)
+        path = self.path.split("?")[0]
+        time.sleep(self.server.delays.get(path, 0.0))
+        if self.server.failures.get(path, 0) > 0:
+            self.server.failures[path] -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self.server.responses.get(path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        content = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: object) -> None:
+        """don't write requests to stderr"""
+
+
+@pytest.fixture
+def stand_in_server() -> Iterator[StandInServer]:
+    """local HTTP server instead of external API, its url is http://127.0.0.1:{server_port}"""
+
+    server = StandInServer(("127.0.0.1", 0), StandInHandler)
+    server.responses = dict()
+    server.requests = list()
+    server.failures = dict()
+    server.delays = dict()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
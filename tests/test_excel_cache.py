@@ -0,0 +1,118 @@
+# the test_excel_cache module
+import os
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import excel_cache
+from src.excel_cache import (clear_excel_cache, get_cache_key,
+                             is_cache_enabled, load_cached_frame,
+                             save_cached_frame)
+from src.utils import read_excel
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def excel_file(tmp_path: Path) -> str:
+    """a source file for the cache key, its content isn't parsed by mocked read_excel"""
+
+    filename = tmp_path / "operations.xlsx"
+    filename.write_bytes(b"excel data")
+    return str(filename)
+
+
+def test_get_cache_key(excel_file: str) -> None:
+    """testing the cache key changes with the source file content"""
+
+    key = get_cache_key(excel_file)
+    assert key == get_cache_key(excel_file)
+    with open(excel_file, "ab") as f:
+        f.write(b" appended")
+    assert key != get_cache_key(excel_file)
+    assert key.split("_")[0] == get_cache_key(excel_file).split("_")[0]
+
+
+def test_save_load_cached_frame(excel_file: str) -> None:
+    """testing the cached frame keeps data and NaN of object columns"""
+
+    data = pd.DataFrame(
+        [("OK", -100.5, np.nan), ("FAILED", 10.0, "*1234")],
+        columns=["Статус", "Сумма платежа", "Номер карты"],
+    )
+    key = get_cache_key(excel_file)
+    assert load_cached_frame(key) is None
+    save_cached_frame(key, data)
+    cached_data = load_cached_frame(key)
+    assert cached_data is not None
+    assert cached_data.equals(data)
+
+
+def test_save_cached_frame_removes_outdated(excel_file: str) -> None:
+    """testing only the last entry of the source file stays in the cache"""
+
+    data = pd.DataFrame([(1, 2)], columns=["a", "b"])
+    old_key = get_cache_key(excel_file)
+    save_cached_frame(old_key, data)
+    with open(excel_file, "ab") as f:
+        f.write(b" appended")
+    new_key = get_cache_key(excel_file)
+    save_cached_frame(new_key, data)
+    assert load_cached_frame(old_key) is None
+    assert load_cached_frame(new_key) is not None
+
+
+@patch("pandas.read_excel")
+def test_read_excel_cache(mock_read: Mock, excel_file: str) -> None:
+    """testing read_excel parses unchanged file only once"""
+
+    excel_data = pd.DataFrame([(1, 2)], columns=["a", "b"])
+    mock_read.return_value = excel_data
+    assert read_excel(excel_file).equals(excel_data)
+    assert read_excel(excel_file).equals(excel_data)
+    assert mock_read.call_count == 1
+    with open(excel_file, "ab") as f:
+        f.write(b" appended")
+    read_excel(excel_file)
+    assert mock_read.call_count == 2
+
+
+@pytest.mark.parametrize("use_cache, env_value", [(False, "on"), (True, "off")])
+@patch("pandas.read_excel")
+def test_read_excel_cache_off(
+    mock_read: Mock, use_cache: bool, env_value: str, excel_file: str
+) -> None:
+    """testing read_excel without the cache by argument and by EXCEL_CACHE"""
+
+    mock_read.return_value = pd.DataFrame([(1, 2)], columns=["a", "b"])
+    with patch.dict(os.environ, {"EXCEL_CACHE": env_value}):
+        read_excel(excel_file, use_cache)
+        read_excel(excel_file, use_cache)
+    assert mock_read.call_count == 2
+    assert clear_excel_cache() == 0
+
+
+@patch("pandas.read_excel")
+def test_clear_excel_cache(mock_read: Mock, excel_file: str) -> None:
+    """testing clear_excel_cache removes cached frames"""
+
+    mock_read.return_value = pd.DataFrame([(1, 2)], columns=["a", "b"])
+    read_excel(excel_file)
+    assert clear_excel_cache() == 1
+    read_excel(excel_file)
+    assert mock_read.call_count == 2
+
+
+def test_is_cache_enabled_no_pyarrow(monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing the cache is off without pyarrow and it is logged once"""
+
+    warning = Mock()
+    monkeypatch.setattr(excel_cache, "pyarrow_warned", False)
+    monkeypatch.setattr(excel_cache.logger, "warning", warning)
+    monkeypatch.setattr(excel_cache.importlib.util, "find_spec", lambda name: None)
+    assert not is_cache_enabled()
+    assert not is_cache_enabled()
+    warning.assert_called_once()
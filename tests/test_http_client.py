@@ -0,0 +1,76 @@
+# the test_http_client module
+import pytest
+import requests
+
+from src import http_client
+from src.http_client import (get_backoff, get_http_stats, get_session,
+                             http_get, reset_http_stats)
+from tests.conftest import StandInServer
+
+
+def test_get_session() -> None:
+    """testing the get_session returns the same pooled session"""
+
+    assert get_session() is get_session()
+
+
+def test_get_backoff() -> None:
+    """testing the get_backoff is jittered and bounded by backoff_max"""
+
+    for attempt in range(10):
+        assert 0 <= get_backoff(attempt) <= http_client.backoff_max
+
+
+def test_http_get_reuses_connections(stand_in_server: StandInServer) -> None:
+    """testing the http_get keeps the connection alive and counts requests"""
+
+    stand_in_server.responses["/data"] = "ok"
+    reset_http_stats()
+    for _ in range(3):
+        response = http_get(f"http://127.0.0.1:{stand_in_server.server_port}/data")
+        assert response.text == "ok"
+    stats = get_http_stats()
+    assert stats["requests"] == 3
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 2
+    assert stats["max_latency"] <= stats["total_latency"]
+
+
+def test_http_get_retries(stand_in_server: StandInServer) -> None:
+    """testing the http_get retries answers with retry statuses and returns the last one"""
+
+    url = f"http://127.0.0.1:{stand_in_server.server_port}/data"
+    stand_in_server.responses["/data"] = "ok"
+    stand_in_server.failures["/data"] = 2
+    reset_http_stats()
+    assert http_get(url).text == "ok"
+    assert get_http_stats()["retries"] == 2
+    stand_in_server.failures["/data"] = 5
+    assert http_get(url, retries=1).status_code == 503
+    assert http_get(f"http://127.0.0.1:{stand_in_server.server_port}/missing").status_code == 404
+
+
+def test_http_get_timeout(stand_in_server: StandInServer) -> None:
+    """testing the http_get raises the timeout error after retries"""
+
+    stand_in_server.responses["/slow"] = "ok"
+    stand_in_server.delays["/slow"] = 0.5
+    reset_http_stats()
+    with pytest.raises(requests.Timeout):
+        http_get(f"http://127.0.0.1:{stand_in_server.server_port}/slow", timeout=(1.0, 0.05), retries=1)
+    stats = get_http_stats()
+    assert stats["errors"] == 2
+    assert stats["retries"] == 1
+
+
+def test_http_get_retries_streamed(stand_in_server: StandInServer) -> None:
+    """testing streamed answers with retry statuses are closed and their connection is reused"""
+
+    url = f"http://127.0.0.1:{stand_in_server.server_port}/data"
+    stand_in_server.responses["/data"] = "ok"
+    stand_in_server.failures["/data"] = 2
+    reset_http_stats()
+    assert http_get(url, stream=True).text == "ok"
+    stats = get_http_stats()
+    assert stats["retries"] == 2
+    assert stats["new_connections"] == 1
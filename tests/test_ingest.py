@@ -0,0 +1,138 @@
+# the test_ingest module
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.ingest import TransactionStore, get_row_fingerprints
+
+COLUMNS = [
+    "Дата операции",
+    "Дата платежа",
+    "Номер карты",
+    "Статус",
+    "Сумма операции",
+    "Сумма платежа",
+    "Валюта платежа",
+    "Категория",
+    "Описание",
+]
+
+
+def get_rows(*rows: tuple[str, str, float, str]) -> pd.DataFrame:
+    """rows of the statement by (operation datetime, card, amount, description)"""
+
+    return pd.DataFrame(
+        [
+            (operation_date, operation_date[:10], card, "OK", amount, amount, "RUB", category, category)
+            for operation_date, card, amount, category in rows
+        ],
+        columns=COLUMNS,
+    )
+
+
+@pytest.fixture
+def statement() -> pd.DataFrame:
+    """the statement is newest first, the last operations have the same fingerprint"""
+
+    return get_rows(
+        ("31.12.2021 16:44:00", "*7197", -100.0, "Колхоз"),
+        ("31.12.2021 16:44:00", "*7197", -100.0, "Колхоз"),
+        ("30.12.2021 10:00:00", "*4556", -50.0, "Магнит"),
+    )
+
+
+def write_statement(filename: Path, data: pd.DataFrame) -> None:
+    """write the statement to the workbook like the bank does"""
+
+    data.to_excel(filename, index=False)
+
+
+def test_get_row_fingerprints(statement: pd.DataFrame) -> None:
+    """testing fingerprints are made by operation datetime, card, amount and description"""
+
+    assert get_row_fingerprints(statement).tolist() == [
+        "31.12.2021 16:44:00|*7197|-100.0|Колхоз",
+        "31.12.2021 16:44:00|*7197|-100.0|Колхоз",
+        "30.12.2021 10:00:00|*4556|-50.0|Магнит",
+    ]
+
+
+def test_transaction_store_ingest(tmp_path: Path, statement: pd.DataFrame) -> None:
+    """testing only new rows are added, including a repeat of the latest operation"""
+
+    workbook = tmp_path / "operations.xlsx"
+    write_statement(workbook, statement)
+    store = TransactionStore(str(workbook))
+
+    assert len(store.ingest()) == 3
+    assert len(store.ingest()) == 0
+    assert store.state is not None
+    assert store.state["boundary"] == ["31.12.2021 16:44:00|*7197|-100.0|Колхоз"] * 2
+
+    new_rows = get_rows(
+        ("01.01.2022 09:00:00", "*7197", -10.0, "Кафе"),
+        ("31.12.2021 16:44:00", "*7197", -100.0, "Колхоз"),
+    )
+    write_statement(workbook, pd.concat([new_rows, statement]))
+    ingested = store.ingest()
+    assert ingested["Описание"].tolist() == ["Кафе", "Колхоз"]
+
+    transactions = store.get()
+    assert len(transactions) == 5
+    assert transactions.payment_dates.is_monotonic_increasing
+    assert transactions.data["Категория"].dtype == "category"
+    assert store.state["rows"] == 5
+    assert store.state["high_water_mark"] == "2022-01-01T09:00:00"
+
+
+def test_transaction_store_load(tmp_path: Path, statement: pd.DataFrame) -> None:
+    """testing the store is read from disk and only new rows are got after restart"""
+
+    workbook = tmp_path / "operations.xlsx"
+    write_statement(workbook, statement)
+    TransactionStore(str(workbook)).ingest()
+
+    write_statement(workbook, pd.concat([get_rows(("01.01.2022 09:00:00", "*7197", -10.0, "Кафе")), statement]))
+    store = TransactionStore(str(workbook))
+    assert store.ingest()["Описание"].tolist() == ["Кафе"]
+    assert len(store.get()) == 4
+
+
+def test_transaction_store_no_cache(
+    tmp_path: Path, statement: pd.DataFrame, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """testing the store works in memory if the cache is off"""
+
+    monkeypatch.setenv("EXCEL_CACHE", "off")
+    workbook = tmp_path / "operations.xlsx"
+    write_statement(workbook, statement)
+    store = TransactionStore(str(workbook))
+    assert len(store.ingest()) == 3
+    assert not store.load()
+    assert len(store.get()) == 3
+
+
+def test_transaction_store_rewritten(tmp_path: Path, statement: pd.DataFrame) -> None:
+    """testing the whole workbook is loaded again if it was rewritten, not only grown on top"""
+
+    workbook = tmp_path / "operations.xlsx"
+    write_statement(workbook, statement)
+    TransactionStore(str(workbook)).ingest()
+
+    fixed = statement.copy()
+    fixed.loc[1, "Описание"] = "Колхоз-исправлено"
+    write_statement(workbook, fixed)
+    store = TransactionStore(str(workbook))
+    assert len(store.ingest()) == 3
+    assert sorted(store.get().data["Описание"]) == ["Колхоз", "Колхоз-исправлено", "Магнит"]
+
+    write_statement(workbook, fixed.iloc[:2])
+    assert len(store.ingest()) == 2
+    assert store.state is not None
+    assert store.state["sheet_rows"] == 2
+
+    write_statement(workbook, pd.concat([fixed, get_rows(("01.01.2022 09:00:00", "*7197", -10.0, "Кафе"))]))
+    assert len(store.ingest()) == 4
+    assert store.get().data["Описание"].tolist()[-1] == "Кафе"
+    assert len(TransactionStore(str(workbook)).get()) == 4
@@ -0,0 +1,150 @@
+# the test_main module
+import json
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+import requests
+
+from src.main import HotTransactions, TransactionsServer, create_server
+
+
+@pytest.fixture
+def workbook(tmp_path: Path) -> Path:
+    """the workbook with transactions of December 2021"""
+
+    filename = tmp_path / "operations.xlsx"
+    get_statement().to_excel(filename, index=False)
+    return filename
+
+
+def get_statement(*new_rows: tuple[str, str, float, str, str]) -> pd.DataFrame:
+    """the statement with new rows (operation datetime, status, amount, category, description) on the top"""
+
+    rows = list(new_rows) + [
+        ("21.12.2021 10:00:00", "FAILED", -100.0, "Переводы", "Петр П."),
+        ("20.12.2021 10:00:00", "OK", -500.0, "Супермаркеты", "Магнит"),
+        ("15.12.2021 10:00:00", "OK", -1000.0, "Переводы", "Иван С."),
+    ]
+    return pd.DataFrame(
+        [
+            (date, date[:10], "*1234", status, amount, amount, "RUB", -amount / 100, category, text)
+            for date, status, amount, category, text in rows
+        ],
+        columns=[
+            "Дата операции",
+            "Дата платежа",
+            "Номер карты",
+            "Статус",
+            "Сумма операции",
+            "Сумма платежа",
+            "Валюта платежа",
+            "Кэшбэк",
+            "Категория",
+            "Описание",
+        ],
+    )
+
+
+@pytest.fixture
+def server(workbook: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[TransactionsServer]:
+    """the service of the workbook on a free port"""
+
+    monkeypatch.setattr("src.views.get_user_settings", lambda filename: {"user_currencies": [], "user_stocks": []})
+    transactions_server = create_server("127.0.0.1", 0, str(workbook))
+    thread = threading.Thread(target=transactions_server.serve_forever, daemon=True)
+    thread.start()
+    yield transactions_server
+    transactions_server.shutdown()
+    transactions_server.server_close()
+    thread.join()
+
+
+def get_json(server: TransactionsServer, path: str) -> tuple[int, Any]:
+    """status and JSON answer of the server"""
+
+    response = requests.get(f"http://127.0.0.1:{server.server_address[1]}{path}", timeout=10)
+    return response.status_code, response.json()
+
+
+def test_hot_transactions(workbook: Path) -> None:
+    """testing transactions are loaded once and only new rows are added after the workbook is changed"""
+
+    hot_transactions = HotTransactions(str(workbook))
+
+    transactions = hot_transactions.get()
+    assert hot_transactions.get() is transactions
+    assert hot_transactions.loads == 1
+
+    get_statement(("31.12.2021 10:00:00", "OK", -10.0, "Кафе", "Кофейня")).to_excel(workbook, index=False)
+    assert hot_transactions.get() is not transactions
+    assert hot_transactions.loads == 2
+    assert hot_transactions.get().data["Описание"].tolist() == ["Иван С.", "Магнит", "Петр П.", "Кофейня"]
+
+
+def test_server_endpoints(server: TransactionsServer) -> None:
+    """testing the main page, the report and the service are answered from the loaded transactions"""
+
+    status, json_data = get_json(server, "/main?date=2021-12-31%2012:00:00")
+    assert status == 200
+    assert json_data["cards"] == [{"last_digits": "1234", "total_spent": 1500.0, "cashback": 15.0}]
+
+    status, json_data = get_json(server, "/reports/spending_by_category?category=Супермаркеты&date=31.12.2021")
+    assert status == 200
+    assert [record["Описание"] for record in json_data] == ["Магнит"]
+
+    status, json_data = get_json(server, "/services/individual_transfers")
+    assert status == 200
+    assert [record["Описание"] for record in json_data] == ["Иван С."]
+
+    status, json_data = get_json(server, "/health")
+    assert status == 200
+    assert json_data == {"status": "ok", "transactions": 3, "loads": 1}
+
+
+def test_server_reloads_workbook(server: TransactionsServer, workbook: Path) -> None:
+    """testing new rows of the workbook are added when it is changed on disk"""
+
+    assert get_json(server, "/health")[1]["loads"] == 1
+    get_statement(("31.12.2021 10:00:00", "OK", -10.0, "Кафе", "Кофейня")).to_excel(workbook, index=False)
+    assert get_json(server, "/health")[1] == {"status": "ok", "transactions": 4, "loads": 2}
+    assert get_json(server, "/health")[1]["loads"] == 2
+
+
+def test_server_main_page_reloads_workbook(server: TransactionsServer, workbook: Path) -> None:
+    """testing the memoized main page isn't used after new rows of the workbook are added"""
+
+    assert get_json(server, "/main?date=2021-12-31%2012:00:00")[1]["cards"][0]["total_spent"] == 1500.0
+    get_statement(("31.12.2021 10:00:00", "OK", -10.0, "Кафе", "Кофейня")).to_excel(workbook, index=False)
+    json_data = get_json(server, "/main?date=2021-12-31%2012:00:00")[1]
+    assert json_data["cards"][0]["total_spent"] == 1510.0
+    assert get_json(server, "/main?date=2021-12-31%2012:00:00")[1]["sections"]["cards"] == "memoized"
+
+
+def test_server_unknown_path(server: TransactionsServer) -> None:
+    """testing unknown paths are answered by 404"""
+
+    status, json_data = get_json(server, "/unknown")
+    assert status == 404
+    assert json.dumps(json_data, ensure_ascii=False) == '{"error": "/unknown is not found"}'
+
+
+def test_server_streams(server: TransactionsServer) -> None:
+    """testing the service and the report are streamed as a JSON array and NDJSON"""
+
+    url = f"http://127.0.0.1:{server.server_address[1]}/services/individual_transfers"
+    response = requests.get(f"{url}?stream=json", timeout=10)
+    assert response.headers["Transfer-Encoding"] == "chunked"
+    assert response.json() == get_json(server, "/services/individual_transfers")[1]
+
+    response = requests.get(f"{url}?stream=ndjson", timeout=10)
+    assert response.headers["Content-Type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["Описание"] for line in response.text.splitlines()] == ["Иван С."]
+
+    path = "/reports/spending_by_category?category=Супермаркеты&date=31.12.2021"
+    response = requests.get(f"http://127.0.0.1:{server.server_address[1]}{path}&stream=ndjson", timeout=10)
+    assert [json.loads(line)["Описание"] for line in response.text.splitlines()] == ["Магнит"]
+    assert get_json(server, "/health?stream=json")[1]["status"] == "ok"
@@ -0,0 +1,161 @@
+# the test_rates module
+import datetime
+import threading
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+from src.rates import (RateCache, RateCalendar, RateStore,
+                       add_missing_rate_date, get_rate_store,
+                       get_rates_version, is_business_day)
+
+
+def test_rate_store(tmp_path: Path) -> None:
+    """testing save and get rates of the date"""
+
+    rate_store = RateStore(str(tmp_path / "rates.sqlite"))
+    date = datetime.date(2022, 2, 1)
+    assert rate_store.get_rates("cbr", date) is None
+    rate_store.save_rates("cbr", date, {"USD": 77.0, "EUR": 86.5})
+    assert rate_store.get_rates("cbr", date) == {"USD": 77.0, "EUR": 86.5}
+    assert rate_store.get_rates("other", date) is None
+    rate_store.close()
+
+    rate_store = RateStore(str(tmp_path / "rates.sqlite"))
+    assert rate_store.get_rates("cbr", date) == {"USD": 77.0, "EUR": 86.5}
+    rate_store.clear()
+    assert rate_store.get_rates("cbr", date) is None
+
+
+def test_rate_store_today_ttl(tmp_path: Path) -> None:
+    """testing today rates expire and past rates don't"""
+
+    rate_store = RateStore(str(tmp_path / "rates.sqlite"), ttl=0.0)
+    today = datetime.date.today()
+    past_date = today - datetime.timedelta(days=1)
+    rate_store.save_rates("cbr", today, {"USD": 77.0})
+    rate_store.save_rates("cbr", past_date, {"USD": 76.0})
+    assert rate_store.get_rates("cbr", today) is None
+    assert rate_store.get_rates("cbr", past_date) == {"USD": 76.0}
+
+
+def test_get_rate_store() -> None:
+    """testing the shared rate store"""
+
+    rate_store = get_rate_store()
+    assert rate_store is not None
+    assert rate_store is get_rate_store()
+
+
+def test_rate_cache_lru() -> None:
+    """testing the rate cache evicts least recently used dates"""
+
+    rate_cache = RateCache(maxsize=2)
+    rate_cache.put(datetime.date(2022, 2, 1), {"USD": 1.0})
+    rate_cache.put(datetime.date(2022, 2, 2), {"USD": 2.0})
+    assert rate_cache.lookup(datetime.date(2022, 2, 1)) == (True, {"USD": 1.0})
+    rate_cache.put(datetime.date(2022, 2, 3), {"USD": 3.0})
+    assert rate_cache.lookup(datetime.date(2022, 2, 2)) == (False, None)
+    assert rate_cache.lookup(datetime.date(2022, 2, 1)) == (True, {"USD": 1.0})
+    stats = rate_cache.get_stats()
+    assert stats["hits"] == 2
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+
+def test_rate_cache_negative_ttl() -> None:
+    """testing the rate cache remembers failed loads for negative_ttl seconds"""
+
+    loader = Mock(return_value=None)
+    rate_cache = RateCache(negative_ttl=0.05)
+    date = datetime.date(2022, 2, 1)
+    assert rate_cache.get_or_load(date, loader) is None
+    assert rate_cache.get_or_load(date, loader) is None
+    assert loader.call_count == 1
+    assert rate_cache.get_stats()["negative_hits"] == 1
+    time.sleep(0.06)
+    assert rate_cache.get_or_load(date, loader) is None
+    assert loader.call_count == 2
+
+
+def test_rate_cache_single_flight() -> None:
+    """testing concurrent misses of the same date call the loader once"""
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def loader() -> dict[str, float]:
+        started.set()
+        release.wait(5)
+        return {"USD": 1.0}
+
+    rate_cache = RateCache()
+    date = datetime.date(2022, 2, 1)
+    results: list[dict[str, float] | None] = list()
+    threads = [threading.Thread(target=lambda: results.append(rate_cache.get_or_load(date, loader)))]
+    threads[0].start()
+    started.wait(5)
+    counting_loader = Mock(return_value={"USD": 2.0})
+    threads += [
+        threading.Thread(target=lambda: results.append(rate_cache.get_or_load(date, counting_loader)))
+        for _ in range(3)
+    ]
+    for thread in threads[1:]:
+        thread.start()
+    while rate_cache.get_stats()["coalesced"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [{"USD": 1.0}] * 4
+    counting_loader.assert_not_called()
+    assert rate_cache.get_stats()["misses"] == 1
+
+
+def test_is_business_day() -> None:
+    """testing weekends and holidays aren't business days"""
+
+    assert is_business_day(datetime.date(2022, 2, 4))
+    assert not is_business_day(datetime.date(2022, 2, 5))
+    assert not is_business_day(datetime.date(2022, 2, 23))
+    assert not is_business_day(datetime.date(2022, 1, 3))
+
+
+def test_rate_calendar() -> None:
+    """testing payments of weekends and holidays share the effective date of rates"""
+
+    rate_calendar = RateCalendar()
+    saturday = datetime.date(2022, 2, 5)
+    assert rate_calendar.resolve(datetime.date(2022, 2, 4)) == datetime.date(2022, 2, 4)
+    assert rate_calendar.resolve(saturday) == saturday
+    assert rate_calendar.resolve(datetime.date(2022, 2, 6)) == saturday
+    assert rate_calendar.resolve(datetime.date(2022, 2, 7)) == saturday
+    assert rate_calendar.resolve(datetime.date(2022, 2, 8)) == datetime.date(2022, 2, 8)
+    assert rate_calendar.resolve(datetime.date(2022, 1, 10)) == datetime.date(2022, 1, 1)
+    rate_calendar.learn(datetime.date(2022, 2, 8), saturday)
+    assert rate_calendar.resolve(datetime.date(2022, 2, 8)) == saturday
+    rate_calendar.learn(datetime.date(2022, 2, 9), datetime.date(2022, 2, 10))
+    assert rate_calendar.resolve(datetime.date(2022, 2, 9)) == datetime.date(2022, 2, 9)
+
+
+def test_rates_version(tmp_path: Path) -> None:
+    """testing the rates version is changed by today rates and rates of missing dates only"""
+
+    rate_store = RateStore(str(tmp_path / "rates.sqlite"))
+    version = get_rates_version()
+    rate_store.save_rates("cbr", datetime.date(2022, 2, 1), {"USD": 77.0})
+    rate_store.save_rate_series("cbr", "EUR", {datetime.date(2022, 2, 2): 85.0})
+    assert get_rates_version() == version
+    rate_store.save_rates("cbr", datetime.date.today(), {"USD": 77.0})
+    assert get_rates_version() == version + 1
+
+    add_missing_rate_date(datetime.date(2022, 2, 3))
+    add_missing_rate_date(datetime.date(2022, 2, 4))
+    rate_store.save_rates("cbr", datetime.date(2022, 2, 3), {"USD": 77.0})
+    assert get_rates_version() == version + 2
+    rate_store.save_rate_series("cbr", "EUR", {datetime.date(2022, 2, 4): 85.0, datetime.date(2022, 2, 5): 85.0})
+    assert get_rates_version() == version + 3
+    rate_store.save_rates("cbr", datetime.date(2022, 2, 4), {"USD": 77.0})
+    assert get_rates_version() == version + 3
+    rate_store.clear()
+    assert get_rates_version() == version + 4
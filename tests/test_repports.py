@@ -1,5 +1,7 @@
 # the test_reports module
 import datetime
+import json
+from pathlib import Path
 from unittest.mock import call, mock_open, patch
 
 import pandas as pd
@@ -85,6 +87,29 @@ def test_spending_by_category(
     handle.write.assert_has_calls(json_data)
 
 
+def test_spending_by_category_chunks() -> None:
+    """testing the spending_by_category function consumes the batches of DataFrame"""
+
+    columns = ["Дата платежа", "Статус", "Сумма платежа", "Категория"]
+    chunks = [
+        pd.DataFrame(
+            [("08.01.2025", "OK", -800.0, "Переводы"), ("08.01.2025", "OK", -100.0, "Каршеринг")],
+            columns=columns,
+        ),
+        pd.DataFrame(
+            [("08.09.2024", "OK", -700.0, "Переводы"), ("07.01.2025", "OK", -600.0, "Переводы")],
+            columns=columns,
+        ),
+    ]
+    m = mock_open()
+    with patch("builtins.open", m), patch("json.dump") as mock_dump:
+        spending_by_category(iter(chunks), "Переводы", "08.01.2025")
+    assert mock_dump.call_args.args[0] == [
+        {"Дата платежа": "08.01.2025", "Статус": "OK", "Сумма платежа": -800.0, "Категория": "Переводы"},
+        {"Дата платежа": "07.01.2025", "Статус": "OK", "Сумма платежа": -600.0, "Категория": "Переводы"},
+    ]
+
+
 def test_spending_by_category_bad_filename() -> None:
     """testing writing report by bad path to json file"""
 
@@ -131,3 +156,35 @@ def test_spending_by_category_bad_dataframe(
         spending_by_category(data, category)
         patch_open.stop()
         mock_logger.assert_called_once()
+
+
+@pytest.mark.parametrize("ndjson", [False, True])
+def test_write_report_stream(tmp_path: Path, ndjson: bool) -> None:
+    """testing write_report writes records batch by batch as a JSON array or NDJSON"""
+
+    filename = tmp_path / "report.json"
+    data = pd.DataFrame(
+        {
+            "Дата платежа": pd.to_datetime(["08.01.2025", "07.01.2025"], format="%d.%m.%Y"),
+            "Категория": ["Переводы", "Переводы"],
+        }
+    )
+
+    @write_report(str(filename), stream=True, ndjson=ndjson)
+    def test_report() -> pd.DataFrame:
+        """function for testing write_report decorator"""
+
+        return data
+
+    records = [
+        {"Дата платежа": "08.01.2025", "Категория": "Переводы"},
+        {"Дата платежа": "07.01.2025", "Категория": "Переводы"},
+    ]
+    with patch("json.dump") as mock_dump:
+        test_report()
+    mock_dump.assert_not_called()
+    content = filename.read_text(encoding="utf-8")
+    if ndjson:
+        assert [json.loads(line) for line in content.splitlines()] == records
+    else:
+        assert content == json.dumps(records, ensure_ascii=False)
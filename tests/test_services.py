@@ -1,11 +1,19 @@
 # the test_services module
 
+import io
 import json
+from pathlib import Path
 from typing import TypedDict
 
+import pandas as pd
 import pytest
 
-from src.services import search_individual_transfers
+from src.services import (iter_individual_transfers,
+                          search_individual_transfers,
+                          search_individual_transfers_frame,
+                          write_individual_transfers)
+from src.transactions import Transactions, apply_schema
+from src.utils import FRAMES, iter_records, read_excel
 
 Transaction = TypedDict(
     "Transaction",
@@ -153,6 +161,40 @@ def test_search_individual_transfers(
     assert transactions == result
 
 
+def test_search_individual_transfers_records() -> None:
+    """testing search_individual_transfers consumes records from the batches of DataFrame"""
+
+    columns = ["Статус", "Категория", "Сумма платежа", "Описание"]
+    chunks = [
+        pd.DataFrame([("OK", "Переводы", -800.0, "Константин Л.")], columns=columns),
+        pd.DataFrame([("OK", "Переводы", -500.0, "Ольга К.")], columns=columns),
+    ]
+    transactions_str = search_individual_transfers(iter_records(iter(chunks)))
+    assert [transaction["Описание"] for transaction in json.loads(transactions_str)] == [
+        "Константин Л.",
+        "Ольга К.",
+    ]
+
+
+def test_search_individual_transfers_read_excel(tmp_path: Path) -> None:
+    """testing search_individual_transfers got typed records of read_excel writes JSON like the workbook"""
+
+    workbook = tmp_path / "operations.xlsx"
+    pd.DataFrame(
+        [
+            ("31.12.2021 00:12:53", "31.12.2021", "OK", "Переводы", -800.5, float("nan"), 5411.0, "Константин Л."),
+            ("30.12.2021 00:12:54", "30.12.2021", "OK", "Переводы", -500.25, 5.0, float("nan"), "Ольга К."),
+        ],
+        columns=["Дата операции", "Дата платежа", "Статус", "Категория", "Сумма платежа", "Кэшбэк", "MCC", "Описание"],
+    ).to_excel(workbook, index=False)
+
+    transactions_str = search_individual_transfers(read_excel(str(workbook)).to_dict("records"))
+    assert transactions_str == search_individual_transfers(pd.read_excel(workbook).to_dict("records"))
+    assert '"Дата операции": "31.12.2021 00:12:53"' in transactions_str
+    assert '"MCC": 5411.0' in transactions_str
+    assert '"MCC": NaN' in transactions_str
+
+
 def test_search_individual_transfers_empty_data() -> None:
     """testing getting empty excel data"""
 
@@ -259,3 +301,65 @@ def test_search_individual_transfers_key_error(transactions: list[Transaction])
 
     transactions_str = search_individual_transfers(transactions)
     assert transactions_str == ""
+
+
+def test_search_individual_transfers_frame() -> None:
+    """testing search_individual_transfers_frame returns the same JSON as search_individual_transfers"""
+
+    data = pd.DataFrame(
+        [
+            ("31.12.2021 00:12:53", "31.12.2021", "OK", "Переводы", -800.0, "Константин Л."),
+            ("31.12.2021 00:12:54", "31.12.2021", "FAILED", "Переводы", -800.0, "Константин Л."),
+            ("30.12.2021 00:12:55", "30.12.2021", "OK", "Переводы", 800.0, "Константин Л."),
+            ("30.12.2021 00:12:56", "30.12.2021", "OK", "Оплата", -800.0, "Константин Л."),
+            ("29.12.2021 00:12:57", "29.12.2021", "OK", "Переводы", -800.0, "Константин Ли"),
+            ("29.12.2021 00:12:58", "29.12.2021", "OK", "Переводы", -500.0, "Ольга К."),
+            ("28.12.2021 00:12:59", "28.12.2021", "OK", "Переводы", float("nan"), "Константин Л."),
+        ],
+        columns=["Дата операции", "Дата платежа", "Статус", "Категория", "Сумма платежа", "Описание"],
+    )
+    typed_data = apply_schema(data)
+
+    all_frames: list[FRAMES] = [data, typed_data, Transactions(typed_data), [typed_data.iloc[:3], typed_data.iloc[3:]]]
+    for frames in all_frames:
+        transactions_str = search_individual_transfers_frame(frames)
+        assert transactions_str == search_individual_transfers(iter_records(frames))
+    assert [transaction["Описание"] for transaction in json.loads(transactions_str)] == [
+        "Константин Л.",
+        "Ольга К.",
+        "Константин Л.",
+    ]
+
+
+def test_search_individual_transfers_frame_empty() -> None:
+    """testing search_individual_transfers_frame got empty data, empty data after filtering and bad data"""
+
+    columns = ["Статус", "Категория", "Сумма платежа", "Описание"]
+    assert search_individual_transfers_frame(pd.DataFrame(columns=columns)) == ""
+    assert search_individual_transfers_frame(pd.DataFrame([("OK", "Оплата", -1.0, "Ольга К.")], columns=columns)) == ""
+    assert search_individual_transfers_frame(pd.DataFrame([("OK", "Переводы", -1.0, None)], columns=columns)) == ""
+    assert search_individual_transfers_frame(pd.DataFrame({"Статус": ["OK"]})) == ""
+
+
+def test_write_individual_transfers() -> None:
+    """testing transfers are written as they are found as a JSON array or NDJSON"""
+
+    columns = ["Статус", "Категория", "Сумма платежа", "Описание"]
+    chunks = [
+        pd.DataFrame(
+            [("OK", "Переводы", -800.0, "Константин Л."), ("OK", "Оплата", -1.0, "Ольга К.")], columns=columns
+        ),
+        pd.DataFrame([("OK", "Переводы", -500.0, "Ольга К.")], columns=columns),
+    ]
+    transfers = iter_individual_transfers(iter(chunks))
+    assert next(transfers)["Описание"] == "Константин Л."
+
+    output = io.StringIO()
+    assert write_individual_transfers(chunks, output)
+    assert output.getvalue() == search_individual_transfers_frame(chunks)
+
+    output = io.StringIO()
+    assert write_individual_transfers(chunks, output, ndjson=True)
+    assert [json.loads(line)["Описание"] for line in output.getvalue().splitlines()] == ["Константин Л.", "Ольга К."]
+
+    assert not write_individual_transfers(pd.DataFrame({"Статус": ["OK"]}), io.StringIO())
@@ -0,0 +1,83 @@
+# the test_stock_cache module
+import threading
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+from src.stock_cache import StockCache, get_stock_cache
+
+
+def test_stock_cache(tmp_path: Path) -> None:
+    """testing fresh prices are got without requests and are kept in the file"""
+
+    get_stock_prices = Mock(return_value={"AAPL": 100.0, "MSFT": 300.0})
+    stock_cache = StockCache(str(tmp_path / "stocks.json"), ttl=60.0)
+    prices = stock_cache.get_prices(["AAPL", "MSFT"], get_stock_prices)
+    assert {stock: price for stock, (price, _) in prices.items()} == {"AAPL": 100.0, "MSFT": 300.0}
+    assert all(0 <= age < 1 for _, age in prices.values())
+    assert stock_cache.get_prices(["AAPL"], get_stock_prices)["AAPL"][0] == 100.0
+    get_stock_prices.assert_called_once_with(["AAPL", "MSFT"])
+
+    stock_cache = StockCache(str(tmp_path / "stocks.json"), ttl=60.0)
+    assert stock_cache.get_prices(["MSFT"], get_stock_prices)["MSFT"][0] == 300.0
+    assert get_stock_prices.call_count == 1
+    stock_cache.clear()
+    assert StockCache(str(tmp_path / "stocks.json")).prices == {}
+
+
+def test_stock_cache_stale_while_revalidate(tmp_path: Path) -> None:
+    """testing stale prices are returned at once and refreshed in the background"""
+
+    stock_cache = StockCache(str(tmp_path / "stocks.json"), ttl=0.05)
+    stock_cache.get_prices(["AAPL"], Mock(return_value={"AAPL": 100.0}))
+    time.sleep(0.06)
+
+    release = threading.Event()
+
+    def get_stock_prices(stocks: list[str]) -> dict[str, float]:
+        release.wait(5)
+        return {"AAPL": 110.0}
+
+    price, age = stock_cache.get_prices(["AAPL"], get_stock_prices)["AAPL"]
+    assert price == 100.0
+    assert age >= 0.05
+    release.set()
+    stock_cache.wait(5)
+    price, age = stock_cache.get_prices(["AAPL"], get_stock_prices)["AAPL"]
+    assert price == 110.0
+    assert age < 0.05
+
+
+def test_stock_cache_failed_refresh(tmp_path: Path) -> None:
+    """testing stocks are missing if their prices weren't got"""
+
+    stock_cache = StockCache(str(tmp_path / "stocks.json"))
+    assert stock_cache.get_prices(["AAPL"], Mock(return_value=None)) == {}
+    assert stock_cache.get_prices(["AAPL"], Mock(side_effect=ConnectionError)) == {}
+    (tmp_path / "bad.json").write_text("[1, 2]")
+    assert StockCache(str(tmp_path / "bad.json")).prices == {}
+
+
+def test_stock_cache_not_found(tmp_path: Path) -> None:
+    """testing stocks without price are remembered for ttl and are checked again in the background"""
+
+    get_stock_prices = Mock(return_value={"AAPL": 100.0})
+    stock_cache = StockCache(str(tmp_path / "stocks.json"), ttl=0.05)
+    assert list(stock_cache.get_prices(["AAPL", "UNKNOWN"], get_stock_prices)) == ["AAPL"]
+    assert list(stock_cache.get_prices(["AAPL", "UNKNOWN"], get_stock_prices)) == ["AAPL"]
+    get_stock_prices.assert_called_once_with(["AAPL", "UNKNOWN"])
+
+    time.sleep(0.06)
+    get_stock_prices.return_value = {"AAPL": 110.0, "UNKNOWN": 5.0}
+    prices = stock_cache.get_prices(["AAPL", "UNKNOWN"], get_stock_prices)
+    assert {stock: price for stock, (price, _) in prices.items()} == {"AAPL": 100.0}
+    stock_cache.wait(5)
+    get_stock_prices.assert_called_with(["AAPL", "UNKNOWN"])
+    assert stock_cache.get_prices(["UNKNOWN"], get_stock_prices)["UNKNOWN"][0] == 5.0
+    assert stock_cache.not_found == {}
+
+
+def test_get_stock_cache() -> None:
+    """testing the shared stock cache"""
+
+    assert get_stock_cache() is get_stock_cache()
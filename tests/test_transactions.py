@@ -0,0 +1,201 @@
+# the test_transactions module
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.transactions import (Transactions, apply_schema, format_date,
+                              get_memory_usage, get_payment_dates, to_record,
+                              to_records)
+
+
+def get_transactions_data() -> pd.DataFrame:
+    """transactions data like pd.read_excel returns"""
+
+    return pd.DataFrame(
+        [
+            ("31.12.2021 16:44:00", "31.12.2021", "*7197", "OK", -160.89, "RUB", 5411.0, "Колхоз"),
+            ("30.12.2021 10:00:00", "30.12.2021", np.nan, "FAILED", -10.0, "USD", np.nan, "Магнит"),
+        ],
+        columns=[
+            "Дата операции",
+            "Дата платежа",
+            "Номер карты",
+            "Статус",
+            "Сумма платежа",
+            "Валюта платежа",
+            "MCC",
+            "Описание",
+        ],
+    )
+
+
+def test_apply_schema() -> None:
+    """testing the apply_schema converts columns to compact types"""
+
+    data = get_transactions_data()
+    typed_data = apply_schema(data)
+    assert typed_data["Статус"].dtype == "category"
+    assert typed_data["Номер карты"].dtype == "category"
+    assert typed_data["Сумма платежа"].dtype == "float64"
+    assert typed_data["MCC"].dtype == "Int16"
+    assert typed_data["Описание"].dtype == "object"
+    assert typed_data["Дата платежа"].iloc[0] == pd.Timestamp(2021, 12, 31)
+    assert typed_data["Дата операции"].iloc[0] == pd.Timestamp(2021, 12, 31, 16, 44)
+    assert data["Статус"].dtype == "object"
+    many_data = pd.concat([data] * 100, ignore_index=True)
+    assert get_memory_usage(apply_schema(many_data)) < get_memory_usage(many_data)
+
+
+def test_apply_schema_bad_data() -> None:
+    """testing the apply_schema keeps columns which can't be converted"""
+
+    data = pd.DataFrame([("2021-12-31", "5411.5")], columns=["Дата платежа", "MCC"])
+    assert apply_schema(data).equals(data)
+
+
+def test_to_records() -> None:
+    """testing the to_records formats typed data back for JSON"""
+
+    data = get_transactions_data()
+    records = to_records(apply_schema(data))
+    assert records[0]["Дата операции"] == "31.12.2021 16:44:00"
+    assert records[0]["Дата платежа"] == "31.12.2021"
+    assert json.dumps(records, ensure_ascii=False) == json.dumps(data.to_dict("records"), ensure_ascii=False)
+    assert isinstance(records[0]["MCC"], float)
+    assert records[1]["Статус"] == "FAILED"
+    assert records[1]["Сумма платежа"] == -10.0
+
+
+def test_to_record() -> None:
+    """testing the to_record formats one typed record back for JSON like to_records"""
+
+    data = get_transactions_data()
+    records = [to_record(record) for record in apply_schema(data).to_dict("records")]
+    assert json.dumps(records, ensure_ascii=False) == json.dumps(to_records(data), ensure_ascii=False)
+    assert records[1]["Дата операции"] == "30.12.2021 10:00:00"
+    assert np.isnan(records[1]["MCC"])
+    assert np.isnan(to_record({"Дата платежа": pd.NaT})["Дата платежа"])
+
+
+def test_format_date() -> None:
+    """testing the format_date formats only datetime values"""
+
+    assert format_date(pd.Timestamp(2021, 12, 31)) == "31.12.2021"
+    assert format_date("31.12.2021") == "31.12.2021"
+
+
+def test_get_payment_dates() -> None:
+    """testing the get_payment_dates parses only str dates"""
+
+    data = get_transactions_data()
+    payment_dates = get_payment_dates(data)
+    assert payment_dates.dtype == "datetime64[ns]"
+    typed_data = apply_schema(data)
+    assert get_payment_dates(typed_data) is typed_data["Дата платежа"]
+
+
+def test_transactions() -> None:
+    """testing the Transactions keeps payment dates as datetime64 without changing the data"""
+
+    data = get_transactions_data()
+    transactions = Transactions(data)
+    assert len(transactions) == 2
+    assert transactions.payment_dates.dtype == "datetime64[ns]"
+    assert data["Дата платежа"].dtype == "object"
+    assert list(transactions.data.columns) == list(data.columns)
+
+
+def test_transactions_window() -> None:
+    """testing the Transactions sorts data by payment date and slices date windows"""
+
+    data = pd.DataFrame(
+        [("03.02.2022", 3.0), ("31.01.2022", 1.0), ("01.02.2022", 2.0), ("28.02.2022", 4.0), ("01.03.2022", 5.0)],
+        columns=["Дата платежа", "Сумма платежа"],
+    )
+    transactions = Transactions(data)
+    assert transactions.data["Сумма платежа"].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    window = transactions.window(datetime.date(2022, 2, 1), datetime.date(2022, 2, 28))
+    assert window["Сумма платежа"].tolist() == [2.0, 3.0, 4.0]
+    assert transactions.window(datetime.date(2021, 2, 1), datetime.date(2021, 2, 28)).empty
+
+
+def test_transactions_append() -> None:
+    """testing new rows are added in payment date order and category columns keep their type"""
+
+    data = apply_schema(get_transactions_data())
+    transactions = Transactions(data.iloc[[1]])
+    appended = transactions.append(data.iloc[[0]])
+    assert appended.data["Описание"].tolist() == ["Магнит", "Колхоз"]
+    assert appended.data["Статус"].dtype == "category"
+    assert set(appended.data["Статус"].cat.categories) == {"OK", "FAILED"}
+    assert Transactions(data.iloc[[0]]).append(data.iloc[[1]]).data["Описание"].tolist() == ["Магнит", "Колхоз"]
+    assert transactions.append(pd.DataFrame()) is transactions
+    assert len(transactions) == 1
+    assert appended.version > transactions.version
+
+
+def test_transactions_card_window() -> None:
+    """testing the card rollup sums spending by day, card and currency and is updated by append"""
+
+    data = pd.DataFrame(
+        [
+            ("OK", "*1234", -100.0, 1.0, "RUB", "01.12.2021"),
+            ("OK", "*1234", -200.0, 2.0, "RUB", "01.12.2021"),
+            ("OK", "*1234", 500.0, 0.0, "RUB", "01.12.2021"),
+            ("FAILED", "*1234", -300.0, 3.0, "RUB", "02.12.2021"),
+            ("OK", "*5678", -10.0, np.nan, "USD", "02.12.2021"),
+            ("OK", "*1234", -50.0, 0.5, "RUB", "05.12.2021"),
+        ],
+        columns=["Статус", "Номер карты", "Сумма платежа", "Кэшбэк", "Валюта платежа", "Дата платежа"],
+    )
+    transactions = Transactions(apply_schema(data))
+    window = transactions.card_window(datetime.date(2021, 12, 1), datetime.date(2021, 12, 4))
+    assert window is not None
+    assert window[["Номер карты", "Валюта платежа", "Сумма платежа", "Кэшбэк"]].values.tolist() == [
+        ["*1234", "RUB", -300.0, 3.0],
+        ["*5678", "USD", -10.0, 0.0],
+    ]
+
+    new_data = pd.DataFrame(
+        [("OK", "*9999", -1.0, 0.0, "RUB", "02.12.2021")],
+        columns=["Статус", "Номер карты", "Сумма платежа", "Кэшбэк", "Валюта платежа", "Дата платежа"],
+    )
+    appended = transactions.append(apply_schema(new_data))
+    assert appended.card_rollup is not None
+    window = appended.card_window(datetime.date(2021, 12, 2), datetime.date(2021, 12, 31))
+    assert window is not None
+    assert window["Номер карты"].tolist() == ["*5678", "*9999", "*1234"]
+    assert Transactions(pd.DataFrame({"Дата платежа": ["01.12.2021"]})).card_window(
+        datetime.date(2021, 12, 1), datetime.date(2021, 12, 31)
+    ) is None
+
+
+def test_transactions_top_window() -> None:
+    """testing the top candidates keep top k by day and currency and are updated by append"""
+
+    columns = ["Статус", "Сумма платежа", "Валюта платежа", "Дата платежа", "Категория", "Описание"]
+    data = pd.DataFrame(
+        [
+            ("OK", -1.0, "RUB", "01.12.2021", "Кафе", "a"),
+            ("OK", 3.0, "RUB", "01.12.2021", "Кафе", "b"),
+            ("OK", -2.0, "RUB", "01.12.2021", "Кафе", "c"),
+            ("OK", -1.0, "USD", "01.12.2021", "Кафе", "d"),
+            ("OK", -5.0, "RUB", "02.12.2021", "Кафе", "e"),
+        ],
+        columns=columns,
+    )
+    transactions = Transactions(apply_schema(data))
+    window = transactions.top_window(datetime.date(2021, 12, 1), datetime.date(2021, 12, 1), 2)
+    assert window is not None
+    assert window["Описание"].tolist() == ["b", "c", "d"]
+
+    new_data = pd.DataFrame([("OK", -4.0, "RUB", "01.12.2021", "Кафе", "f")], columns=columns)
+    appended = transactions.append(apply_schema(new_data))
+    assert appended.top_k == 2
+    assert appended.top_candidates is not None
+    assert appended.top_candidates["Описание"].tolist() == ["b", "d", "f", "e"]
+    assert Transactions(pd.DataFrame({"Дата платежа": ["01.12.2021"]})).top_window(
+        datetime.date(2021, 12, 1), datetime.date(2021, 12, 31), 5
+    ) is None
@@ -1,13 +1,31 @@
 # the test_utils module
 import datetime
+import io
+import json
+import threading
+import time
 from collections.abc import Callable
+from pathlib import Path
 from unittest.mock import Mock, patch
+from xml.etree import ElementTree as ET
 
+import openpyxl  # type: ignore[import-untyped]
 import pandas as pd
 import pytest
 
-from src.utils import (exchange, get_currency_rates, get_currency_rates_by_cbr,
-                       get_date, get_user_settings, mask_card, read_excel)
+from src import rates
+from src.rates import rate_calendar
+from src.transactions import Transactions, to_records
+from src.utils import (exchange, exchange_frame, fill_currency_rates_by_cbr,
+                       get_currency_rates, get_currency_rates_by_cbr,
+                       get_currency_rates_range_by_cbr, get_date,
+                       get_excel_row_count, get_file_fingerprint,
+                       get_rate_cache_stats, get_rate_pairs, get_user_settings,
+                       has_missing_rates, iter_cbr_rates, iter_json_array,
+                       iter_json_chunks, iter_records, iter_window,
+                       load_transactions, mask_card, prefetch_currency_rates,
+                       read_excel, read_excel_chunks, write_json_records)
+from tests.conftest import StandInServer
 
 INNER = Callable[[datetime.date], dict[str, float] | None]
 OUTER = Callable[[str, datetime.date], float | None]
@@ -30,6 +48,138 @@ def test_not_exist_excel() -> None:
     assert not_exist_excel.empty
 
 
+@patch("pandas.read_excel")
+def test_load_transactions(mock_read: Mock) -> None:
+    """testing load prepared transactions from excel file"""
+
+    mock_read.return_value = pd.DataFrame(
+        [("OK", "31.12.2021")], columns=["Статус", "Дата платежа"]
+    )
+    transactions = load_transactions("data/operations.xlsx")
+    assert transactions.payment_dates.iloc[0] == pd.Timestamp(2021, 12, 31)
+
+
+def test_load_not_exist_transactions() -> None:
+    """testing load prepared transactions from not exist excel file"""
+
+    transactions = load_transactions("notexist.xlsx")
+    assert len(transactions) == 0
+    assert transactions.payment_dates.dtype == "datetime64[ns]"
+
+
+def test_read_excel_chunks(tmp_path: Path) -> None:
+    """testing read excel file by batches"""
+
+    filename = str(tmp_path / "operations.xlsx")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Статус", "Сумма платежа", "Номер карты"])
+    for index in range(5):
+        sheet.append(["OK", -100.5 * index, None if index == 2 else "*1234"])
+    workbook.save(filename)
+
+    chunks = list(read_excel_chunks(filename, 2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert all(chunk["Статус"].dtype == "category" for chunk in chunks)
+    data = pd.concat(chunks, ignore_index=True).astype(object)
+    assert data.equals(pd.read_excel(filename).astype(object))
+    assert list(iter_records(chunks))[2]["Сумма платежа"] == -201.0
+
+
+def test_iter_records_batches(monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing records of one DataFrame are converted by batches of records_batch_size rows"""
+
+    monkeypatch.setattr("src.utils.records_batch_size", 2)
+    data = pd.DataFrame({"Дата платежа": pd.to_datetime(["01.12.2021"] * 5, format="%d.%m.%Y"), "n": range(5)})
+    with patch("src.utils.to_records", wraps=to_records) as mock_to_records:
+        records = list(iter_records(data))
+    assert records == to_records(data)
+    assert [len(call.args[0]) for call in mock_to_records.call_args_list] == [2, 2, 1]
+
+
+def test_iter_json_chunks() -> None:
+    """testing JSON array and NDJSON are made record by record"""
+
+    records = [{"name": "Яблоко", "price": 1.5}, {"name": "AAPL", "price": None}]
+    assert "".join(iter_json_chunks(iter(records))) == json.dumps(records, ensure_ascii=False)
+    assert "".join(iter_json_chunks(iter([]))) == "[]"
+    lines = "".join(iter_json_chunks(iter(records), ndjson=True)).splitlines()
+    assert [json.loads(line) for line in lines] == records
+
+    output = io.StringIO()
+    write_json_records(iter(records), output)
+    assert json.loads(output.getvalue()) == records
+
+
+def test_not_exist_excel_chunks() -> None:
+    """testing get not exist excel file by batches"""
+
+    assert list(read_excel_chunks("notexist.xlsx")) == []
+
+
+def test_get_excel_row_count(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing rows of the sheet are counted like read_excel_chunks reads them"""
+
+    monkeypatch.setattr("src.utils.excel_block_size", 16)
+    filename = str(tmp_path / "operations.xlsx")
+    workbook = openpyxl.Workbook()
+    workbook.create_sheet("Прочее").append(["Статус"])
+    sheet = workbook.active
+    sheet.append(["Статус", "Сумма платежа"])
+    sheet.append(["OK", -100.5])
+    sheet.cell(row=5, column=1, value="OK")
+    workbook.save(filename)
+
+    assert get_excel_row_count(filename) == 4
+    assert get_excel_row_count(filename) == sum(len(chunk) for chunk in read_excel_chunks(filename, 2))
+    assert get_excel_row_count("notexist.xlsx") is None
+
+
+@pytest.mark.parametrize("prepared", [True, False])
+def test_iter_window(prepared: bool) -> None:
+    """testing iterate over transactions in the date window"""
+
+    data = pd.DataFrame(
+        [("31.01.2022", 1.0), ("01.02.2022", 2.0), ("28.02.2022", 3.0), ("01.03.2022", 4.0)],
+        columns=["Дата платежа", "Сумма платежа"],
+    )
+    windows = list(
+        iter_window(
+            Transactions(data) if prepared else data,
+            datetime.date(2022, 2, 1),
+            datetime.date(2022, 2, 28),
+        )
+    )
+    assert len(windows) == 1
+    assert windows[0]["Сумма платежа"].tolist() == [2.0, 3.0]
+    assert windows[0]["Дата платежа"].dtype == "datetime64[ns]"
+
+
+def test_iter_json_array() -> None:
+    """testing items of JSON array are decoded chunk by chunk"""
+
+    content = json.dumps([{"symbol": "AAPL", "name": "Яблоко"}, 12.5, "x"], ensure_ascii=False).encode("utf-8")
+    chunks = [content[index:index + 3] for index in range(0, len(content), 3)]
+    assert list(iter_json_array(chunks)) == [{"symbol": "AAPL", "name": "Яблоко"}, 12.5, "x"]
+    assert list(iter_json_array(["[1", "2]"])) == [12]
+    assert list(iter_json_array([" [ ] "])) == []
+    for bad_content in ('{"symbol": "AAPL"}', "[1,", "[1 2]"):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array([bad_content]))
+
+
+def test_get_file_fingerprint(tmp_path: Path) -> None:
+    """testing the fingerprint is changed when the file is rewritten"""
+
+    filename = tmp_path / "user_settings.json"
+    assert get_file_fingerprint(str(filename)) == ""
+    filename.write_text("{}")
+    fingerprint = get_file_fingerprint(str(filename))
+    assert fingerprint == get_file_fingerprint(str(filename))
+    filename.write_text("{ }")
+    assert get_file_fingerprint(str(filename)) != fingerprint
+
+
 def test_get_user_settings() -> None:
     """testing get not exists user_settings file"""
 
@@ -69,6 +219,33 @@ def test_exchange(
     assert result_amount is None or result_amount == result
 
 
+def test_exchange_frame() -> None:
+    """testing exchange_frame gets the rate once for each pair (date, currency)"""
+
+    data = pd.DataFrame(
+        [
+            (pd.Timestamp(2022, 2, 1), "RUB", -100.0, 1.0),
+            (pd.Timestamp(2022, 2, 1), "USD", -10.0, 2.0),
+            (pd.Timestamp(2022, 2, 1), "USD", -20.0, 0.0),
+            (pd.Timestamp(2022, 2, 2), "USD", -30.0, 3.0),
+            (pd.Timestamp(2022, 2, 2), "EUR", -40.0, 4.0),
+        ],
+        columns=["Дата платежа", "Валюта платежа", "Сумма платежа", "Кэшбэк"],
+        index=[10, 11, 12, 13, 14],
+    )
+    rates = {"USD": 100.0}
+    get_rate = Mock(side_effect=lambda currency, date: rates.get(currency))
+    amounts = exchange_frame(data, ["Сумма платежа", "Кэшбэк"], get_rate)
+    assert get_rate.call_count == 3
+    get_rate.assert_any_call("USD", datetime.date(2022, 2, 1))
+    assert list(amounts.index) == [10, 11, 12, 13, 14]
+    assert amounts["Сумма платежа"].tolist()[:4] == [-100.0, -1000.0, -2000.0, -3000.0]
+    assert amounts["Кэшбэк"].tolist()[:4] == [1.0, 200.0, 0.0, 300.0]
+    assert amounts.loc[14].isna().all()
+    assert has_missing_rates(data, amounts)
+    assert not has_missing_rates(data.iloc[:4], amounts.iloc[:4])
+
+
 @pytest.mark.parametrize(
     "date, currency, rate",
     [
@@ -110,6 +287,66 @@ def test_get_currency_rates(
         assert get_rate(currency[index], date) == rate[index]
 
 
+def test_get_currency_rates_store() -> None:
+    """testing the decorator gets saved rates of past dates without calling inner"""
+
+    inner = Mock(return_value={"USD": 2.0})
+    inner.__name__ = "inner"
+    past_date = datetime.date(day=10, month=12, year=2024)
+    assert get_currency_rates(inner)("USD", past_date) == 2.0
+    assert get_currency_rates(inner)("USD", past_date) == 2.0
+    assert get_currency_rates(inner)("EUR", past_date) is None
+    inner.assert_called_once_with(past_date)
+
+
+def test_get_currency_rates_negative() -> None:
+    """testing the decorator remembers failed calls of inner, their dates and counts cache statistics"""
+
+    inner = Mock(return_value=None)
+    inner.__name__ = "failing_inner"
+    past_date = datetime.date(day=10, month=12, year=2024)
+    get_rate = get_currency_rates(inner)
+    assert get_rate("USD", past_date) is None
+    assert get_rate("EUR", past_date) is None
+    inner.assert_called_once_with(past_date)
+    stats = get_rate_cache_stats()["failing_inner"]
+    assert stats["misses"] == 1
+    assert stats["negative_hits"] == 1
+    assert rates.missing_rate_dates == {past_date}
+
+
+def test_get_currency_rates_resolve_date() -> None:
+    """testing dates with the same effective date share one call of inner"""
+
+    inner = Mock(return_value={"USD": 2.0})
+    inner.__name__ = "weekend_inner"
+    saturday = datetime.date(2022, 2, 5)
+    get_rate = get_currency_rates(inner, resolve_date=rate_calendar.resolve)
+    for day in (5, 6, 7):
+        assert get_rate("USD", datetime.date(2022, 2, day)) == 2.0
+    inner.assert_called_once_with(saturday)
+
+
+def test_get_currency_rates_by_cbr_rate_date() -> None:
+    """testing the effective date of CBR answer is learned"""
+
+    mock_response = """
+        <ValCurs Date="05.02.2022">
+        <Valute>
+            <CharCode>USD</CharCode>
+            <VunitRate>77,0</VunitRate>
+        </Valute>
+        </ValCurs>
+    """
+    with patch("requests.Session.get") as mock_get:
+        mock_get.return_value.content = mock_response
+        assert get_currency_rates_by_cbr("USD", datetime.date(2022, 2, 8)) == 77.0
+        assert get_currency_rates_by_cbr("USD", datetime.date(2022, 2, 6)) == 77.0
+    assert rate_calendar.resolve(datetime.date(2022, 2, 8)) == datetime.date(2022, 2, 5)
+    mock_get.assert_called_once()
+    assert "date_req=08/02/2022" in mock_get.call_args.args[0]
+
+
 def test_get_currency_rates_by_cbr() -> None:
     """testing get currency rate by cbr"""
 
@@ -122,7 +359,7 @@ def test_get_currency_rates_by_cbr() -> None:
         </ValCurse>
     """
 
-    with patch("requests.get") as mock_get:
+    with patch("requests.Session.get") as mock_get:
         mock_get.return_value.content = mock_response
         mock_get.return_value.status_code = 200
         result = get_currency_rates_by_cbr(
@@ -142,7 +379,7 @@ def test_bad_xml_data() -> None:
             </ValCurs>
         """
 
-    with patch("requests.get") as mock_get:
+    with patch("requests.Session.get") as mock_get:
         mock_get.return_value.content = mock_response
         mock_get.return_value.status_code = 200
         result = get_currency_rates_by_cbr(
@@ -163,7 +400,7 @@ def test_bad_xml_rate() -> None:
             </ValCurse>
         """
 
-    with patch("requests.get") as mock_get:
+    with patch("requests.Session.get") as mock_get:
         mock_get.return_value.content = mock_response
         mock_get.return_value.status_code = 200
         result = get_currency_rates_by_cbr(
@@ -172,6 +409,135 @@ def test_bad_xml_rate() -> None:
         assert result is None
 
 
+CBR_DYNAMIC_RESPONSE = """<?xml version="1.0" encoding="windows-1251"?>
+<ValCurs ID="R01235" DateRange1="01.02.1990" DateRange2="14.02.1990" name="Foreign Currency Market Dynamic">
+<Record Date="30.01.1990" Id="R01235"><Nominal>1</Nominal><Value>60,0000</Value><VunitRate>60</VunitRate></Record>
+<Record Date="03.02.1990" Id="R01235"><Nominal>1</Nominal><Value>61,5000</Value><VunitRate>61,5</VunitRate></Record>
+<Record Date="06.02.1990" Id="R01235"><Nominal>10</Nominal><Value>625,0000</Value></Record>
+</ValCurs>"""
+
+
+def test_iter_cbr_rates() -> None:
+    """testing the streaming parser gets rates of XML_dynamic and XML_daily answers by small chunks"""
+
+    content = CBR_DYNAMIC_RESPONSE.encode("windows-1251")
+    chunks = [content[index:index + 7] for index in range(0, len(content), 7)]
+    assert list(iter_cbr_rates(chunks, "USD")) == [
+        (datetime.date(1990, 1, 30), "USD", 60.0),
+        (datetime.date(1990, 2, 3), "USD", 61.5),
+        (datetime.date(1990, 2, 6), "USD", 62.5),
+    ]
+    daily = """<ValCurs Date="05.02.2022" name="Foreign Currency Market">
+    <Valute ID="R01235"><CharCode>USD</CharCode><Nominal>1</Nominal><Value>77,0</Value></Valute>
+    <Valute ID="R01820"><CharCode>JPY</CharCode><Nominal>100</Nominal><Value>67,0</Value></Valute>
+    </ValCurs>"""
+    assert list(iter_cbr_rates([daily])) == [
+        (datetime.date(2022, 2, 5), "USD", 77.0),
+        (datetime.date(2022, 2, 5), "JPY", 0.67),
+    ]
+    with pytest.raises(ET.ParseError):
+        list(iter_cbr_rates(["<ValCurs><Valute></ValCurs>"]))
+
+
+def test_get_currency_rates_range_by_cbr(stand_in_server: StandInServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing get rates of every date of the range by one request to the stand-in server"""
+
+    monkeypatch.setattr("src.utils.cbr_url", f"http://127.0.0.1:{stand_in_server.server_port}")
+    stand_in_server.responses["/XML_dynamic.asp"] = CBR_DYNAMIC_RESPONSE
+    rates = get_currency_rates_range_by_cbr("USD", datetime.date(1990, 2, 1), datetime.date(1990, 2, 7))
+    assert rates == {
+        datetime.date(1990, 2, 1): 60.0,
+        datetime.date(1990, 2, 2): 60.0,
+        datetime.date(1990, 2, 3): 61.5,
+        datetime.date(1990, 2, 4): 61.5,
+        datetime.date(1990, 2, 5): 61.5,
+        datetime.date(1990, 2, 6): 62.5,
+        datetime.date(1990, 2, 7): 62.5,
+    }
+    assert stand_in_server.requests == [
+        "/XML_dynamic.asp?date_req1=22/01/1990&date_req2=07/02/1990&VAL_NM_RQ=R01235"
+    ]
+
+
+def test_get_currency_rates_range_by_cbr_unknown(
+    stand_in_server: StandInServer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """testing currency id is looked up in the CBR currency list, unknown codes aren't looked up again"""
+
+    monkeypatch.setattr("src.utils.cbr_url", f"http://127.0.0.1:{stand_in_server.server_port}")
+    stand_in_server.responses["/XML_val.asp"] = """<Valuta name="Foreign Currency Market Lib">
+    <Item ID="R01010"><Name>Австралийский доллар</Name><ISO_Char_Code>AUD</ISO_Char_Code></Item>
+    </Valuta>"""
+    stand_in_server.responses["/XML_dynamic.asp"] = CBR_DYNAMIC_RESPONSE
+    assert get_currency_rates_range_by_cbr("AUD", datetime.date(1990, 2, 1), datetime.date(1990, 2, 1)) == {
+        datetime.date(1990, 2, 1): 60.0
+    }
+    assert stand_in_server.requests[1].endswith("VAL_NM_RQ=R01010")
+    assert get_currency_rates_range_by_cbr("XYZ", datetime.date(1990, 2, 1), datetime.date(1990, 2, 1)) is None
+    assert get_currency_rates_range_by_cbr("XYZ", datetime.date(1990, 2, 2), datetime.date(1990, 2, 2)) is None
+    assert len([request for request in stand_in_server.requests if request.startswith("/XML_val.asp")]) == 2
+
+    monkeypatch.setattr("src.utils.rate_negative_ttl", 0.0)
+    assert get_currency_rates_range_by_cbr("XYZ", datetime.date(1990, 2, 1), datetime.date(1990, 2, 1)) is None
+    assert len([request for request in stand_in_server.requests if request.startswith("/XML_val.asp")]) == 3
+
+
+def test_fill_currency_rates_by_cbr(stand_in_server: StandInServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing the filled rates are got by get_currency_rates_by_cbr without requests"""
+
+    monkeypatch.setattr("src.utils.cbr_url", f"http://127.0.0.1:{stand_in_server.server_port}")
+    stand_in_server.responses["/XML_dynamic.asp"] = CBR_DYNAMIC_RESPONSE
+    date_start = datetime.date(1990, 2, 1)
+    date_end = datetime.date(1990, 2, 7)
+    assert fill_currency_rates_by_cbr(["USD", "RUB"], date_start, date_end) == 7
+    assert fill_currency_rates_by_cbr(["USD", "RUB"], date_start, date_end) == 0
+    assert len(stand_in_server.requests) == 1
+    assert get_currency_rates_by_cbr("USD", datetime.date(1990, 2, 6)) == 62.5
+    assert len(stand_in_server.requests) == 1
+
+
+def test_get_rate_pairs() -> None:
+    """testing distinct pairs (currency, date) which need conversion"""
+
+    data = pd.DataFrame(
+        [
+            ("USD", pd.Timestamp(2022, 2, 1)),
+            ("USD", pd.Timestamp(2022, 2, 1)),
+            ("RUB", pd.Timestamp(2022, 2, 1)),
+            ("EUR", pd.Timestamp(2022, 2, 2)),
+        ],
+        columns=["Валюта платежа", "Дата платежа"],
+    )
+    assert get_rate_pairs(data) == [("USD", datetime.date(2022, 2, 1)), ("EUR", datetime.date(2022, 2, 2))]
+
+
+@pytest.mark.parametrize("concurrency, max_active", [(2, 2), (8, 5)])
+def test_prefetch_currency_rates(concurrency: int, max_active: int) -> None:
+    """testing dates are fetched concurrently and once"""
+
+    lock = threading.Lock()
+    active = [0, 0]  # active calls, max active calls
+    calls: list[tuple[str, datetime.date]] = list()
+
+    def get_rate(currency: str, date: datetime.date) -> float:
+        """slow rate provider"""
+
+        with lock:
+            calls.append((currency, date))
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return 1.0
+
+    pairs = [("USD", datetime.date(2022, 2, day)) for day in range(1, 6)]
+    pairs += [("EUR", datetime.date(2022, 2, 1)), ("RUB", datetime.date(2022, 2, 7))]
+    assert prefetch_currency_rates(pairs, get_rate, concurrency) == 5
+    assert sorted(calls) == sorted(pairs[:5])
+    assert active[1] == max_active
+
+
 def test_mask_card() -> None:
     """testing mask_card"""
 
@@ -1,15 +1,26 @@
 import datetime
 import json
+import threading
+import time
 from collections.abc import Callable
-from typing import TypedDict
-from unittest.mock import patch
+from pathlib import Path
+from typing import Any, TypedDict
+from unittest.mock import Mock, patch
 
 import pandas as pd
 import pytest
 
-from src.views import (get_cards_info, get_top_transactions,
+from src.rates import bump_rates_version
+from src.transactions import Transactions
+from src.views import (get_cached_user_stocks, get_cards_info,
+                       get_cards_info_range, get_cards_info_range_status,
+                       get_dates, get_section, get_stock_list_prices,
+                       get_stock_quotes, get_top_transactions,
+                       get_top_transactions_range,
+                       get_top_transactions_range_status,
                        get_user_prefer_currency_rates, get_user_stocks,
-                       greeting, main_page)
+                       greeting, main_page, main_page_range)
+from tests.conftest import StandInServer
 
 INNER = Callable[[datetime.date], dict[str, float] | None]
 OUTER = Callable[[str, datetime.date], float | None]
@@ -39,6 +50,14 @@ SandP500 = TypedDict(
         "price": float,
     },
 )
+CachedStock = TypedDict(
+    "CachedStock",
+    {
+        "stock": str,
+        "price": float,
+        "age": int,
+    },
+)
 TransactionInfo = TypedDict(
     "TransactionInfo",
     {
@@ -46,7 +65,8 @@ TransactionInfo = TypedDict(
         "cards": list[CardType],
         "top_transactions": list[Transaction],
         "currency_rates": list[Currency],
-        "stock_prices": list[SandP500],
+        "stock_prices": list[CachedStock],
+        "sections": dict[str, str],
     },
 )
 
@@ -102,6 +122,107 @@ def test_get_cards_info() -> None:
     assert get_cards_info(df, date, lambda x, y: 1.0) == cards
 
 
+def test_get_cards_info_transactions() -> None:
+    """testing get_cards_info gets prepared transactions and doesn't change the data"""
+
+    date = datetime.date(day=17, month=12, year=1993)
+    df = pd.DataFrame(
+        [
+            ("OK", "*1234", -1000.0, "RUB", "15.12.1993", 100.0),
+            ("OK", "*1234", -1000.0, "RUB", "01.12.1993", 100.0),
+            ("OK", "*1234", -1000.0, "RUB", "18.12.1993", 100.0),
+        ],
+        columns=[
+            "Статус",
+            "Номер карты",
+            "Сумма платежа",
+            "Валюта платежа",
+            "Дата платежа",
+            "Кэшбэк",
+        ],
+    )
+    transactions = Transactions(df)
+    cards = [{"last_digits": "1234", "total_spent": 2000.0, "cashback": 200.0}]
+
+    assert get_cards_info(transactions, date, lambda x, y: 1.0) == cards
+    assert get_cards_info(df, date, lambda x, y: 1.0) == cards
+    assert "payment_date" not in df.columns
+    assert "payment_date" not in transactions.data.columns
+
+
+def test_get_cards_info_chunks() -> None:
+    """testing get_cards_info consumes the batches of DataFrame"""
+
+    date = datetime.date(day=17, month=12, year=1993)
+    columns = [
+        "Статус",
+        "Номер карты",
+        "Сумма платежа",
+        "Валюта платежа",
+        "Дата платежа",
+        "Кэшбэк",
+    ]
+    chunks = [
+        pd.DataFrame(
+            [
+                ("OK", "*1234", -1000.0, "RUB", "15.12.1993", 100.0),
+                ("OK", "*1235", -1000.0, "RUB", "15.11.1993", 100.0),
+            ],
+            columns=columns,
+        ),
+        pd.DataFrame(
+            [
+                ("OK", "*1234", -1000.0, "USD", "16.12.1993", 100.0),
+                ("OK", "*1235", -1000.0, "RUB", "15.12.1993", 100.0),
+            ],
+            columns=columns,
+        ),
+    ]
+    cards = [
+        {
+            "last_digits": "1234",
+            "total_spent": 3000.0,
+            "cashback": 300.0,
+        },
+        {
+            "last_digits": "1235",
+            "total_spent": 1000.0,
+            "cashback": 100.0,
+        },
+    ]
+
+    assert get_cards_info(iter(chunks), date, lambda x, y: 2.0) == cards
+
+
+def test_get_cards_info_rollup() -> None:
+    """testing get_cards_info sums prepared transactions by the card rollup with rates of every day"""
+
+    date = datetime.date(day=17, month=12, year=1993)
+    df = pd.DataFrame(
+        [
+            ("OK", "*1234", -1000.0, "USD", "15.12.1993", 10.0),
+            ("OK", "*1234", -500.0, "USD", "15.12.1993", 5.0),
+            ("OK", "*1234", -1000.0, "USD", "16.12.1993", 10.0),
+            ("OK", "*1235", -1000.0, "RUB", "16.12.1993", 100.0),
+            ("OK", "*1235", -1000.0, "RUB", "18.12.1993", 100.0),
+        ],
+        columns=["Статус", "Номер карты", "Сумма платежа", "Валюта платежа", "Дата платежа", "Кэшбэк"],
+    )
+    transactions = Transactions(df)
+
+    def get_rate(currency: str, rate_date: datetime.date) -> float:
+        return float(rate_date.day)
+
+    cards = get_cards_info(transactions, date, get_rate)
+    assert cards == [
+        {"last_digits": "1234", "total_spent": 38500.0, "cashback": 385.0},
+        {"last_digits": "1235", "total_spent": 1000.0, "cashback": 100.0},
+    ]
+    assert cards == get_cards_info(df, date, get_rate)
+    assert transactions.card_rollup is not None
+    assert len(transactions.card_rollup) == 4
+
+
 def test_get_cards_info_error() -> None:
     """testing get_cards_info with bad data"""
 
@@ -222,6 +343,63 @@ def test_get_top_transactions(
     assert result == result_dict
 
 
+def test_get_top_transactions_candidates(monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing get_top_transactions reads top k of prepared transactions from the top candidates"""
+
+    df = pd.DataFrame(
+        [
+            ("OK", -100.0, "RUB", "14.12.1995", "Перевод", "a"),
+            ("OK", -300.0, "RUB", "15.12.1995", "Перевод", "b"),
+            ("OK", -200.0, "RUB", "15.12.1995", "Перевод", "c"),
+            ("OK", -150.0, "RUB", "15.12.1995", "Перевод", "d"),
+            ("OK", -10.0, "USD", "15.12.1995", "Перевод", "e"),
+            ("FAILED", -900.0, "RUB", "16.12.1995", "Перевод", "f"),
+            ("OK", -999.0, "RUB", "20.12.1995", "Перевод", "g"),
+        ],
+        columns=["Статус", "Сумма платежа", "Валюта платежа", "Дата платежа", "Категория", "Описание"],
+    )
+    transactions = Transactions(df)
+    date = datetime.date(day=17, month=12, year=1995)
+
+    def get_rate(currency: str, rate_date: datetime.date) -> float:
+        return 25.0 if currency == "USD" else 1.0
+
+    result = get_top_transactions(transactions, date, get_rate, k=2)
+    assert [row["description"] for row in result] == ["b", "e"]
+    assert transactions.top_candidates is not None
+    assert transactions.top_candidates["Описание"].tolist() == ["a", "b", "c", "e", "g"]
+    assert result == get_top_transactions(df, date, get_rate, k=2)
+
+    monkeypatch.setattr("src.views.top_k", 3)
+    assert [row["description"] for row in get_top_transactions(transactions, date, get_rate)] == ["b", "e", "c"]
+
+
+def test_get_top_transactions_chunks() -> None:
+    """testing get_top_transactions consumes the batches of DataFrame"""
+
+    columns = [
+        "Статус",
+        "Сумма платежа",
+        "Валюта платежа",
+        "Дата платежа",
+        "Категория",
+        "Описание",
+    ]
+    chunks = [
+        pd.DataFrame(
+            [("OK", -100.0 * index, "RUB", "15.12.1995", "Перевод", "Друг") for index in range(1, 5)],
+            columns=columns,
+        ),
+        pd.DataFrame(
+            [("OK", 150.0 * index, "RUB", "15.12.1995", "Перевод", "Друг") for index in range(1, 5)],
+            columns=columns,
+        ),
+    ]
+    date = datetime.date(day=31, month=12, year=1995)
+    result = get_top_transactions(iter(chunks), date, lambda x, y: 1.0)
+    assert [transaction["amount"] for transaction in result] == [600.0, 450.0, -400.0, -300.0, 300.0]
+
+
 def test_get_top_transactions_empty() -> None:
     """testing get_top_transactions getting empty list"""
 
@@ -299,18 +477,49 @@ def test_get_user_stocks() -> None:
 
     user_stocks = ["AAPL"]
 
-    patch_requests = patch("requests.get")
+    patch_requests = patch("requests.Session.get")
     mock_requests = patch_requests.start()
     mock_requests.return_value.json.return_value = [{"symbol": "AAPL", "price": 100.0}]
     mock_requests.return_value.ok = True
 
     stock_prices = get_user_stocks(user_stocks)
 
-    mock_requests.stop()
+    patch_requests.stop()
 
     assert stock_prices == test_result
 
 
+def test_get_stock_quotes() -> None:
+    """testing prices of the stocks are got by one batched request"""
+
+    with patch("requests.Session.get") as mock_get:
+        mock_get.return_value.ok = True
+        mock_get.return_value.json.return_value = [
+            {"symbol": "MSFT", "price": 300.0},
+            {"symbol": "AAPL", "price": 100.0},
+        ]
+        stock_prices = get_user_stocks(["AAPL", "MSFT", "AAPL"])
+    assert stock_prices == [{"stock": "AAPL", "price": 100.0}, {"stock": "MSFT", "price": 300.0}]
+    mock_get.assert_called_once()
+    assert "/api/v3/quote/AAPL,MSFT?" in mock_get.call_args.args[0]
+    assert get_stock_quotes([]) == {}
+
+
+def test_get_stock_list_prices(stand_in_server: StandInServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing prices of the stocks are found in the stock list parsed while it is downloaded"""
+
+    monkeypatch.setattr("src.views.stocks_url", f"http://127.0.0.1:{stand_in_server.server_port}")
+    monkeypatch.setattr("src.views.stocks_chunk_size", 16)
+    stock_list = [{"symbol": f"S{index}", "name": "Имя", "price": float(index)} for index in range(1000)]
+    stand_in_server.responses["/stock/list"] = json.dumps(stock_list, ensure_ascii=False)
+    assert get_user_stocks(["S7", "S3", "NONE"], get_stock_list_prices) == [
+        {"stock": "S7", "price": 7.0},
+        {"stock": "S3", "price": 3.0},
+    ]
+    assert get_stock_list_prices(["S1", "S2"]) == {"S1": 1.0, "S2": 2.0}
+    assert get_user_stocks(["S1"], lambda stocks: None) == []
+
+
 def test_get_bad_url_user_stocks() -> None:
     """testing for bad api key"""
 
@@ -319,14 +528,14 @@ def test_get_bad_url_user_stocks() -> None:
 
     user_stocks = ["AAPL"]
 
-    patch_requests = patch("requests.get")
+    patch_requests = patch("requests.Session.get")
     mock_requests = patch_requests.start()
     mock_requests.return_value.json.return_value = error_msg
     mock_requests.return_value.ok = False
 
     stock_prices = get_user_stocks(user_stocks)
 
-    mock_requests.stop()
+    patch_requests.stop()
 
     assert stock_prices == []
 
@@ -336,7 +545,7 @@ def test_get_bad_user_stocks() -> None:
 
     user_stocks = ["AAPL"]
 
-    patch_requests = patch("requests.get")
+    patch_requests = patch("requests.Session.get")
     mock_requests = patch_requests.start()
     mock_requests.return_value.json.return_value = [
         {"symbol": "AAPL", "price": "100,0"}
@@ -345,11 +554,23 @@ def test_get_bad_user_stocks() -> None:
 
     stock_prices = get_user_stocks(user_stocks)
 
-    mock_requests.stop()
+    patch_requests.stop()
 
     assert stock_prices == []
 
 
+def test_get_cached_user_stocks() -> None:
+    """testing prices are got once while they are fresh"""
+
+    get_stock_prices = Mock(return_value={"AAPL": 100.0})
+    assert get_cached_user_stocks(["AAPL", "AAPL"], get_stock_prices) == [{"stock": "AAPL", "price": 100.0, "age": 0}]
+    assert get_cached_user_stocks(["AAPL"], get_stock_prices) == [{"stock": "AAPL", "price": 100.0, "age": 0}]
+    get_stock_prices.assert_called_once_with(["AAPL"])
+    assert get_cached_user_stocks(["AAPL"], Mock(side_effect=ValueError)) == [
+        {"stock": "AAPL", "price": 100.0, "age": 0}
+    ]
+
+
 @pytest.mark.parametrize(
     "date, json_result",
     [
@@ -406,15 +627,23 @@ def test_get_bad_user_stocks() -> None:
                     {
                         "stock": "AAPL",
                         "price": 100.0,
+                        "age": 0,
                     },
                 ],
+                "sections": {
+                    "cards": "ok",
+                    "top_transactions": "ok",
+                    "currency_rates": "ok",
+                    "stock_prices": "ok",
+                },
             },
         ),
         ("1998-12-30 24:00:01", {}),
     ],
 )
-def test_main_page(date: str, json_result: TransactionInfo) -> None:
-    """testing main_page"""
+@pytest.mark.parametrize("concurrent", [True, False])
+def test_main_page(date: str, json_result: TransactionInfo, concurrent: bool) -> None:
+    """testing main_page in the concurrent and the sequential modes"""
 
     with patch("pandas.read_excel") as mock_excel:
         mock_excel.return_value = pd.DataFrame(
@@ -439,7 +668,7 @@ def test_main_page(date: str, json_result: TransactionInfo) -> None:
         if "greeting" in json_result:
             json_result["greeting"] = greeting(datetime.datetime.now().time())
         result = ""
-        patch_requests = patch("requests.get")
+        patch_requests = patch("requests.Session.get")
         mock_requests = patch_requests.start()
         mock_requests.return_value.content = """
         <ValCurse>
@@ -462,13 +691,206 @@ def test_main_page(date: str, json_result: TransactionInfo) -> None:
             "user_stocks": ["AAPL"],
         }
 
-        result = main_page(date)
+        result = main_page(date, concurrent)
         patch_json.stop()
         patch_requests.stop()
         json_data = json.loads(result)
+        if "timings" in json_data:
+            assert set(json_data.pop("timings")) == {
+                "currency_rates",
+                "stock_prices",
+                "transactions",
+                "month_rates",
+                "cards",
+                "top_transactions",
+                "total",
+            }
         assert json_data == json_result
 
 
+def test_main_page_overlaps_sections(monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing network sections run while the workbook is loading"""
+
+    def slow(result: Any) -> Callable[..., Any]:
+        def section(*args: Any) -> Any:
+            time.sleep(0.2)
+            return result
+
+        return section
+
+    empty = Transactions(pd.DataFrame({"Дата платежа": pd.Series(dtype="datetime64[ns]")}))
+    monkeypatch.setattr("src.views.get_user_settings", lambda filename: {"user_currencies": [], "user_stocks": []})
+    monkeypatch.setattr("src.views.get_user_prefer_currency_rates", slow([]))
+    monkeypatch.setattr("src.views.get_cached_user_stocks", slow([]))
+    monkeypatch.setattr("src.views.load_transactions", slow(empty))
+    timings = json.loads(main_page("2021-12-31 12:00:00"))["timings"]
+    assert timings["total"] < 0.4
+    timings = json.loads(main_page("2021-12-31 12:00:00", concurrent=False, memo=False))["timings"]
+    assert timings["total"] >= 0.6
+
+
+def test_main_page_deadlines(monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing sections which missed the deadline get the last value or null"""
+
+    release = threading.Event()
+
+    def get_stocks(stocks: list[str]) -> list[dict[str, Any]]:
+        release.wait(5)
+        return [{"stock": "AAPL", "price": 100.0, "age": 0}]
+
+    def get_rates(currencies: list[str], get_currency_rate: OUTER) -> list[Currency]:
+        raise ConnectionError("CBR is down")
+
+    empty = Transactions(pd.DataFrame({"Дата платежа": pd.Series(dtype="datetime64[ns]")}))
+    monkeypatch.setattr("src.views.get_user_settings", lambda filename: {"user_currencies": [], "user_stocks": []})
+    monkeypatch.setattr("src.views.get_user_prefer_currency_rates", get_rates)
+    monkeypatch.setattr("src.views.get_cached_user_stocks", get_stocks)
+    monkeypatch.setattr("src.views.load_transactions", lambda filename: empty)
+    monkeypatch.setattr("src.views.section_deadlines", {"stock_prices": 0.1})
+    monkeypatch.setattr("src.views.main_page_budget", 1.0)
+    json_data = json.loads(main_page("2021-12-31 12:00:00"))
+    assert json_data["timings"]["total"] < 0.5
+    assert json_data["stock_prices"] is None
+    assert json_data["currency_rates"] is None
+    assert json_data["cards"] == []
+    assert json_data["sections"] == {
+        "cards": "ok",
+        "top_transactions": "ok",
+        "currency_rates": "unavailable",
+        "stock_prices": "unavailable",
+    }
+
+    release.set()  # the late section saves its value in the background
+    for _ in range(50):
+        if get_section("stock_prices", datetime.date(2021, 12, 31))[0]:
+            break
+        time.sleep(0.01)
+    release.clear()
+    json_data = json.loads(main_page("2021-12-31 12:00:00"))
+    assert json_data["stock_prices"] == [{"stock": "AAPL", "price": 100.0, "age": 0}]
+    assert json_data["sections"]["stock_prices"] == "cached"
+    json_data = json.loads(main_page("2021-12-30 12:00:00"))  # stock prices don't depend on the date
+    assert json_data["sections"]["stock_prices"] == "cached"
+    release.set()
+
+
+def test_main_page_memo(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing sections are memoized and invalidated by the workbook, user settings and rates version"""
+
+    calls: dict[str, int] = {"transactions": 0, "currency_rates": 0, "stock_prices": 0}
+
+    def counted(name: str, result: Any) -> Callable[..., Any]:
+        def section(*args: Any) -> Any:
+            calls[name] += 1
+            return result
+
+        return section
+
+    columns = ["Номер карты", "Статус", "Сумма платежа", "Валюта платежа", "Кэшбэк", "Категория", "Описание"]
+    empty = Transactions(
+        pd.DataFrame(
+            {"Дата платежа": pd.Series(dtype="datetime64[ns]"), **{column: pd.Series() for column in columns}}
+        )
+    )
+    workbook = tmp_path / "operations.xlsx"
+    workbook.write_text("1")
+    settings = tmp_path / "user_settings.json"
+    settings.write_text("{}")
+    monkeypatch.setattr("src.views.workbook_file", str(workbook))
+    monkeypatch.setattr("src.views.user_settings_file", str(settings))
+    monkeypatch.setattr("src.views.get_user_settings", lambda filename: {"user_currencies": [], "user_stocks": []})
+    monkeypatch.setattr("src.views.get_user_prefer_currency_rates", counted("currency_rates", []))
+    monkeypatch.setattr("src.views.get_cached_user_stocks", counted("stock_prices", []))
+    monkeypatch.setattr("src.views.load_transactions", counted("transactions", empty))
+
+    assert set(json.loads(main_page("2021-12-31 12:00:00"))["sections"].values()) == {"ok"}
+    json_data = json.loads(main_page("2021-12-31 12:00:00"))
+    assert set(json_data["sections"].values()) == {"memoized"}
+    assert json_data["cards"] == []
+    assert calls == {"transactions": 1, "currency_rates": 1, "stock_prices": 1}
+
+    workbook.write_text("12")
+    json_data = json.loads(main_page("2021-12-31 12:00:00"))
+    assert json_data["sections"]["cards"] == "ok"
+    assert json_data["sections"]["stock_prices"] == "memoized"
+    settings.write_text("{ }")
+    main_page("2021-12-31 12:00:00")
+    assert calls == {"transactions": 2, "currency_rates": 2, "stock_prices": 2}
+
+    bump_rates_version()
+    main_page("2021-12-31 12:00:00")
+    main_page("2021-12-31 12:00:00", memo=False)
+    assert calls == {"transactions": 4, "currency_rates": 4, "stock_prices": 4}
+
+
+def test_main_page_memo_missing_rates(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing cards and top transactions without some rates aren't memoized"""
+
+    rates: dict[str, float] = dict()
+    transactions = Transactions(
+        pd.DataFrame(
+            {
+                "Дата платежа": pd.to_datetime(["2021-12-20", "2021-12-21"]),
+                "Номер карты": ["*1234", "*1234"],
+                "Статус": ["OK", "OK"],
+                "Сумма платежа": [-100.0, -10.0],
+                "Валюта платежа": ["RUB", "USD"],
+                "Кэшбэк": [1.0, 0.0],
+                "Категория": ["Супермаркеты", "Кафе"],
+                "Описание": ["Магнит", "Кофейня"],
+            }
+        )
+    )
+    workbook = tmp_path / "operations.xlsx"
+    workbook.write_text("1")
+    monkeypatch.setattr("src.views.workbook_file", str(workbook))
+    monkeypatch.setattr("src.views.get_user_settings", lambda filename: {"user_currencies": [], "user_stocks": []})
+    monkeypatch.setattr("src.views.prefetch_month_rates", lambda *args: None)
+    monkeypatch.setattr("src.views.get_currency_rates_by_cbr", lambda currency, date: rates.get(currency))
+
+    json_data = json.loads(main_page("2021-12-31 12:00:00", transactions=transactions))
+    assert json_data["cards"] == [{"last_digits": "1234", "total_spent": 100.0, "cashback": 1.0}]
+    json_data = json.loads(main_page("2021-12-31 12:00:00", transactions=transactions))
+    assert json_data["sections"]["cards"] == "ok"
+
+    rates["USD"] = 100.0
+    json_data = json.loads(main_page("2021-12-31 12:00:00", transactions=transactions))
+    assert json_data["cards"] == [{"last_digits": "1234", "total_spent": 1100.0, "cashback": 1.0}]
+    assert [transaction["description"] for transaction in json_data["top_transactions"]] == ["Кофейня", "Магнит"]
+    json_data = json.loads(main_page("2021-12-31 12:00:00", transactions=transactions))
+    assert json_data["sections"]["cards"] == "memoized"
+
+
+def test_main_page_memo_top_k(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing top transactions are memoized by top_k"""
+
+    transactions = Transactions(
+        pd.DataFrame(
+            {
+                "Дата платежа": pd.to_datetime(["2021-12-20", "2021-12-21"]),
+                "Номер карты": ["*1234", "*1234"],
+                "Статус": ["OK", "OK"],
+                "Сумма платежа": [-100.0, -10.0],
+                "Валюта платежа": ["RUB", "RUB"],
+                "Кэшбэк": [1.0, 0.0],
+                "Категория": ["Супермаркеты", "Кафе"],
+                "Описание": ["Магнит", "Кофейня"],
+            }
+        )
+    )
+    workbook = tmp_path / "operations.xlsx"
+    workbook.write_text("1")
+    monkeypatch.setattr("src.views.workbook_file", str(workbook))
+    monkeypatch.setattr("src.views.get_user_settings", lambda filename: {"user_currencies": [], "user_stocks": []})
+    monkeypatch.setattr("src.views.prefetch_month_rates", lambda *args: None)
+
+    assert len(json.loads(main_page("2021-12-31 12:00:00", transactions=transactions))["top_transactions"]) == 2
+    monkeypatch.setattr("src.views.top_k", 1)
+    json_data = json.loads(main_page("2021-12-31 12:00:00", transactions=transactions))
+    assert json_data["sections"]["top_transactions"] == "ok"
+    assert [transaction["description"] for transaction in json_data["top_transactions"]] == ["Магнит"]
+
+
 def test_main_page_no_user_settings() -> None:
     """testing the main_page function got not exist user_settings file"""
 
@@ -476,3 +898,129 @@ def test_main_page_no_user_settings() -> None:
         mock_json.return_value = None
         json_data = main_page("2020-12-12 23:59:59")
         assert json_data == "{}"
+
+
+def get_range_transactions() -> pd.DataFrame:
+    """transactions of two months for the range functions"""
+
+    return pd.DataFrame(
+        [
+            ("OK", "*1234", -100.0, "RUB", "30.11.1995", 1.0, "Кафе", "a"),
+            ("OK", "*1234", -300.0, "USD", "01.12.1995", 3.0, "Кафе", "b"),
+            ("OK", "*5678", -50.0, "RUB", "01.12.1995", 0.5, "Кафе", "c"),
+            ("FAILED", "*5678", -900.0, "RUB", "02.12.1995", 9.0, "Кафе", "d"),
+            ("OK", "*1234", -200.0, "RUB", "03.12.1995", 2.0, "Кафе", "e"),
+            ("OK", "*5678", 400.0, "RUB", "03.12.1995", 0.0, "Кафе", "f"),
+        ],
+        columns=[
+            "Статус",
+            "Номер карты",
+            "Сумма платежа",
+            "Валюта платежа",
+            "Дата платежа",
+            "Кэшбэк",
+            "Категория",
+            "Описание",
+        ],
+    )
+
+
+def get_range_rate(currency: str, rate_date: datetime.date) -> float:
+    """a rate which is different for every day"""
+
+    return 1.0 if currency == "RUB" else float(rate_date.day + 1)
+
+
+@pytest.mark.parametrize("prepared", [True, False])
+def test_get_cards_info_range(prepared: bool) -> None:
+    """testing month-to-date cards of every date are the same as get_cards_info of the date"""
+
+    df = get_range_transactions()
+    data = Transactions(df) if prepared else df
+    date_start = datetime.date(1995, 11, 29)
+    date_end = datetime.date(1995, 12, 4)
+    cards_by_date = get_cards_info_range(data, date_start, date_end, get_range_rate)
+
+    assert list(cards_by_date) == [date_start + datetime.timedelta(days=day) for day in range(6)]
+    assert cards_by_date[date_start] == []
+    assert cards_by_date[datetime.date(1995, 11, 30)] == [
+        {"last_digits": "1234", "total_spent": 100.0, "cashback": 1.0}
+    ]
+    assert cards_by_date[datetime.date(1995, 12, 3)] == [
+        {"last_digits": "1234", "total_spent": 800.0, "cashback": 8.0},
+        {"last_digits": "5678", "total_spent": 50.0, "cashback": 0.5},
+    ]
+    for date, cards in cards_by_date.items():
+        assert cards == get_cards_info(data, date, get_range_rate)
+
+
+@pytest.mark.parametrize("prepared", [True, False])
+def test_get_top_transactions_range(prepared: bool) -> None:
+    """testing top transactions of every date are the same as get_top_transactions of the date"""
+
+    df = get_range_transactions()
+    data = Transactions(df) if prepared else df
+    date_start = datetime.date(1995, 11, 29)
+    date_end = datetime.date(1995, 12, 4)
+    top_by_date = get_top_transactions_range(data, date_start, date_end, get_range_rate, k=2)
+
+    assert [row["description"] for row in top_by_date[datetime.date(1995, 12, 1)]] == ["b", "c"]
+    assert [row["description"] for row in top_by_date[datetime.date(1995, 12, 3)]] == ["b", "f"]
+    for date, top in top_by_date.items():
+        assert top == get_top_transactions(data, date, get_range_rate, k=2)
+
+
+def test_main_page_range(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing main_page_range returns and writes main page JSON of every date"""
+
+    monkeypatch.setattr("src.views.get_user_settings", lambda filename: {"user_currencies": [], "user_stocks": []})
+    monkeypatch.setattr("src.views.prefetch_month_rates", lambda *args: None)
+    monkeypatch.setattr("src.views.get_currency_rates_by_cbr", get_range_rate)
+    transactions = Transactions(get_range_transactions())
+
+    pages = main_page_range("1995-11-30", "1995-12-03", str(tmp_path / "pages"), transactions)
+    assert list(pages) == ["1995-11-30", "1995-12-01", "1995-12-02", "1995-12-03"]
+    json_data = json.loads(pages["1995-12-01"])
+    assert json_data["cards"] == get_cards_info(transactions, datetime.date(1995, 12, 1), get_range_rate)
+    assert [row["description"] for row in json_data["top_transactions"]] == ["b", "c"]
+    assert json_data["sections"] == {
+        "currency_rates": "ok",
+        "stock_prices": "ok",
+        "cards": "ok",
+        "top_transactions": "ok",
+    }
+    assert (tmp_path / "pages" / "main_page_1995-12-03.json").read_text(encoding="utf-8") == pages["1995-12-03"]
+    assert main_page_range("1995-12-03", "1995-11-30", transactions=transactions) == dict()
+    assert main_page_range("bad date", "1995-11-30", transactions=transactions) == dict()
+
+
+def test_main_page_range_incomplete(monkeypatch: pytest.MonkeyPatch) -> None:
+    """testing cards and top transactions without some rates aren't reported as ok by main_page_range"""
+
+    def get_rub_rate(currency: str, rate_date: datetime.date) -> float | None:
+        """only RUB has a rate"""
+
+        return 1.0 if currency == "RUB" else None
+
+    monkeypatch.setattr("src.views.get_user_settings", lambda filename: {"user_currencies": [], "user_stocks": []})
+    monkeypatch.setattr("src.views.prefetch_month_rates", lambda *args: None)
+    monkeypatch.setattr("src.views.get_currency_rates_by_cbr", get_rub_rate)
+    transactions = Transactions(get_range_transactions())
+    date_start = datetime.date(1995, 11, 30)
+    date_end = datetime.date(1995, 12, 3)
+
+    assert get_cards_info_range_status(transactions, date_start, date_end, get_rub_rate)[0] is False
+    assert get_top_transactions_range_status(transactions, date_start, date_end, get_rub_rate)[0] is False
+    assert get_cards_info_range_status(transactions, date_start, date_start, get_rub_rate)[0] is True
+    assert get_top_transactions_range_status(transactions, date_start, date_end, get_range_rate)[0] is True
+    assert get_cards_info_range_status(pd.DataFrame(), date_start, date_end, get_rub_rate) == (
+        False,
+        {date: [] for date in get_dates(date_start, date_end)},
+    )
+    pages = main_page_range("1995-11-30", "1995-12-03", transactions=transactions)
+    assert json.loads(pages["1995-12-01"])["sections"] == {
+        "currency_rates": "ok",
+        "stock_prices": "ok",
+        "cards": "incomplete",
+        "top_transactions": "incomplete",
+    }